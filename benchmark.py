@@ -0,0 +1,278 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, Iterable, Optional, TextIO, Tuple
+
+import numpy as np
+
+from classes.journal import MoveJournal
+from classes.puzzle import Puzzle, make_puzzle_answer_key, make_solvable_puzzle, puzzle_from_line
+
+# Bump when the benchmarks or corpus change, so old baselines aren't compared against different work
+FORMAT_VERSION = 2
+# Every generator benchmark starts from this seed, so each run does exactly the same work
+SEED = 1234
+# Made by make_solvable_puzzle, every empty cell is a naked single
+EASY_LINES = [
+    "036094021010000397950320600020815003070400260345270000063007182701502900402100006",
+    "000107985850960010014050000305078004271409000400006723539080200002094601140705000",
+    "010540920003926170049703500800000740090052030020460050000604010006370008108005007",
+]
+# An "insane" rated puzzle, and two made by make_unique_puzzle that need more than singles
+HARD_LINES = [
+    "002030001809000000730410000000500070007108900080002000000025097000000300500070860",
+    "004600009300020007000300248007000036090030000020068000050900100000070000040000800",
+    "300005000007018000400006038100000009000207000072080000050000090063050070000060100",
+]
+# The second hard puzzle relabeled so its solution's first row is 987654321. A backtracker that fills cells row by row
+# trying 1 first gets every early guess wrong, so this is the worst case for generate_answer_key_brute_force
+PATHOLOGICAL_LINES = [
+    "007600001300090008000300975008000036010030000090065000020100400000080000070000500",
+]
+CORPUS: Dict[str, list[str]] = {
+    'easy': EASY_LINES,
+    'hard': HARD_LINES,
+    'pathological': PATHOLOGICAL_LINES,
+}
+# Modules whose cold import is timed, from bare python up to everything the game loads. Each is timed in a new
+# interpreter, so subtract import/sys to get the cost of the import alone
+IMPORT_MODULES = ['sys', 'classes.core', 'classes.puzzle', 'main']
+# Each timing calls a benchmark again until at least this many seconds have passed, so a benchmark that only takes a few
+# milliseconds isn't lost in timer and scheduler noise
+MIN_SECONDS = 0.2
+
+
+def get_options_benchmark(lines: list[str]) -> Callable[[], None]:
+    puzzles = [puzzle_from_line(line) for line in lines]
+
+    def run():
+        for _ in range(100):
+            for puzzle in puzzles:
+                for row in range(9):
+                    for col in range(9):
+                        puzzle.get_options_for_index(row, col)
+    return run
+
+
+def is_valid_benchmark(lines: list[str]) -> Callable[[], None]:
+    puzzles = [puzzle_from_line(line) for line in lines]
+
+    def run():
+        for _ in range(100):
+            for puzzle in puzzles:
+                puzzle.is_puzzle_valid()
+    return run
+
+
+def safe_update_benchmark(lines: list[str]) -> Callable[[], None]:
+    puzzles = [puzzle_from_line(line) for line in lines]
+    # Fill in every empty cell with its answer, then empty it again, so the puzzle ends where it started
+    moves = []
+    for puzzle in puzzles:
+        answer_key = puzzle.generate_answer_key_dlx()
+        empty_cells = [(int(row), int(col)) for row, col in np.argwhere(puzzle.puzzle_grid == 0)]
+        moves.append((puzzle, [(row, col, int(answer_key.puzzle_grid[row, col])) for row, col in empty_cells]))
+
+    def run():
+        for _ in range(10):
+            for puzzle, cells in moves:
+                # Every update is recorded for undo, so start each pass with an empty journal or later calls would time
+                # a longer and longer journal
+                puzzle.journal = MoveJournal()
+                for row, col, value in cells:
+                    puzzle.safe_update(row, col, value)
+                for row, col, _ in cells:
+                    puzzle.safe_update(row, col, 0)
+    return run
+
+
+def brute_force_benchmark(lines: list[str]) -> Callable[[], None]:
+    puzzles = [puzzle_from_line(line) for line in lines]
+
+    def run():
+        for puzzle in puzzles:
+            puzzle.generate_answer_key_brute_force()
+    return run
+
+
+def generator_benchmark(generator: Callable[[random.Random], Puzzle], count: int) -> Callable[[], Callable[[], None]]:
+    def setup() -> Callable[[], None]:
+        def run():
+            rng = random.Random(SEED)
+            for _ in range(count):
+                generator(rng)
+        return run
+    return setup
+
+
+def import_benchmark(module: str) -> Callable[[], None]:
+    command = [sys.executable, '-c', f'import {module}']
+    environment = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1')
+    directory = os.path.dirname(os.path.abspath(__file__))
+
+    def run():
+        subprocess.run(command, check=True, cwd=directory, env=environment)
+    return run
+
+
+def get_benchmarks() -> Dict[str, Callable[[], Callable[[], None]]]:
+    """
+    Gets every benchmark by name. Each one is a setup function returning the work to time, so the setup isn't timed
+    :return: The setup function of every benchmark
+    """
+    benchmarks: Dict[str, Callable[[], Callable[[], None]]] = {}
+    for category, lines in CORPUS.items():
+        benchmarks[f'get_options_for_index/{category}'] = lambda lines=lines: get_options_benchmark(lines)
+        benchmarks[f'is_puzzle_valid/{category}'] = lambda lines=lines: is_valid_benchmark(lines)
+        benchmarks[f'safe_update/{category}'] = lambda lines=lines: safe_update_benchmark(lines)
+        benchmarks[f'generate_answer_key_brute_force/{category}'] = lambda lines=lines: brute_force_benchmark(lines)
+    benchmarks['make_puzzle_answer_key'] = generator_benchmark(make_puzzle_answer_key, 50)
+    benchmarks['make_solvable_puzzle'] = generator_benchmark(make_solvable_puzzle, 20)
+    for module in IMPORT_MODULES:
+        benchmarks[f'import/{module}'] = lambda module=module: import_benchmark(module)
+    return benchmarks
+
+
+def calibration_loop() -> int:
+    total = 0
+    for i in range(200000):
+        total += i * i % 7
+    return total
+
+
+def calibrate(min_seconds: float = MIN_SECONDS) -> float:
+    """
+    Times a fixed pure Python loop, so results from a faster or slower machine can still be compared
+    :param min_seconds: How long the timing has to run for at least
+    :return: How many seconds each loop took on average
+    """
+    return time_calls(calibration_loop, min_seconds)
+
+
+def time_calls(function: Callable[[], object], min_seconds: float = MIN_SECONDS) -> float:
+    """
+    Times calls of a function, calling it again until at least min_seconds have passed
+    :param function: What to time
+    :param min_seconds: How long to keep calling it for, it is always called at least once
+    :return: How many seconds each call took on average
+    """
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        function()
+        calls += 1
+        seconds = time.perf_counter() - start
+        if seconds >= min_seconds:
+            return seconds / calls
+
+
+def run_benchmarks(names: Optional[Iterable[str]] = None, repeat: int = 5, min_seconds: float = MIN_SECONDS) -> dict:
+    """
+    Runs benchmarks, timing each one several times and keeping the best calibrated time since slower runs are only noise
+    :param names: Optional names of the benchmarks to run, all of them by default
+    :param repeat: How many times to time each benchmark
+    :param min_seconds: How long each timing has to run for at least, short benchmarks are called again until then
+    :return: The results, ready to be written as json, with times in seconds per call
+    """
+    benchmarks = get_benchmarks()
+    results = {}
+    for name in benchmarks if names is None else names:
+        run = benchmarks[name]()
+        # Each timing is calibrated right after it, so the machine getting busier or quieter part way through is
+        # cancelled out, and the best pair is kept
+        timings = []
+        for _ in range(repeat):
+            seconds = time_calls(run, min_seconds)
+            timings.append((seconds / calibrate(min_seconds), seconds))
+        normalized, seconds = min(timings)
+        results[name] = {'seconds': seconds, 'calibration': seconds / normalized, 'normalized': normalized}
+    return {
+        'version': FORMAT_VERSION,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'repeat': repeat,
+        'min_seconds': min_seconds,
+        'results': results,
+    }
+
+
+def compare_results(results: dict, baseline: dict, tolerance: float) -> list[Tuple[str, float, bool]]:
+    """
+    Compares results to a baseline by their normalized times
+    :param results: Results from run_benchmarks
+    :param baseline: Results saved earlier
+    :param tolerance: How many times slower than the baseline a benchmark can be before it counts as a slowdown
+    :return: The name, how many times slower than the baseline it was, and if that is a slowdown, for every benchmark in
+    both
+    """
+    if baseline.get('version') != results['version']:
+        raise ValueError("The baseline was made by a different version of the benchmarks")
+    comparisons = []
+    for name, result in results['results'].items():
+        if name in baseline['results']:
+            ratio = result['normalized'] / baseline['results'][name]['normalized']
+            comparisons.append((name, ratio, ratio > tolerance))
+    return comparisons
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    benchmarks = get_benchmarks()
+    parser = argparse.ArgumentParser(
+        description="Time the puzzle engine on a fixed corpus, optionally comparing against a saved baseline")
+    parser.add_argument('names', nargs='*', help="Benchmarks to run, all of them by default: " + ', '.join(benchmarks))
+    parser.add_argument('--repeat', type=int, default=5, help="How many times to time each benchmark")
+    parser.add_argument('--min-seconds', type=float, default=MIN_SECONDS,
+                        help="How long each timing runs for at least, short benchmarks are repeated until then")
+    parser.add_argument('--output', default=None, help="Where to write the json results, stdout by default")
+    parser.add_argument('--baseline', default=None, help="Json results to compare against, fails on slowdowns")
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help="How many times slower than the baseline counts as a slowdown")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.names if name not in benchmarks]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    if args.min_seconds < 0:
+        parser.error("--min-seconds can't be negative")
+    return args
+
+
+def main(argv: Optional[list[str]] = None, stdout: TextIO = sys.stdout, stderr: TextIO = sys.stderr) -> int:
+    """
+    Runs the benchmarks
+    :param argv: The arguments, defaults to the ones the program was run with
+    :param stdout: Where to write the results if there is no output file
+    :param stderr: Where to write the comparison with the baseline
+    :return: The exit code, 1 if anything got slower than the baseline allows
+    """
+    args = parse_args(argv)
+    results = run_benchmarks(args.names or None, args.repeat, args.min_seconds)
+    if args.output is None:
+        json.dump(results, stdout, indent=2)
+        stdout.write('\n')
+    else:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+            file.write('\n')
+    if args.baseline is None:
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    slowdowns = 0
+    for name, ratio, is_slowdown in compare_results(results, baseline, args.tolerance):
+        slowdowns += is_slowdown
+        stderr.write(f"{name:50} {ratio:6.2f}x{'  SLOWER' if is_slowdown else ''}\n")
+    if slowdowns:
+        stderr.write(f"{slowdowns} benchmarks were more than {args.tolerance:.2f}x slower than the baseline\n")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import hashlib
+import itertools
+import os
+import random
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+from classes.puzzle import GENERATORS, Puzzle
+
+
+def derive_seed(base_seed: int, index: int) -> int:
+    """
+    Gets the seed for one puzzle of a batch. Each puzzle only depends on the base seed and its index, so a batch is the
+    same no matter how it is split up
+    :param base_seed: The seed of the whole batch
+    :param index: The index of the puzzle in the batch
+    :return: The seed for the puzzle's random number generator
+    """
+    digest = hashlib.blake2b(f"{base_seed}:{index}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def generate_chunk(kind: str, base_seed: int, start: int, stop: int) -> list[Tuple[int, np.ndarray]]:
+    """
+    Generates a run of puzzles from a batch, this is what each worker runs
+    :param kind: The kind of puzzle to make, a key of GENERATORS
+    :param base_seed: The seed of the whole batch
+    :param start: The index of the first puzzle to make
+    :param stop: The index after the last puzzle to make
+    :return: The index and grid of every puzzle made
+    """
+    generator = GENERATORS[kind]
+    return [(index, np.array(generator(random.Random(derive_seed(base_seed, index)), 3, None).puzzle_grid))
+            for index in range(start, stop)]
+
+
+def generate_puzzles(count: int, base_seed: int, kind: str = 'solvable', workers: Optional[int] = None,
+                     chunk_size: int = 16, ordered: bool = False) -> Iterator[Tuple[int, Puzzle]]:
+    """
+    Generates a batch of puzzles across a pool of processes, handing them back as they are finished. The puzzle at each
+    index is the same for the same base seed no matter how many workers are used
+    :param count: How many puzzles to make
+    :param base_seed: The seed of the whole batch
+    :param kind: The kind of puzzle to make: 'answer_key', 'solvable', or 'unique'
+    :param workers: How many processes to use, defaults to one per cpu. 0 makes the puzzles in this process
+    :param chunk_size: How many puzzles each task makes, bigger chunks mean less time spent passing work around
+    :param ordered: If True puzzles are handed back in index order instead of as soon as they finish
+    :return: An iterator of the index and puzzle for every puzzle in the batch
+    """
+    if kind not in GENERATORS:
+        raise ValueError(f"Unknown kind of puzzle: {kind}")
+    if count < 0:
+        raise ValueError(f"Can't make {count} puzzles")
+    if workers is not None and workers < 0:
+        raise ValueError(f"Can't use {workers} workers")
+    # Checked here, a chunk size under 1 would otherwise make no puzzles at all or fail inside range
+    if chunk_size < 1:
+        raise ValueError(f"Each task has to make at least 1 puzzle, not {chunk_size}")
+    chunks = ((start, min(start + chunk_size, count)) for start in range(0, count, chunk_size))
+    if workers == 0:
+        for start, stop in chunks:
+            for index, grid in generate_chunk(kind, base_seed, start, stop):
+                yield index, Puzzle(grid)
+        return
+    if workers is None:
+        workers = os.cpu_count() or 1
+    # Results held back until the ones before them are done, only used when ordered
+    waiting: dict[int, Puzzle] = {}
+    next_index = 0
+    in_flight: set[Future] = set()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            # Only keep a few tasks per worker in flight, so huge batches don't queue up all their work at once
+            for start, stop in itertools.islice(chunks, 4 * workers - len(in_flight)):
+                in_flight.add(executor.submit(generate_chunk, kind, base_seed, start, stop))
+            if not in_flight:
+                return
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                for index, grid in future.result():
+                    waiting[index] = Puzzle(grid)
+            if not ordered:
+                yield from waiting.items()
+                waiting.clear()
+            while next_index in waiting:
+                yield next_index, waiting.pop(next_index)
+                next_index += 1
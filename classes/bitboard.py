@@ -0,0 +1,92 @@
+import functools
+from typing import Callable, Tuple
+
+# Characters used for cell values when a puzzle is written as text, so boards up to 25 by 25 fit one per cell
+DIGIT_CHARS = '0123456789ABCDEFGHIJKLMNOP'
+
+
+def get_mask_digits(mask: int) -> Tuple[int, ...]:
+    """
+    Gets the digits in a mask of any size
+    :param mask: A mask with bit d set for digit d
+    :return: The digits, smallest first
+    """
+    digits = []
+    while mask:
+        bit = mask & -mask
+        digits.append(bit.bit_length() - 1)
+        mask ^= bit
+    return tuple(digits)
+
+
+def get_mask_count(mask: int) -> int:
+    """
+    Counts the digits in a mask of any size
+    :param mask: A mask with bit d set for digit d
+    :return: How many digits are in the mask
+    """
+    return bin(mask).count('1')
+
+
+class BoardLayout:
+    """
+    The tables describing a board made of box_size by box_size squares, so a board of box_size ** 2 rows and cols.
+    Digit d lives at bit 1 << d of a mask, so bit 0 is always unused. Get layouts with get_layout so they are shared
+    """
+
+    def __init__(self, box_size: int):
+        self.box_size = box_size
+        self.size = box_size * box_size
+        self.num_cells = self.size * self.size
+        self.full_mask = ((1 << self.size) - 1) << 1
+        # The row, col, and square of every cell when the grid is flattened row by row
+        self.cell_rows = [cell // self.size for cell in range(self.num_cells)]
+        self.cell_cols = [cell % self.size for cell in range(self.num_cells)]
+        self.cell_squares = [(row // box_size) * box_size + col // box_size
+                             for row, col in zip(self.cell_rows, self.cell_cols)]
+        # Every row, col, and square as a list of flat cell indexes
+        self.units: list[list[int]] = [[] for _ in range(3 * self.size)]
+        for cell in range(self.num_cells):
+            self.units[self.cell_rows[cell]].append(cell)
+            self.units[self.size + self.cell_cols[cell]].append(cell)
+            self.units[2 * self.size + self.cell_squares[cell]].append(cell)
+        # The other cells sharing a row, col, or square with every cell
+        self.peers: list[list[int]] = [
+            sorted(set(self.units[self.cell_rows[cell]] + self.units[self.size + self.cell_cols[cell]] +
+                       self.units[2 * self.size + self.cell_squares[cell]]) - {cell})
+            for cell in range(self.num_cells)]
+        # Small boards look digits and counts up in tables, bigger boards work them out
+        if self.size <= 9:
+            mask_digits = [get_mask_digits(mask) for mask in range(self.full_mask + 1)]
+            mask_counts = [len(digits) for digits in mask_digits]
+            self.mask_digits: Callable[[int], Tuple[int, ...]] = mask_digits.__getitem__
+            self.mask_count: Callable[[int], int] = mask_counts.__getitem__
+        else:
+            self.mask_digits = get_mask_digits
+            self.mask_count = get_mask_count
+
+
+@functools.lru_cache(maxsize=None)
+def get_layout(box_size: int = 3) -> BoardLayout:
+    """
+    Gets the shared layout for a board size
+    :param box_size: How many rows (and cols) each square has, 3 for a normal 9 by 9 puzzle
+    :return: The layout
+    """
+    if box_size < 1 or box_size > 5:
+        raise ValueError("Boards are supported from 1 by 1 up to 25 by 25")
+    return BoardLayout(box_size)
+
+
+# The tables for the normal 9 by 9 board
+LAYOUT = get_layout(3)
+FULL_MASK = LAYOUT.full_mask
+# The digits held by every possible 9-bit mask, so a mask can be turned into options without loops
+MASK_DIGITS: list[Tuple[int, ...]] = [get_mask_digits(mask) for mask in range(1 << 10)]
+# How many digits are in every mask
+MASK_COUNTS: list[int] = [len(digits) for digits in MASK_DIGITS]
+CELL_ROWS = LAYOUT.cell_rows
+CELL_COLS = LAYOUT.cell_cols
+CELL_SQUARES = LAYOUT.cell_squares
+UNITS = LAYOUT.units
+PEERS = LAYOUT.peers
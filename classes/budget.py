@@ -0,0 +1,99 @@
+import threading
+import time
+from typing import Optional
+
+from classes.instrumentation import BacktrackHook, Instrumentation, PlaceHook
+
+
+class CancellationToken:
+    """
+    Lets another thread stop a search that was given a budget with this token
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        """
+        Asks every search using the token to stop at its next step
+        :return: None
+        """
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """
+        If cancel has been called
+        :return: True once the token is cancelled
+        """
+        return self._event.is_set()
+
+
+class BudgetExhausted(Exception):
+    """
+    Raised from inside a search when its budget runs out
+    """
+
+    def __init__(self, reason: str):
+        """
+        Makes the error
+        :param reason: deadline, nodes, or cancelled
+        """
+        super().__init__(f"Search stopped: {reason}")
+        self.reason = reason
+        # The cells of the grid when the search stopped, row by row, filled in by the search that was stopped if it has
+        # a grid worth handing back
+        self.partial: Optional[list[int]] = None
+
+
+class Budget(Instrumentation):
+    """
+    Instrumentation that also stops the search once it runs out of time or placements, or is cancelled. The limits are
+    checked on every placement and backtrack, so a search never runs more than one step past them. Stopping raises
+    BudgetExhausted, use Puzzle.solve or generate_with_budget to get a result back instead
+    """
+
+    def __init__(self, seconds: Optional[float] = None, max_nodes: Optional[int] = None,
+                 token: Optional[CancellationToken] = None, on_place: Optional[PlaceHook] = None,
+                 on_backtrack: Optional[BacktrackHook] = None):
+        """
+        Makes a budget, the time starts counting now
+        :param seconds: Optional most seconds to search for
+        :param max_nodes: Optional most placements to make
+        :param token: Optional token to cancel the search with
+        :param on_place: Optional hook called on every placement
+        :param on_backtrack: Optional hook called on every backtrack
+        """
+        super().__init__(on_place, on_backtrack)
+        self.seconds = seconds
+        self.max_nodes = max_nodes
+        self.token = token
+        self.deadline: Optional[float] = None if seconds is None else time.monotonic() + seconds
+
+    def reset(self):
+        """
+        Sets every counter and time back to zero and starts the time again, keeping the limits and hooks
+        :return: None
+        """
+        super().reset()
+        self.deadline = None if self.seconds is None else time.monotonic() + self.seconds
+
+    def check(self):
+        """
+        Stops the search if any limit has been reached
+        :return: None, raises BudgetExhausted if the search has to stop
+        """
+        if self.max_nodes is not None and self.cells_tried > self.max_nodes:
+            raise BudgetExhausted('nodes')
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise BudgetExhausted('deadline')
+        if self.token is not None and self.token.cancelled:
+            raise BudgetExhausted('cancelled')
+
+    def place(self, row: int, col: int, digit: int, depth: int):
+        super().place(row, col, digit, depth)
+        self.check()
+
+    def backtrack(self, row: int, col: int, depth: int):
+        super().backtrack(row, col, depth)
+        self.check()
@@ -0,0 +1,188 @@
+import math
+import threading
+from typing import TYPE_CHECKING, Iterable, Optional, Sequence, Tuple
+
+from classes.bitboard import DIGIT_CHARS, get_layout
+from classes.dlx import DancingLinks
+from classes.instrumentation import Instrumentation
+from classes.solver import PropagationSolver
+
+# Only for the annotations, the array functions import these when they are called so importing this module stays cheap
+if TYPE_CHECKING:
+    import numpy as np
+
+    from classes.puzzle import Puzzle
+
+# Used when no dancing links solver is passed in, one per puzzle size so each node arena is only built once. Solvers
+# keep their search in their nodes, so every thread gets its own
+shared_dancing_links = threading.local()
+
+
+def get_shared_dancing_links(box_size: int = 3) -> DancingLinks:
+    """
+    Gets the dancing links solver shared by puzzles that aren't given one on this thread, making it the first time
+    :param box_size: How many rows (and cols) each square of the puzzles has
+    :return: The shared solver of this thread
+    """
+    solvers = getattr(shared_dancing_links, 'solvers', None)
+    if solvers is None:
+        solvers = shared_dancing_links.solvers = {}
+    solver = solvers.get(box_size)
+    if solver is None:
+        solver = solvers[box_size] = DancingLinks(box_size)
+    return solver
+
+
+def parse_line(line: str) -> Tuple[list[int], int]:
+    """
+    Reads a puzzle written as one line, row by row, with 0 or . for an empty cell. A 9 by 9 puzzle is 81 characters of
+    0-9, bigger puzzles (256 characters for 16 by 16) use letters for numbers past 9, so 16 is G
+    :param line: The line to read, surrounding whitespace is ignored
+    :return: The values of the cells row by row, and the box size. Raises a ValueError if the line can't be a puzzle,
+    the values aren't checked against each other
+    """
+    line = line.strip().upper()
+    size = math.isqrt(len(line))
+    box_size = math.isqrt(size)
+    if size * size != len(line) or box_size * box_size != size or not 1 <= box_size <= 5:
+        raise ValueError("A puzzle line needs 81 characters of 0-9 or ., or 16, 256, or 625 for other sizes")
+    cells = [0 if char == '.' else DIGIT_CHARS.find(char) for char in line]
+    if any(not 0 <= value <= size for value in cells):
+        raise ValueError(f"A puzzle line of {len(line)} characters can only hold {DIGIT_CHARS[:size + 1]} or .")
+    return cells, box_size
+
+
+def to_line(cells: Sequence[int]) -> str:
+    """
+    Writes the values of a puzzle as one line, the way parse_line reads them
+    :param cells: The values of the cells, row by row
+    :return: The line, without a newline
+    """
+    return ''.join(DIGIT_CHARS[int(value)] for value in cells)
+
+
+def is_valid(cells: Sequence[int], box_size: int = 3) -> bool:
+    """
+    Checks that every value is a digit and no row, col, or square holds a digit twice, with one pass over the cells
+    :param cells: The values of the cells, row by row, 0 being an empty cell
+    :param box_size: How many rows (and cols) each square has
+    :return: True if the puzzle is valid
+    """
+    layout = get_layout(box_size)
+    if len(cells) != layout.num_cells:
+        return False
+    size = layout.size
+    row_masks = [0] * size
+    col_masks = [0] * size
+    square_masks = [0] * size
+    for cell, value in enumerate(cells):
+        if not 0 <= value <= size or value != int(value):
+            return False
+        if value == 0:
+            continue
+        bit = 1 << int(value)
+        row = layout.cell_rows[cell]
+        col = layout.cell_cols[cell]
+        square = layout.cell_squares[cell]
+        if (row_masks[row] | col_masks[col] | square_masks[square]) & bit:
+            return False
+        row_masks[row] |= bit
+        col_masks[col] |= bit
+        square_masks[square] |= bit
+    return True
+
+
+def is_solved(cells: Sequence[int], box_size: int = 3) -> bool:
+    """
+    Checks that a puzzle is filled in completely and valid
+    :param cells: The values of the cells, row by row
+    :param box_size: How many rows (and cols) each square has
+    :return: True if the puzzle is solved
+    """
+    return 0 not in cells and is_valid(cells, box_size)
+
+
+def validate_lines(lines: Iterable[str]) -> list[Tuple[bool, bool]]:
+    """
+    Checks many puzzle lines, without making a Puzzle for any of them
+    :param lines: The puzzle lines
+    :return: If each line is a valid puzzle, and if it is solved
+    """
+    results = []
+    for line in lines:
+        try:
+            cells, box_size = parse_line(line)
+        except ValueError:
+            results.append((False, False))
+            continue
+        valid = is_valid(cells, box_size)
+        results.append((valid, valid and 0 not in cells))
+    return results
+
+
+def solve(cells: Sequence[int], box_size: int = 3, method: str = 'propagation',
+          instrumentation: Optional[Instrumentation] = None) -> Optional[list[int]]:
+    """
+    Solves a puzzle
+    :param cells: The values of the cells, row by row, 0 being an empty cell
+    :param box_size: How many rows (and cols) each square has
+    :param method: propagation or dlx
+    :param instrumentation: Optional instrumentation or budget to record the search in
+    :return: The values of a solution, or None if there is no solution
+    """
+    if method == 'propagation':
+        return PropagationSolver(box_size).solve(cells, instrumentation)
+    if method == 'dlx':
+        return get_shared_dancing_links(box_size).solve(cells, instrumentation)
+    raise ValueError(f"Unknown solve method: {method}")
+
+
+def count_solutions(cells: Sequence[int], box_size: int = 3, limit: Optional[int] = None,
+                    instrumentation: Optional[Instrumentation] = None) -> int:
+    """
+    Counts how many solutions a puzzle has with dancing links
+    :param cells: The values of the cells, row by row, 0 being an empty cell
+    :param box_size: How many rows (and cols) each square has
+    :param limit: Optional count to stop at, a limit of 2 is enough to tell if the solution is unique
+    :param instrumentation: Optional instrumentation or budget to record the search in
+    :return: How many solutions the puzzle has, at most limit
+    """
+    return get_shared_dancing_links(box_size).count_solutions(cells, limit, instrumentation)
+
+
+def to_grid(cells: Sequence[int], box_size: int = 3) -> 'np.ndarray':
+    """
+    Turns the values of a puzzle into a grid, importing numpy the first time
+    :param cells: The values of the cells, row by row
+    :param box_size: How many rows (and cols) each square has
+    :return: A size by size int8 grid
+    """
+    import numpy as np
+    size = box_size * box_size
+    return np.array(cells, dtype=np.int8).reshape(size, size)
+
+
+def to_grids(lines: Iterable[str]) -> 'np.ndarray':
+    """
+    Reads many puzzle lines of one size into a batch of grids, like classes.vectorized works on
+    :param lines: The puzzle lines
+    :return: An (N, size, size) int8 array, raises a ValueError if a line can't be a puzzle or the sizes differ
+    """
+    import numpy as np
+    parsed = [parse_line(line) for line in lines]
+    box_sizes = {box_size for _, box_size in parsed}
+    if len(box_sizes) > 1:
+        raise ValueError("Every puzzle in a batch has to be the same size")
+    size = box_sizes.pop() ** 2 if box_sizes else 9
+    return np.array([cells for cells, _ in parsed], dtype=np.int8).reshape(-1, size, size)
+
+
+def to_puzzle(cells: Sequence[int], box_size: int = 3) -> 'Puzzle':
+    """
+    Turns the values of a puzzle into a Puzzle, importing the full puzzle module the first time
+    :param cells: The values of the cells, row by row
+    :param box_size: How many rows (and cols) each square has
+    :return: The puzzle, raises a ValueError if it isn't valid
+    """
+    from classes.puzzle import Puzzle
+    return Puzzle(to_grid(cells, box_size), box_size=box_size)
@@ -0,0 +1,226 @@
+import struct
+from typing import BinaryIO, Iterator, Optional
+
+import numpy as np
+
+from classes.puzzle import Puzzle
+
+# The file starts with the magic bytes, the version, the flags, 2 unused bytes, and the record count
+MAGIC = b'SUDK'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sBBxxQ')
+# Set when every record also has a clue mask and a difficulty
+FLAG_CLUES = 1
+# 81 cells at 4 bits each, the last nibble is padding
+PACKED_GRID_BYTES = 41
+# 81 bits, one per cell, set for the cells given in the puzzle
+PACKED_CLUES_BYTES = 11
+
+
+def get_record_dtype(flags: int) -> np.dtype:
+    """
+    Gets the layout of one record
+    :param flags: The flags of the file
+    :return: The numpy dtype of a record
+    """
+    if flags & FLAG_CLUES:
+        return np.dtype([('grid', np.uint8, PACKED_GRID_BYTES), ('clues', np.uint8, PACKED_CLUES_BYTES),
+                         ('difficulty', np.uint8)])
+    return np.dtype([('grid', np.uint8, PACKED_GRID_BYTES)])
+
+
+def pack_grids(grids: np.ndarray) -> np.ndarray:
+    """
+    Packs grids into 4 bits per cell
+    :param grids: An (N, 9, 9) array of grids holding values [0-9]
+    :return: An (N, 41) array of bytes
+    """
+    flat = np.asarray(grids).reshape(-1, 81)
+    if np.any((flat < 0) | (flat > 9)):
+        raise ValueError("Grids can only hold values [0-9]")
+    padded = np.zeros((len(flat), 2 * PACKED_GRID_BYTES), dtype=np.uint8)
+    padded[:, :81] = flat
+    return (padded[:, 0::2] << 4) | padded[:, 1::2]
+
+
+def unpack_grids(packed: np.ndarray) -> np.ndarray:
+    """
+    Unpacks grids packed by pack_grids
+    :param packed: An (N, 41) array of bytes
+    :return: An (N, 9, 9) array of grids
+    """
+    packed = np.asarray(packed, dtype=np.uint8).reshape(-1, PACKED_GRID_BYTES)
+    padded = np.empty((len(packed), 2 * PACKED_GRID_BYTES), dtype=np.int8)
+    padded[:, 0::2] = packed >> 4
+    padded[:, 1::2] = packed & 0xF
+    return padded[:, :81].reshape(-1, 9, 9)
+
+
+class CorpusWriter:
+    """
+    Writes puzzles to a corpus file a chunk at a time, so a corpus never has to fit in memory. Use as a context
+    manager, the record count in the header is filled in when the writer is closed
+    """
+
+    def __init__(self, path: str, with_clues: bool = False):
+        """
+        Makes a corpus file, replacing any file already there
+        :param path: Where to write the corpus
+        :param with_clues: If True every record also stores a clue mask and a difficulty
+        """
+        self.flags = FLAG_CLUES if with_clues else 0
+        self.dtype = get_record_dtype(self.flags)
+        self.count = 0
+        self.file: BinaryIO = open(path, 'wb')
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION, self.flags, 0))
+
+    def write(self, grids: np.ndarray, clue_masks: Optional[np.ndarray] = None,
+              difficulties: Optional[np.ndarray] = None):
+        """
+        Adds grids to the end of the corpus
+        :param grids: An (N, 9, 9) array of grids. With clues these are usually the solutions
+        :param clue_masks: An (N, 9, 9) bool array of the given cells, needed if the corpus has clues
+        :param difficulties: Optional (N,) array of difficulties [0-255], 0 by default
+        :return: None, the records are written
+        """
+        packed = pack_grids(grids)
+        records = np.zeros(len(packed), dtype=self.dtype)
+        records['grid'] = packed
+        if self.flags & FLAG_CLUES:
+            if clue_masks is None:
+                raise ValueError("This corpus needs a clue mask for every grid")
+            records['clues'] = np.packbits(np.asarray(clue_masks, dtype=bool).reshape(-1, 81), axis=1)
+            if difficulties is not None:
+                records['difficulty'] = difficulties
+        self.file.write(records.tobytes())
+        self.count += len(records)
+
+    def close(self):
+        """
+        Fills in the record count and closes the file
+        :return: None, the file is closed
+        """
+        if self.file.closed:
+            return
+        self.file.seek(0)
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION, self.flags, self.count))
+        self.file.close()
+
+    def __enter__(self) -> 'CorpusWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def write_corpus(path: str, grids: np.ndarray, clue_masks: Optional[np.ndarray] = None,
+                 difficulties: Optional[np.ndarray] = None):
+    """
+    Writes a whole corpus at once
+    :param path: Where to write the corpus
+    :param grids: An (N, 9, 9) array of grids
+    :param clue_masks: Optional (N, 9, 9) bool array of the given cells, storing one makes a corpus with clues
+    :param difficulties: Optional (N,) array of difficulties [0-255], only stored with clue masks
+    :return: None, the corpus is written
+    """
+    with CorpusWriter(path, clue_masks is not None) as writer:
+        writer.write(grids, clue_masks, difficulties)
+
+
+class CorpusReader:
+    """
+    Reads a corpus file by memory mapping it, so only the records looked at are ever read from disk
+    """
+
+    def __init__(self, path: str):
+        """
+        Opens a corpus file
+        :param path: The corpus to read
+        """
+        with open(path, 'rb') as file:
+            header = file.read(FILE_HEADER.size)
+        if len(header) != FILE_HEADER.size:
+            raise ValueError("The file is too short to be a corpus")
+        magic, version, self.flags, self.count = FILE_HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("The file is not a corpus this version can read")
+        self.has_clues = bool(self.flags & FLAG_CLUES)
+        if self.count == 0:
+            self.records = np.zeros(0, dtype=get_record_dtype(self.flags))
+        else:
+            self.records = np.memmap(path, dtype=get_record_dtype(self.flags), mode='r', offset=FILE_HEADER.size,
+                                     shape=(self.count,))
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def packed_grids(self) -> np.ndarray:
+        """
+        The packed grids of every record, straight from the file without copying
+        :return: An (N, 41) array of bytes
+        """
+        return self.records['grid']
+
+    @property
+    def difficulties(self) -> np.ndarray:
+        """
+        The difficulty of every record, straight from the file without copying. Only in corpora with clues
+        :return: An (N,) array of difficulties
+        """
+        if not self.has_clues:
+            raise ValueError("This corpus has no difficulties")
+        return self.records['difficulty']
+
+    def get_grids(self, start: int, stop: int) -> np.ndarray:
+        """
+        Unpacks a run of the stored grids
+        :param start: The index of the first record
+        :param stop: The index after the last record
+        :return: An (N, 9, 9) array of grids, the solutions if the corpus has clues
+        """
+        return unpack_grids(self.packed_grids[start:stop])
+
+    def get_clue_masks(self, start: int, stop: int) -> np.ndarray:
+        """
+        Unpacks a run of the clue masks
+        :param start: The index of the first record
+        :param stop: The index after the last record
+        :return: An (N, 9, 9) bool array, True for the given cells
+        """
+        if not self.has_clues:
+            raise ValueError("This corpus has no clue masks")
+        clues = np.unpackbits(self.records['clues'][start:stop], axis=1, count=81)
+        return clues.reshape(-1, 9, 9).astype(bool)
+
+    def get_puzzle_grids(self, start: int, stop: int) -> np.ndarray:
+        """
+        Unpacks a run of the puzzles, with only the given cells filled in if the corpus has clues
+        :param start: The index of the first record
+        :param stop: The index after the last record
+        :return: An (N, 9, 9) array of puzzles
+        """
+        grids = self.get_grids(start, stop)
+        if self.has_clues:
+            grids[~self.get_clue_masks(start, stop)] = 0
+        return grids
+
+    def iter_puzzle_grids(self, chunk_size: int = 4096) -> Iterator[np.ndarray]:
+        """
+        Unpacks the puzzles a chunk at a time, so scanning the corpus only holds one chunk in memory
+        :param chunk_size: How many puzzles to unpack at once
+        :return: An iterator of (N, 9, 9) arrays of puzzles
+        """
+        for start in range(0, self.count, chunk_size):
+            yield self.get_puzzle_grids(start, min(start + chunk_size, self.count))
+
+    def __getitem__(self, index: int) -> Puzzle:
+        if not -self.count <= index < self.count:
+            raise IndexError("Record index out of range")
+        index %= self.count
+        return Puzzle(self.get_puzzle_grids(index, index + 1)[0])
+
+    def __iter__(self) -> Iterator[Puzzle]:
+        for grids in self.iter_puzzle_grids():
+            for grid in grids:
+                yield Puzzle(grid)
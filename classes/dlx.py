@@ -0,0 +1,293 @@
+from typing import Iterator, Optional, Sequence
+
+from classes.bitboard import BoardLayout, get_layout
+from classes.budget import BudgetExhausted
+from classes.instrumentation import Instrumentation, get_phase
+
+# Node 0 is the root, then the column headers, then 4 nodes for every choice
+ROOT = 0
+
+
+def get_choice_columns(layout: BoardLayout, choice: int) -> tuple[int, int, int, int]:
+    """
+    Gets the cover matrix columns a choice fills. Each cell holds one digit, and each row, col, and square holds each
+    digit once, so there are 4 columns per cell (324 for a 9 by 9 puzzle)
+    :param layout: The layout of the board
+    :param choice: The choice, cell * size + digit - 1
+    :return: The cell, row digit, col digit, and square digit columns
+    """
+    size = layout.size
+    cell, digit_index = divmod(choice, size)
+    return (cell,
+            layout.num_cells + layout.cell_rows[cell] * size + digit_index,
+            2 * layout.num_cells + layout.cell_cols[cell] * size + digit_index,
+            3 * layout.num_cells + layout.cell_squares[cell] * size + digit_index)
+
+
+class DancingLinks:
+    """
+    Solves puzzles as an exact cover problem with Knuth's Algorithm X and dancing links. The whole cover matrix is
+    built once into flat lists, and every solve only covers and uncovers columns, so a solver can be reused for many
+    puzzles of its size without allocating nodes. A solver is not safe to share between threads.
+    """
+
+    def __init__(self, box_size: int = 3):
+        """
+        Makes a solver, building its cover matrix
+        :param box_size: How many rows (and cols) each square has, 3 for a normal 9 by 9 puzzle
+        """
+        self.layout = get_layout(box_size)
+        num_columns = 4 * self.layout.num_cells
+        num_choices = self.layout.num_cells * self.layout.size
+        self.first_choice_node = 1 + num_columns
+        num_nodes = self.first_choice_node + 4 * num_choices
+        self.left = [0] * num_nodes
+        self.right = [0] * num_nodes
+        self.up = list(range(num_nodes))
+        self.down = list(range(num_nodes))
+        # The column header of every node, and the choice every node belongs to
+        self.column = [0] * num_nodes
+        self.choice = [0] * num_nodes
+        # How many nodes are left in every column
+        self.size = [0] * (1 + num_columns)
+        # Every covered column in order, so they can be uncovered in reverse no matter where a search stopped
+        self.covered: list[int] = []
+        # The choices picked by the search so far
+        self.picked: list[int] = []
+        # The givens of the loaded puzzle
+        self.cells = [0] * self.layout.num_cells
+        # Optional instrumentation for the search running now
+        self.instrumentation: Optional[Instrumentation] = None
+        # Link the root and the headers into a ring
+        for header in range(1 + num_columns):
+            self.left[header] = header - 1
+            self.right[header] = header + 1
+        self.left[ROOT] = num_columns
+        self.right[num_columns] = ROOT
+        # Add the nodes for every choice
+        for choice in range(num_choices):
+            first = self.first_choice_node + 4 * choice
+            for offset, column in enumerate(get_choice_columns(self.layout, choice)):
+                node = first + offset
+                header = 1 + column
+                self.column[node] = header
+                self.choice[node] = choice
+                self.left[node] = first + (offset - 1) % 4
+                self.right[node] = first + (offset + 1) % 4
+                # Add to the bottom of the column
+                self.up[node] = self.up[header]
+                self.down[node] = header
+                self.down[self.up[header]] = node
+                self.up[header] = node
+                self.size[header] += 1
+
+    def _cover(self, header: int):
+        """
+        Takes a column out of the header ring, and every row using the column out of the other columns
+        :param header: The column header to cover
+        :return: None, the links are updated
+        """
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        right[left[header]] = right[header]
+        left[right[header]] = left[header]
+        row = down[header]
+        while row != header:
+            node = right[row]
+            while node != row:
+                down[up[node]] = down[node]
+                up[down[node]] = up[node]
+                size[column[node]] -= 1
+                node = right[node]
+            row = down[row]
+        self.covered.append(header)
+
+    def _uncover(self, header: int):
+        """
+        Puts back a column, must be done in the reverse order of covering
+        :param header: The column header to uncover
+        :return: None, the links are updated
+        """
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        row = up[header]
+        while row != header:
+            node = left[row]
+            while node != row:
+                size[column[node]] += 1
+                down[up[node]] = node
+                up[down[node]] = node
+                node = left[node]
+            row = up[row]
+        right[left[header]] = header
+        left[right[header]] = header
+
+    def _restore(self, mark: int):
+        """
+        Uncovers columns until only a given number are still covered
+        :param mark: How many columns should be left covered
+        :return: None, the matrix is rolled back
+        """
+        covered = self.covered
+        while len(covered) > mark:
+            self._uncover(covered.pop())
+
+    def load(self, cells: Sequence[int]) -> bool:
+        """
+        Loads a puzzle by covering the columns of its givens
+        :param cells: The values of the puzzle, row by row, 0 being an empty cell
+        :return: True if the puzzle was loaded, False if the values already conflict with each other
+        """
+        size = self.layout.size
+        self._restore(0)
+        self.picked = []
+        self.cells = [0] * self.layout.num_cells
+        if len(cells) != self.layout.num_cells:
+            return False
+        for cell, value in enumerate(cells):
+            digit = int(value)
+            if digit == 0:
+                continue
+            if not 1 <= digit <= size:
+                self._restore(0)
+                return False
+            node = self.first_choice_node + 4 * (cell * size + digit - 1)
+            # If another given already filled one of these columns the givens conflict
+            for offset in range(4):
+                header = self.column[node + offset]
+                if self.left[self.right[header]] != header:
+                    self._restore(0)
+                    return False
+                self._cover(header)
+            self.cells[cell] = digit
+        return True
+
+    def _search(self) -> Iterator[None]:
+        """
+        Searches for exact covers from the current state, pausing each time one is found
+        :return: An iterator that yields once per solution
+        """
+        right, down, size = self.right, self.down, self.size
+        if right[ROOT] == ROOT:
+            yield
+            return
+        # Branch on the column with the fewest rows left
+        header = right[ROOT]
+        best = header
+        while header != ROOT:
+            if size[header] < size[best]:
+                best = header
+                if size[best] <= 1:
+                    break
+            header = right[header]
+        instrumentation = self.instrumentation
+        if instrumentation is not None:
+            instrumentation.candidate_computations += 1
+        if size[best] == 0:
+            return
+        mark = len(self.covered)
+        self._cover(best)
+        row = down[best]
+        while row != best:
+            row_mark = len(self.covered)
+            self.picked.append(self.choice[row])
+            if instrumentation is not None:
+                cell, digit_index = divmod(self.choice[row], self.layout.size)
+                instrumentation.place(self.layout.cell_rows[cell], self.layout.cell_cols[cell], digit_index + 1,
+                                      len(self.picked))
+            node = right[row]
+            while node != row:
+                self._cover(self.column[node])
+                node = right[node]
+            yield from self._search()
+            if instrumentation is not None:
+                cell = self.choice[row] // self.layout.size
+                instrumentation.backtrack(self.layout.cell_rows[cell], self.layout.cell_cols[cell], len(self.picked))
+            self.picked.pop()
+            self._restore(row_mark)
+            row = down[row]
+        self._restore(mark)
+
+    def _get_solution(self) -> list[int]:
+        """
+        Gets the puzzle values for the choices picked so far
+        :return: The values of the puzzle, row by row
+        """
+        solution = list(self.cells)
+        for choice in self.picked:
+            cell, digit_index = divmod(choice, self.layout.size)
+            solution[cell] = digit_index + 1
+        return solution
+
+    def solutions(self, cells: Sequence[int], limit: Optional[int] = None,
+                  instrumentation: Optional[Instrumentation] = None) -> Iterator[list[int]]:
+        """
+        Finds the solutions to a puzzle one at a time
+        :param cells: The values of the puzzle, row by row, 0 being an empty cell
+        :param limit: Optional most solutions to find
+        :param instrumentation: Optional instrumentation to record the search in, see solve
+        :return: An iterator of the values of every solution
+        """
+        if not self.load(cells):
+            return
+        found = 0
+        self.instrumentation = instrumentation
+        try:
+            for _ in self._search():
+                yield self._get_solution()
+                found += 1
+                if limit is not None and found >= limit:
+                    return
+        finally:
+            self.instrumentation = None
+            self._restore(0)
+
+    def solve(self, cells: Sequence[int], instrumentation: Optional[Instrumentation] = None) -> Optional[list[int]]:
+        """
+        Finds a solution to a puzzle
+        :param cells: The values of the puzzle, row by row, 0 being an empty cell
+        :param instrumentation: Optional instrumentation to record the search in. Every choice picked is a placement,
+        every choice taken back is a backtrack, every column picked to branch on is a candidate computation, and the
+        depth is how many choices are picked
+        :return: The values of a solution, or None if there is no solution
+        """
+        with get_phase(instrumentation, 'solve'):
+            if not self.load(cells):
+                return None
+            self.instrumentation = instrumentation
+            search = self._search()
+            try:
+                for _ in search:
+                    return self._get_solution()
+                return None
+            except BudgetExhausted as error:
+                error.partial = self._get_solution()
+                raise
+            finally:
+                search.close()
+                self.instrumentation = None
+                self._restore(0)
+
+    def count_solutions(self, cells: Sequence[int], limit: Optional[int] = None,
+                        instrumentation: Optional[Instrumentation] = None) -> int:
+        """
+        Counts the solutions to a puzzle
+        :param cells: The values of the puzzle, row by row, 0 being an empty cell
+        :param limit: Optional count to stop at, 2 is enough to tell if a puzzle has a unique solution
+        :param instrumentation: Optional instrumentation to record the search in, see solve
+        :return: How many solutions there are, at most limit
+        """
+        with get_phase(instrumentation, 'count'):
+            if not self.load(cells):
+                return 0
+            found = 0
+            self.instrumentation = instrumentation
+            search = self._search()
+            try:
+                for _ in search:
+                    found += 1
+                    if limit is not None and found >= limit:
+                        break
+            finally:
+                search.close()
+                self.instrumentation = None
+                self._restore(0)
+        return found
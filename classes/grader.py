@@ -0,0 +1,419 @@
+import itertools
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+from classes.bitboard import get_layout
+
+# Every technique the grader knows, in the order they are tried, with how hard each is for a person. The weights are
+# close to the ones Sudoku Explainer uses, so ratings can be compared with other graders
+TECHNIQUES: Tuple[Tuple[str, float], ...] = (
+    ('hidden_single', 1.5),
+    ('naked_single', 2.3),
+    ('locked_candidates', 2.6),
+    ('naked_pair', 3.0),
+    ('x_wing', 3.2),
+    ('hidden_pair', 3.4),
+    ('naked_triple', 3.6),
+    ('swordfish', 3.8),
+    ('hidden_triple', 4.0),
+)
+TECHNIQUE_WEIGHTS: Dict[str, float] = dict(TECHNIQUES)
+# The hardest rating each level allows, puzzles that need guessing are always "unsolved"
+LEVELS: Tuple[Tuple[str, float], ...] = (
+    ('easy', 1.5),
+    ('medium', 2.3),
+    ('hard', 2.6),
+    ('expert', 4.0),
+)
+
+
+class Step(NamedTuple):
+    """
+    One thing the grader did: the technique, the (cell, digit) it filled in if any, and the (cell, digit) candidates it
+    ruled out. Cells are flat indexes, row * size + col
+    """
+    technique: str
+    placed: Optional[Tuple[int, int]]
+    eliminated: Tuple[Tuple[int, int], ...]
+
+
+class Grade(NamedTuple):
+    """
+    How hard a puzzle is to solve by logic alone
+    """
+    # True if the techniques were enough to fill in every cell
+    solved: bool
+    # The weight of the hardest technique needed, 0 if nothing was left to do
+    rating: float
+    # The weights of every step added up, so puzzles of the same rating can still be told apart
+    score: float
+    # How many steps used each technique
+    counts: Dict[str, int]
+    # Every step in order, only kept if asked for
+    steps: Tuple[Step, ...]
+
+    @property
+    def level(self) -> str:
+        """
+        The name for how hard the puzzle is
+        :return: easy, medium, hard, or expert, or unsolved if the puzzle needs guessing or has no solution
+        """
+        if not self.solved:
+            return 'unsolved'
+        return next(name for name, rating in LEVELS if self.rating <= rating)
+
+
+class Grader:
+    """
+    Solves puzzles the way a person would, only using the techniques in TECHNIQUES and always trying the easiest one
+    first. The candidates of every cell are kept up to date as cells are filled in, so each technique only has to scan
+    for its pattern. The grader can be reused for many puzzles of its size
+    """
+
+    def __init__(self, box_size: int = 3):
+        """
+        Makes a grader
+        :param box_size: How many rows (and cols) each square has, 3 for a normal 9 by 9 puzzle
+        """
+        self.layout = get_layout(box_size)
+        size = self.layout.size
+        self.rows = self.layout.units[:size]
+        self.cols = self.layout.units[size:2 * size]
+        self.squares = self.layout.units[2 * size:]
+        # Where each line meets each square: the cells they share, the rest of the line, and the rest of the square
+        self.segments: list[Tuple[list[int], list[int], list[int]]] = []
+        for line in self.rows + self.cols:
+            for square_index, square in enumerate(self.squares):
+                shared = [cell for cell in line if self.layout.cell_squares[cell] == square_index]
+                if shared:
+                    self.segments.append((shared, [cell for cell in line if cell not in shared],
+                                          [cell for cell in square if cell not in shared]))
+        # The (unit, position in the unit) of every cell, for the row, the col, and the square
+        box_size = self.layout.box_size
+        self.cell_positions = [
+            ((row, col), (size + col, row), (2 * size + self.layout.cell_squares[row * size + col],
+                                             row % box_size * box_size + col % box_size))
+            for row in range(size) for col in range(size)]
+        # Bit u is set for every unit a cell is in
+        self.cell_unit_bits = [sum(1 << unit for unit, _ in positions) for positions in self.cell_positions]
+        self.cells = [0] * self.layout.num_cells
+        # The digits each empty cell could still hold, 0 for filled in cells
+        self.candidates = [0] * self.layout.num_cells
+        # Bit u is set for every unit with a cell that changed since hidden singles last looked at it
+        self.dirty_units = 0
+        self.empty = 0
+        self.contradiction = False
+        self.counts: Dict[str, int] = {}
+        self.steps: list[Step] = []
+        self.trace = False
+        # Each technique returns True if it made progress
+        self.techniques = [
+            ('hidden_single', self._hidden_singles),
+            ('naked_single', self._naked_singles),
+            ('locked_candidates', self._locked_candidates),
+            ('naked_pair', lambda: self._naked_subsets('naked_pair', 2)),
+            ('x_wing', lambda: self._fish('x_wing', 2)),
+            ('hidden_pair', lambda: self._hidden_subsets('hidden_pair', 2)),
+            ('naked_triple', lambda: self._naked_subsets('naked_triple', 3)),
+            ('swordfish', lambda: self._fish('swordfish', 3)),
+            ('hidden_triple', lambda: self._hidden_subsets('hidden_triple', 3)),
+        ]
+
+    def load(self, cells: Sequence[int]) -> bool:
+        """
+        Loads a puzzle and works out the candidates of every cell
+        :param cells: The values of the puzzle, row by row, 0 being an empty cell
+        :return: True if the puzzle was loaded, False if the values already conflict with each other
+        """
+        layout = self.layout
+        self.cells = [0] * layout.num_cells
+        self.candidates = [layout.full_mask] * layout.num_cells
+        self.empty = layout.num_cells
+        self.dirty_units = (1 << len(layout.units)) - 1
+        self.contradiction = False
+        self.counts = {}
+        self.steps = []
+        if len(cells) != layout.num_cells:
+            return False
+        for cell, value in enumerate(cells):
+            digit = int(value)
+            if digit == 0:
+                continue
+            if not 1 <= digit <= layout.size or self.candidates[cell] & (1 << digit) == 0:
+                return False
+            self._place(cell, digit)
+        return True
+
+    def _place(self, cell: int, digit: int):
+        """
+        Fills in a cell and takes the digit out of the candidates of its peers
+        :param cell: The flat index of the cell
+        :param digit: The digit to put in the cell
+        :return: None, the cell and candidates are updated
+        """
+        candidates = self.candidates
+        cell_unit_bits = self.cell_unit_bits
+        bit = 1 << digit
+        self.cells[cell] = digit
+        candidates[cell] = 0
+        self.empty -= 1
+        dirty_units = self.dirty_units | cell_unit_bits[cell]
+        for peer in self.layout.peers[cell]:
+            if candidates[peer] & bit:
+                candidates[peer] ^= bit
+                dirty_units |= cell_unit_bits[peer]
+                if candidates[peer] == 0:
+                    self.contradiction = True
+        self.dirty_units = dirty_units
+
+    def _record(self, technique: str, placed: Optional[Tuple[int, int]] = None,
+                eliminated: Tuple[Tuple[int, int], ...] = ()):
+        """
+        Counts a step, and keeps it if the steps are being traced
+        :param technique: The technique used
+        :param placed: The (cell, digit) filled in, if any
+        :param eliminated: The (cell, digit) candidates ruled out
+        :return: None, the step is recorded
+        """
+        self.counts[technique] = self.counts.get(technique, 0) + 1
+        if self.trace:
+            self.steps.append(Step(technique, placed, eliminated))
+
+    def _eliminate(self, technique: str, cells: Sequence[int], mask: int) -> bool:
+        """
+        Rules digits out of cells, recording a step if any of them were still candidates
+        :param technique: The technique that ruled them out
+        :param cells: The cells to take the digits out of
+        :param mask: The digits to take out
+        :return: True if any candidate was ruled out
+        """
+        candidates = self.candidates
+        eliminated = []
+        for cell in cells:
+            removed = candidates[cell] & mask
+            if removed:
+                candidates[cell] ^= removed
+                self.dirty_units |= self.cell_unit_bits[cell]
+                if candidates[cell] == 0:
+                    self.contradiction = True
+                if self.trace:
+                    eliminated.extend((cell, digit) for digit in self.layout.mask_digits(removed))
+                else:
+                    # Only whether something was removed matters when not tracing
+                    eliminated.append((cell, 0))
+        if not eliminated:
+            return False
+        self._record(technique, None, tuple(eliminated) if self.trace else ())
+        return True
+
+    def _hidden_singles(self) -> bool:
+        """
+        Fills in every digit that only has one spot left in a row, col, or square. Only units that changed since the
+        last look can have a new one
+        :return: True if any cell was filled in
+        """
+        cells = self.cells
+        candidates = self.candidates
+        units = self.layout.units
+        full_mask = self.layout.full_mask
+        progress = False
+        dirty_units = self.dirty_units
+        self.dirty_units = 0
+        while dirty_units:
+            unit_bit = dirty_units & -dirty_units
+            dirty_units ^= unit_bit
+            unit = units[unit_bit.bit_length() - 1]
+            used = 0
+            seen_once = 0
+            seen_twice = 0
+            for cell in unit:
+                options = candidates[cell]
+                used |= 1 << cells[cell]
+                seen_twice |= seen_once & options
+                seen_once |= options
+            if (used | seen_once) & full_mask != full_mask:
+                self.contradiction = True
+                return progress
+            hidden = seen_once & ~seen_twice
+            while hidden:
+                bit = hidden & -hidden
+                hidden ^= bit
+                spot = next((cell for cell in unit if candidates[cell] & bit), None)
+                if spot is None:
+                    continue
+                digit = bit.bit_length() - 1
+                self._place(spot, digit)
+                self._record('hidden_single', (spot, digit))
+                progress = True
+        return progress
+
+    def _naked_singles(self) -> bool:
+        """
+        Fills in every cell that only has one candidate left
+        :return: True if any cell was filled in
+        """
+        cells = self.cells
+        candidates = self.candidates
+        progress = False
+        for cell in range(self.layout.num_cells):
+            options = candidates[cell]
+            if cells[cell] == 0 and options & (options - 1) == 0:
+                if options == 0:
+                    self.contradiction = True
+                    return progress
+                digit = options.bit_length() - 1
+                self._place(cell, digit)
+                self._record('naked_single', (cell, digit))
+                progress = True
+        return progress
+
+    def _locked_candidates(self) -> bool:
+        """
+        Rules out digits using the overlap of squares and lines. If a digit can only go in one row (or col) of a square,
+        it can't go anywhere else in that row. If it can only go in one square of a row, it can't go anywhere else in
+        that square
+        :return: True if any candidate was ruled out
+        """
+        candidates = self.candidates
+        progress = False
+        for shared, line_rest, square_rest in self.segments:
+            digits = 0
+            for cell in shared:
+                digits |= candidates[cell]
+            if not digits:
+                continue
+            line_digits = 0
+            for cell in line_rest:
+                line_digits |= candidates[cell]
+            square_digits = 0
+            for cell in square_rest:
+                square_digits |= candidates[cell]
+            # Pointing, the square's spots for a digit are all in the line
+            pointing = digits & ~square_digits
+            if pointing & line_digits:
+                progress |= self._eliminate('locked_candidates', line_rest, pointing)
+            # Claiming, the line's spots for a digit are all in the square
+            claiming = digits & ~line_digits
+            if claiming & square_digits:
+                progress |= self._eliminate('locked_candidates', square_rest, claiming)
+        return progress
+
+    def _get_digit_spots(self) -> list[list[int]]:
+        """
+        Works out where every digit can still go in every unit
+        :return: For every unit (rows, then cols, then squares) and every digit, a mask with bit i set if the digit can
+        go in the ith cell of the unit
+        """
+        size = self.layout.size
+        mask_digits = self.layout.mask_digits
+        spots = [[0] * (size + 1) for _ in range(3 * size)]
+        for cell, options in enumerate(self.candidates):
+            if options:
+                digits = mask_digits(options)
+                for unit, position in self.cell_positions[cell]:
+                    unit_spots = spots[unit]
+                    bit = 1 << position
+                    for digit in digits:
+                        unit_spots[digit] |= bit
+        return spots
+
+    def _naked_subsets(self, technique: str, subset_size: int) -> bool:
+        """
+        Rules out digits using groups of cells in a unit that share the same few candidates. If 2 cells can only hold
+        the same 2 digits, no other cell in the unit can hold them
+        :param technique: The name to record steps under
+        :param subset_size: How many cells are in a group
+        :return: True if any candidate was ruled out
+        """
+        mask_count = self.layout.mask_count
+        candidates = self.candidates
+        progress = False
+        for unit in self.layout.units:
+            small = [cell for cell in unit if 2 <= mask_count(candidates[cell]) <= subset_size]
+            if len(small) < subset_size:
+                continue
+            for group in itertools.combinations(small, subset_size):
+                digits = 0
+                for cell in group:
+                    digits |= candidates[cell]
+                if mask_count(digits) == subset_size:
+                    others = [cell for cell in unit if cell not in group]
+                    progress |= self._eliminate(technique, others, digits)
+        return progress
+
+    def _hidden_subsets(self, technique: str, subset_size: int) -> bool:
+        """
+        Rules out digits using groups of digits in a unit that only fit in the same few cells. If 2 digits can only go
+        in the same 2 cells, those cells can't hold anything else
+        :param technique: The name to record steps under
+        :param subset_size: How many digits are in a group
+        :return: True if any candidate was ruled out
+        """
+        layout = self.layout
+        progress = False
+        for unit, spots in zip(layout.units, self._get_digit_spots()):
+            few = [digit for digit in range(1, layout.size + 1)
+                   if 2 <= layout.mask_count(spots[digit] << 1) <= subset_size]
+            if len(few) < subset_size:
+                continue
+            for group in itertools.combinations(few, subset_size):
+                group_spots = 0
+                digits = 0
+                for digit in group:
+                    group_spots |= spots[digit]
+                    digits |= 1 << digit
+                if layout.mask_count(group_spots << 1) == subset_size:
+                    cells = [cell for index, cell in enumerate(unit) if group_spots >> index & 1]
+                    progress |= self._eliminate(technique, cells, layout.full_mask & ~digits)
+        return progress
+
+    def _fish(self, technique: str, fish_size: int) -> bool:
+        """
+        Rules out digits using rows (or cols) where a digit only fits in the same few cols (or rows). If a digit can
+        only go in the same 2 cols of 2 rows, it has to take both of those cols there, so it can't go anywhere else in
+        those cols
+        :param technique: The name to record steps under, x_wing for 2 lines and swordfish for 3
+        :param fish_size: How many lines are in the pattern
+        :return: True if any candidate was ruled out
+        """
+        layout = self.layout
+        size = layout.size
+        digit_spots = self._get_digit_spots()
+        progress = False
+        # Bit i of a line's spots is set if the digit can go where the line crosses the ith cover line
+        for base_spots, cover_lines in ((digit_spots[:size], self.cols), (digit_spots[size:2 * size], self.rows)):
+            for digit in range(1, size + 1):
+                bit = 1 << digit
+                line_spots = [(index, spots[digit]) for index, spots in enumerate(base_spots)
+                              if 2 <= layout.mask_count(spots[digit] << 1) <= fish_size]
+                if len(line_spots) < fish_size:
+                    continue
+                for group in itertools.combinations(line_spots, fish_size):
+                    spots = 0
+                    for _, line_spot in group:
+                        spots |= line_spot
+                    if layout.mask_count(spots << 1) != fish_size:
+                        continue
+                    in_group = {index for index, _ in group}
+                    others = [cell for position, cover in enumerate(cover_lines) if spots >> position & 1
+                              for index, cell in enumerate(cover) if index not in in_group]
+                    progress |= self._eliminate(technique, others, bit)
+        return progress
+
+    def grade(self, cells: Sequence[int], trace: bool = False) -> Grade:
+        """
+        Solves a puzzle with logic alone and rates how hard it was
+        :param cells: The values of the puzzle, row by row, 0 being an empty cell
+        :param trace: If True keep every step, otherwise only count them, which is faster
+        :return: The grade, unsolved if the puzzle needs guessing, has no solution, or its values conflict
+        """
+        self.trace = trace
+        if not self.load(cells):
+            return Grade(False, 0.0, 0.0, {}, ())
+        while self.empty and not self.contradiction:
+            # Start again from the easiest technique every time something changes
+            if not any(technique() for _, technique in self.techniques):
+                break
+        solved = self.empty == 0 and not self.contradiction
+        rating = max((TECHNIQUE_WEIGHTS[name] for name in self.counts), default=0.0)
+        score = sum(TECHNIQUE_WEIGHTS[name] * count for name, count in self.counts.items())
+        return Grade(solved, rating, score, dict(self.counts), tuple(self.steps))
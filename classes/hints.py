@@ -0,0 +1,148 @@
+from typing import TYPE_CHECKING, NamedTuple, Optional, Tuple
+
+from classes.bitboard import get_layout
+
+if TYPE_CHECKING:
+    from classes.puzzle import Puzzle
+
+
+class Hint(NamedTuple):
+    """
+    The next cell a person could fill in without guessing, and the technique that finds it
+    """
+    row: int
+    col: int
+    digit: int
+    # naked_single or hidden_single, named like the grader's techniques
+    technique: str
+
+
+class HintEngine:
+    """
+    Keeps the candidates of every cell of a puzzle up to date while it is played, for pencil marks and hints. A write to
+    a cell can only change the candidates of that cell and its peers, so only those are worked out again. Cells left
+    with one candidate are kept in a set, so finding a naked single doesn't look at the board at all. Get the engine of
+    a puzzle with Puzzle.get_hints, the puzzle tells it about every write
+    """
+
+    def __init__(self, puzzle: 'Puzzle'):
+        """
+        Makes the engine and works out every cell's candidates
+        :param puzzle: The puzzle to follow
+        """
+        self.puzzle = puzzle
+        self.layout = get_layout(puzzle.box_size)
+        self.size = self.layout.size
+        # The value of every cell, row by row
+        self.values: list[int] = []
+        # The candidates of every cell as a mask, 0 for a filled cell
+        self.candidates: list[int] = []
+        # Every empty cell with exactly one candidate, in a dict so it keeps its order
+        self.singles: dict[int, None] = {}
+        # Cells whose value or candidates changed since take_changed was last called
+        self.changed: set[int] = set()
+        # The hint for the board as it is now, worked out the first time it is asked for
+        self._hint: Optional[Hint] = None
+        self._hint_ready = False
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Works out every cell's candidates from scratch, for when much of the grid was written at once
+        :return: None, every cell is marked as changed
+        """
+        self.values = [int(value) for value in self.puzzle.puzzle_grid.ravel().tolist()]
+        self.candidates = [0] * self.layout.num_cells
+        self.singles = {}
+        for cell in range(self.layout.num_cells):
+            self._update_candidates(cell)
+        self.changed = set(range(self.layout.num_cells))
+        self._hint_ready = False
+
+    def cell_changed(self, row: int, col: int, value: int):
+        """
+        Updates the candidates of a cell and its peers after the cell was written
+        :param row: The row of the cell
+        :param col: The col of the cell
+        :param value: The value the cell holds now
+        :return: None
+        """
+        cell = row * self.size + col
+        self.values[cell] = int(value)
+        self.changed.add(cell)
+        self._update_candidates(cell)
+        for peer in self.layout.peers[cell]:
+            if self._update_candidates(peer):
+                self.changed.add(peer)
+        self._hint_ready = False
+
+    def get_candidates(self, row: int, col: int) -> int:
+        """
+        Gets the candidates of a cell
+        :param row: The row of the cell
+        :param col: The col of the cell
+        :return: A mask with bit d set if d could go in the cell, 0 if the cell is filled
+        """
+        return self.candidates[row * self.size + col]
+
+    def take_changed(self) -> set[Tuple[int, int]]:
+        """
+        Gets the cells whose value or candidates changed since the last call, for repainting only those
+        :return: Every changed (row, col)
+        """
+        changed = {divmod(cell, self.size) for cell in self.changed}
+        self.changed = set()
+        return changed
+
+    def get_hint(self) -> Optional[Hint]:
+        """
+        Gets the next cell that can be filled in by logic alone. Naked singles are tried first and are found without a
+        search, hidden singles look through every row, col, and square once
+        :return: The hint, or None if neither technique finds a cell
+        """
+        if not self._hint_ready:
+            self._hint = self._find_hint()
+            self._hint_ready = True
+        return self._hint
+
+    def _find_hint(self) -> Optional[Hint]:
+        size = self.size
+        for cell in self.singles:
+            row, col = divmod(cell, size)
+            return Hint(row, col, self.layout.mask_digits(self.candidates[cell])[0], 'naked_single')
+        candidates = self.candidates
+        for unit in self.layout.units:
+            # Bits seen in one candidate mask, and bits seen in two or more
+            once = 0
+            more = 0
+            for cell in unit:
+                more |= once & candidates[cell]
+                once |= candidates[cell]
+            once &= ~more
+            if once:
+                bit = once & -once
+                for cell in unit:
+                    if candidates[cell] & bit:
+                        row, col = divmod(cell, size)
+                        return Hint(row, col, bit.bit_length() - 1, 'hidden_single')
+        return None
+
+    def _update_candidates(self, cell: int) -> bool:
+        """
+        Works out the candidates of one cell again
+        :param cell: The flat index of the cell
+        :return: True if the candidates changed
+        """
+        if self.values[cell] != 0:
+            candidates = 0
+        else:
+            row, col = divmod(cell, self.size)
+            candidates = ~self.puzzle.get_taken_mask(row, col) & self.layout.full_mask
+        if candidates == self.candidates[cell]:
+            return False
+        self.candidates[cell] = candidates
+        if candidates and candidates & (candidates - 1) == 0:
+            self.singles[cell] = None
+        else:
+            self.singles.pop(cell, None)
+        return True
@@ -0,0 +1,115 @@
+import contextlib
+import time
+from typing import Callable, Dict, Iterator, Optional
+
+# Called with the row, col, digit, and search depth every time a solver or generator fills in a cell
+PlaceHook = Callable[[int, int, int, int], None]
+# Called with the row, col, and search depth every time a solver or generator takes a cell back
+BacktrackHook = Callable[[int, int, int], None]
+
+
+class Instrumentation:
+    """
+    Collects what a solver or generator did while it ran, to find out why a call was slow. Pass one to a solver or
+    generator to fill it in, every counter adds up across calls until reset is called. When none is passed nothing is
+    counted, so the only cost is one check per step
+    """
+
+    def __init__(self, on_place: Optional[PlaceHook] = None, on_backtrack: Optional[BacktrackHook] = None):
+        """
+        Makes an empty instrumentation
+        :param on_place: Optional hook called on every placement
+        :param on_backtrack: Optional hook called on every backtrack
+        """
+        self.on_place = on_place
+        self.on_backtrack = on_backtrack
+        # How many times a digit was put into a cell
+        self.cells_tried = 0
+        # How many times a digit was taken back out of a cell
+        self.backtracks = 0
+        # How many times a move or a whole puzzle was checked to be legal
+        self.validity_checks = 0
+        # How many times the options of a cell were worked out
+        self.candidate_computations = 0
+        # The deepest the search went, in cells filled in by the search
+        self.max_depth = 0
+        # The seconds spent in each named phase
+        self.phase_times: Dict[str, float] = {}
+
+    def reset(self):
+        """
+        Sets every counter and time back to zero, keeping the hooks
+        :return: None
+        """
+        self.cells_tried = 0
+        self.backtracks = 0
+        self.validity_checks = 0
+        self.candidate_computations = 0
+        self.max_depth = 0
+        self.phase_times = {}
+
+    def place(self, row: int, col: int, digit: int, depth: int):
+        """
+        Records a digit being put into a cell
+        :param row: The row of the cell
+        :param col: The col of the cell
+        :param digit: The digit put in
+        :param depth: How many cells the search has filled in, counting this one
+        :return: None
+        """
+        self.cells_tried += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if self.on_place is not None:
+            self.on_place(row, col, digit, depth)
+
+    def backtrack(self, row: int, col: int, depth: int):
+        """
+        Records a digit being taken back out of a cell
+        :param row: The row of the cell
+        :param col: The col of the cell
+        :param depth: How many cells the search had filled in, counting this one
+        :return: None
+        """
+        self.backtracks += 1
+        if self.on_backtrack is not None:
+            self.on_backtrack(row, col, depth)
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Times a phase, adding the wall time to any earlier time for the same name. Phases can be nested
+        :param name: The name of the phase
+        :return: A context manager to run the phase in
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_times[name] = self.phase_times.get(name, 0.0) + time.perf_counter() - start
+
+    def to_dict(self) -> dict:
+        """
+        Gets every counter and time, ready to be sent to metrics or written as json
+        :return: The counters by name, with the phase times under phase_times
+        """
+        return {
+            'cells_tried': self.cells_tried,
+            'backtracks': self.backtracks,
+            'validity_checks': self.validity_checks,
+            'candidate_computations': self.candidate_computations,
+            'max_depth': self.max_depth,
+            'phase_times': dict(self.phase_times),
+        }
+
+
+def get_phase(instrumentation: Optional[Instrumentation], name: str):
+    """
+    Gets a context manager timing a phase, or one that does nothing when there is no instrumentation
+    :param instrumentation: Optional instrumentation to record the phase in
+    :param name: The name of the phase
+    :return: The context manager
+    """
+    if instrumentation is None:
+        return contextlib.nullcontext()
+    return instrumentation.phase(name)
@@ -0,0 +1,109 @@
+import struct
+from typing import NamedTuple, Optional
+
+# The log starts with the magic bytes, the version, 3 unused bytes, the move count, and how many moves are applied
+MAGIC = b'SDKJ'
+VERSION = 1
+LOG_HEADER = struct.Struct('<4sBxxxII')
+# Every move is the cell as 2 bytes, then the old and new values as a byte each
+MOVE = struct.Struct('<HBB')
+
+
+class Move(NamedTuple):
+    """
+    One change to a cell. The cell is a flat index, row * size + col
+    """
+    cell: int
+    old_value: int
+    new_value: int
+
+
+class MoveJournal:
+    """
+    Every move made on a puzzle in order, with a position splitting the moves that are applied from the ones that were
+    undone. Undo and redo only move the position, and making a new move after an undo drops the undone moves, like
+    any editor. The journal can be written to a compact log of 4 bytes a move and read back to replay a session
+    """
+
+    def __init__(self, moves: Optional[list[Move]] = None, position: Optional[int] = None):
+        """
+        Makes a journal
+        :param moves: Optional moves already made
+        :param position: How many of the moves are applied, all of them by default
+        """
+        self.moves: list[Move] = list(moves) if moves is not None else []
+        self.position = len(self.moves) if position is None else position
+        if not 0 <= self.position <= len(self.moves):
+            raise ValueError("The position has to be within the moves")
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, MoveJournal) and self.moves == other.moves and self.position == other.position
+
+    @property
+    def can_undo(self) -> bool:
+        return self.position > 0
+
+    @property
+    def can_redo(self) -> bool:
+        return self.position < len(self.moves)
+
+    def record(self, cell: int, old_value: int, new_value: int):
+        """
+        Adds a move that was just made, dropping any moves that were undone
+        :param cell: The flat index of the cell
+        :param old_value: The value the cell had
+        :param new_value: The value the cell has now
+        :return: None
+        """
+        if self.position < len(self.moves):
+            del self.moves[self.position:]
+        self.moves.append(Move(cell, old_value, new_value))
+        self.position += 1
+
+    def undo(self) -> Optional[Move]:
+        """
+        Steps back over the last applied move, the caller puts the old value back
+        :return: The move to take back, or None if there is nothing to undo
+        """
+        if self.position == 0:
+            return None
+        self.position -= 1
+        return self.moves[self.position]
+
+    def redo(self) -> Optional[Move]:
+        """
+        Steps forward over the next undone move, the caller puts the new value back
+        :return: The move to make again, or None if there is nothing to redo
+        """
+        if self.position == len(self.moves):
+            return None
+        self.position += 1
+        return self.moves[self.position - 1]
+
+    def to_bytes(self) -> bytes:
+        """
+        Writes the journal as a compact log
+        :return: The log
+        """
+        return LOG_HEADER.pack(MAGIC, VERSION, len(self.moves), self.position) + b''.join(
+            MOVE.pack(*move) for move in self.moves)
+
+    @staticmethod
+    def from_bytes(log: bytes) -> 'MoveJournal':
+        """
+        Reads a journal written by to_bytes
+        :param log: The log
+        :return: The journal
+        """
+        if len(log) < LOG_HEADER.size:
+            raise ValueError("The log is too short")
+        magic, version, count, position = LOG_HEADER.unpack_from(log)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a move log, or written by a newer version")
+        if len(log) != LOG_HEADER.size + count * MOVE.size:
+            raise ValueError("The log doesn't hold the number of moves its header says")
+        moves = [Move(*fields) for fields in MOVE.iter_unpack(log[LOG_HEADER.size:])]
+        return MoveJournal(moves, position)
@@ -0,0 +1,266 @@
+import os
+import random
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional, Sequence, Tuple
+
+from classes.grader import LEVELS, Grader
+from classes.puzzle import GENERATORS, Puzzle, puzzle_from_line
+
+# The difficulty of every puzzle in a pool that isn't split by difficulty
+ANY = 'any'
+# Seconds the refill thread waits after a refill fails before trying again, doubled for every failure in a row up to
+# MAX_RETRY_SECONDS
+RETRY_SECONDS = 1.0
+MAX_RETRY_SECONDS = 60.0
+# Most puzzles made in a row without one the pool has room for before giving up. Some kinds never make some
+# difficulties, every solvable puzzle is easy, so without a limit asking for one would never end
+MAX_ATTEMPTS = 200
+
+
+def make_pool_puzzle(kind: str, seed: int, box_size: int, graded: bool) -> Tuple[str, str]:
+    """
+    Makes one puzzle for a pool, this is what each worker runs
+    :param kind: A key of GENERATORS
+    :param seed: The seed for the puzzle's random number generator
+    :param box_size: How many rows (and cols) each square has
+    :param graded: If True the puzzle is graded, otherwise its difficulty is ANY
+    :return: The puzzle as a line, and its difficulty
+    """
+    puzzle = GENERATORS[kind](random.Random(seed), box_size, None)
+    difficulty = puzzle.grade(Grader(box_size)).level if graded else ANY
+    return puzzle.to_line(), difficulty
+
+
+class PuzzlePool:
+    """
+    Keeps puzzles made ahead of time, so getting one doesn't wait for a puzzle to be generated. When any difficulty
+    drops below the low water mark a background thread makes puzzles until every difficulty is full again. With a path
+    the puzzles are saved on close and after each refill, and loaded again when the next pool starts, so even the first
+    puzzle after a restart is instant. Safe to use from several threads
+    """
+
+    def __init__(self, capacity: int = 16, low_water: int = 4, kind: str = 'solvable',
+                 difficulties: Optional[Sequence[str]] = None, path: Optional[str] = None, box_size: int = 3,
+                 workers: int = 0, seed: Optional[int] = None, start: bool = True):
+        """
+        Makes a pool, loading the puzzles saved at path if there are any
+        :param capacity: Most puzzles kept for each difficulty
+        :param low_water: A refill starts once any difficulty has fewer puzzles than this
+        :param kind: The kind of puzzle to make, a key of GENERATORS
+        :param difficulties: Optional grader levels to keep puzzles for, for example ('easy', 'hard'). Puzzles made for
+        a refill that aren't one of these or whose difficulty is full are thrown away. By default puzzles aren't graded
+        :param path: Optional file to save the puzzles in
+        :param box_size: How many rows (and cols) each square has, 3 for a normal 9 by 9 puzzle
+        :param workers: How many processes make puzzles during a refill, 0 makes them on the refill thread
+        :param seed: Optional seed, the same seed makes the same puzzles
+        :param start: If True start the refill thread now, otherwise call start later
+        """
+        if kind not in GENERATORS:
+            raise ValueError(f"Unknown kind of puzzle: {kind}")
+        levels = [name for name, _ in LEVELS] + ['unsolved']
+        for difficulty in difficulties or ():
+            if difficulty not in levels:
+                raise ValueError(f"Unknown difficulty {difficulty}, the grader's levels are {', '.join(levels)}")
+        self.capacity = capacity
+        self.low_water = low_water
+        self.kind = kind
+        self.graded = difficulties is not None
+        self.path = path
+        self.box_size = box_size
+        self.workers = workers
+        self.rng = random.Random(seed)
+        # The puzzles of every difficulty as lines, oldest first
+        self.buckets: dict[str, deque[str]] = {difficulty: deque() for difficulty in difficulties or (ANY,)}
+        # Guards the buckets, and wakes the refill thread when a puzzle is taken
+        self.condition = threading.Condition()
+        self.closed = False
+        # The error from the last refill that failed, None if none has
+        self.last_error: Optional[Exception] = None
+        self.thread = threading.Thread(target=self._refill_forever, name='puzzle-pool', daemon=True)
+        if path is not None:
+            self.load()
+        if start:
+            self.start()
+
+    def start(self):
+        """
+        Starts the refill thread
+        :return: None
+        """
+        self.thread.start()
+
+    def close(self):
+        """
+        Stops the refill thread, letting it finish the puzzle it is making, and saves the pool
+        :return: None
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        if self.thread.is_alive():
+            self.thread.join()
+        if self.path is not None:
+            self.save()
+
+    def __len__(self) -> int:
+        with self.condition:
+            return sum(len(bucket) for bucket in self.buckets.values())
+
+    def count(self, difficulty: str = ANY) -> int:
+        """
+        Counts the puzzles ready for a difficulty
+        :param difficulty: The difficulty
+        :return: How many puzzles are ready
+        """
+        with self.condition:
+            return len(self._get_bucket(difficulty))
+
+    def get(self, difficulty: str = ANY) -> Puzzle:
+        """
+        Takes a puzzle out of the pool. If none are ready one is made right away, like it would be without a pool
+        :param difficulty: The difficulty wanted, one of the pool's difficulties if it was given any
+        :return: The puzzle, raises a ValueError if none is ready and MAX_ATTEMPTS puzzles in a row weren't of the
+        difficulty
+        """
+        with self.condition:
+            bucket = self._get_bucket(difficulty)
+            line = bucket.popleft() if bucket else None
+            if len(bucket) < self.low_water:
+                self.condition.notify_all()
+        attempts = 0
+        while line is None:
+            if attempts == MAX_ATTEMPTS:
+                raise ValueError(f"Made {attempts} {self.kind} puzzles without one of difficulty {difficulty}")
+            attempts += 1
+            line, made_difficulty = make_pool_puzzle(self.kind, self._next_seed(), self.box_size, self.graded)
+            if made_difficulty != difficulty:
+                self._add(line, made_difficulty)
+                line = None
+        return puzzle_from_line(line)
+
+    def fill(self):
+        """
+        Makes puzzles until every difficulty is full, or the pool is closed
+        :return: None, raises a ValueError if MAX_ATTEMPTS puzzles in a row were all thrown away, the puzzles kept so
+        far stay in the pool
+        """
+        # Puzzles made in a row without room for them
+        attempts = 0
+        if self.workers == 0:
+            while not self._is_full():
+                added = self._add(*make_pool_puzzle(self.kind, self._next_seed(), self.box_size, self.graded))
+                attempts = 0 if added else attempts + 1
+                self._check_attempts(attempts)
+            return
+        in_flight: deque[Future] = deque()
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                while not self._is_full():
+                    while len(in_flight) < 2 * self.workers:
+                        in_flight.append(executor.submit(make_pool_puzzle, self.kind, self._next_seed(),
+                                                         self.box_size, self.graded))
+                    added = self._add(*in_flight.popleft().result())
+                    attempts = 0 if added else attempts + 1
+                    self._check_attempts(attempts)
+            finally:
+                for future in in_flight:
+                    future.cancel()
+
+    def load(self):
+        """
+        Adds the puzzles saved at the pool's path, skipping any that don't fit the pool
+        :return: None
+        """
+        if self.path is None or not os.path.exists(self.path):
+            return
+        with open(self.path) as file:
+            for line in file:
+                parts = line.split()
+                if len(parts) != 2 or len(parts[1]) != self.box_size ** 4:
+                    continue
+                try:
+                    puzzle_from_line(parts[1])
+                except ValueError:
+                    continue
+                self._add(parts[1], parts[0])
+
+    def save(self):
+        """
+        Saves the puzzles to the pool's path, one difficulty and puzzle line per line. The file is replaced in one step,
+        so a crash while saving leaves the old file
+        :return: None
+        """
+        with self.condition:
+            lines = [f"{difficulty} {line}\n" for difficulty, bucket in self.buckets.items() for line in bucket]
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, 'w') as file:
+            file.writelines(lines)
+        os.replace(temporary_path, self.path)
+
+    def _get_bucket(self, difficulty: str) -> deque:
+        bucket = self.buckets.get(difficulty)
+        if bucket is None:
+            raise ValueError(f"The pool has no puzzles of difficulty {difficulty}")
+        return bucket
+
+    def _next_seed(self) -> int:
+        with self.condition:
+            return self.rng.getrandbits(64)
+
+    def _add(self, line: str, difficulty: str) -> bool:
+        """
+        Adds a puzzle if the pool keeps its difficulty and has room for it
+        :param line: The puzzle as a line
+        :param difficulty: The difficulty of the puzzle
+        :return: True if the puzzle was added
+        """
+        with self.condition:
+            bucket = self.buckets.get(difficulty)
+            if bucket is None or len(bucket) >= self.capacity:
+                return False
+            bucket.append(line)
+            return True
+
+    def _check_attempts(self, attempts: int):
+        if attempts >= MAX_ATTEMPTS:
+            with self.condition:
+                missing = [difficulty for difficulty, bucket in self.buckets.items() if len(bucket) < self.capacity]
+            raise ValueError(f"Made {attempts} {self.kind} puzzles in a row without one of difficulty "
+                             f"{', '.join(missing)}")
+
+    def _is_full(self) -> bool:
+        with self.condition:
+            return self.closed or all(len(bucket) >= self.capacity for bucket in self.buckets.values())
+
+    def _refill_forever(self):
+        """
+        Waits for the pool to run low and fills it back up, until the pool is closed
+        :return: None
+        """
+        retry_seconds = RETRY_SECONDS
+        while True:
+            with self.condition:
+                while not self.closed and all(len(bucket) >= self.low_water for bucket in self.buckets.values()):
+                    self.condition.wait()
+                if self.closed:
+                    return
+            try:
+                try:
+                    self.fill()
+                finally:
+                    # Save what was made even if the refill stopped early
+                    if self.path is not None:
+                        self.save()
+                retry_seconds = RETRY_SECONDS
+            except Exception as error:
+                # Keep the thread alive so a later refill can still work, but don't spin on an error that keeps coming,
+                # like a difficulty the kind never makes
+                self.last_error = error
+                with self.condition:
+                    if not self.closed:
+                        self.condition.wait(retry_seconds)
+                retry_seconds = min(2 * retry_seconds, MAX_RETRY_SECONDS)
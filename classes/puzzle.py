@@ -1,140 +1,738 @@
+import math
 import random
-from typing import Optional, Tuple, Iterable
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional, Tuple
 
 import numpy as np
 
+from classes.bitboard import BoardLayout, get_layout, get_mask_digits
+from classes.dlx import DancingLinks
+from classes.grader import Grade, Grader
+from classes.budget import Budget, BudgetExhausted
+from classes.core import get_shared_dancing_links, parse_line, to_line
+from classes.hints import HintEngine
+from classes.instrumentation import Instrumentation, get_phase
+from classes.journal import MoveJournal
+from classes.solver import PropagationSolver
 
-def is_legal_set(numbers: np.ndarray) -> bool:
+
+def to_digit(value, size: int = 9) -> int:
+    """
+    Converts a grid value to the digit it holds
+    :param value: A value read from a puzzle grid
+    :param size: How many rows the puzzle has, which is also its biggest digit
+    :return: The digit [0-size], or -1 if the value can't be held by a sudoku cell
+    """
+    if not 0 <= value <= size or value != int(value):
+        return -1
+    return int(value)
+
+
+# Numpy functions that write into an array passed to them
+WRITING_FUNCTIONS = {np.copyto, np.put, np.place, np.putmask, np.fill_diagonal, np.put_along_axis}
+
+
+class TrackedFlatIterator:
+    """
+    The flat iterator of a tracked grid, so writes through grid.flat are seen too
+    """
+
+    def __init__(self, grid: 'TrackedGrid'):
+        self.grid = grid
+        self.iterator = np.ndarray.flat.__get__(grid)
+
+    def __getattr__(self, name: str):
+        return getattr(self.iterator, name)
+
+    def __iter__(self):
+        return iter(self.iterator)
+
+    def __len__(self) -> int:
+        return len(self.iterator)
+
+    def __array__(self, *args, **kwargs):
+        return self.iterator.__array__(*args, **kwargs)
+
+    def __getitem__(self, key):
+        return self.iterator[key]
+
+    def __setitem__(self, key, value):
+        self.iterator[key] = value
+        self.grid.rebuild_owner()
+
+
+class TrackedGrid(np.ndarray):
+    """
+    A numpy grid that tells the puzzle owning it about every write, so the puzzle's occupancy masks stay in sync.
+    Single cell writes are applied to the masks incrementally, anything else (slices, views, in place math, fill, flat,
+    and numpy functions writing into their first argument like np.copyto) makes the owner rebuild its masks from
+    scratch. Writes through a plain array view, like np.asarray(grid) or grid.view(np.ndarray), can't be seen
+    """
+    owner: Optional['Puzzle'] = None
+
+    def __array_finalize__(self, obj):
+        # Views share memory with the owner so writes to them still matter, copies are free to do what they like
+        self.owner = getattr(obj, 'owner', None) if self.base is not None else None
+
+    def __setitem__(self, key, value):
+        owner = self.owner
+        if owner is None:
+            super().__setitem__(key, value)
+            return
+        if owner.puzzle_grid is self and isinstance(key, tuple) and len(key) == 2 and \
+                all(isinstance(index, (int, np.integer)) for index in key):
+            row, col = key[0] % self.shape[0], key[1] % self.shape[1]
+            old_value = np.ndarray.__getitem__(self, (row, col))
+            super().__setitem__(key, value)
+            new_value = np.ndarray.__getitem__(self, (row, col))
+            owner._update_masks(row, col, old_value, new_value)
+            if owner._hints is not None:
+                owner._hints.cell_changed(row, col, new_value)
+        else:
+            super().__setitem__(key, value)
+            owner._rebuild_masks()
+
+    def rebuild_owner(self):
+        """
+        Tells the owning puzzle that any of its cells might have changed
+        :return: None
+        """
+        if self.owner is not None:
+            self.owner._rebuild_masks()
+
+    @property
+    def flat(self) -> TrackedFlatIterator:
+        return TrackedFlatIterator(self)
+
+    @flat.setter
+    def flat(self, value):
+        np.ndarray.flat.__set__(self, value)
+        self.rebuild_owner()
+
+    def fill(self, value):
+        super().fill(value)
+        self.rebuild_owner()
+
+    def put(self, *args, **kwargs):
+        super().put(*args, **kwargs)
+        self.rebuild_owner()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self.rebuild_owner()
+
+    def partition(self, *args, **kwargs):
+        super().partition(*args, **kwargs)
+        self.rebuild_owner()
+
+    def __array_function__(self, func, types, args, kwargs):
+        result = super().__array_function__(func, types, args, kwargs)
+        if func in WRITING_FUNCTIONS:
+            for x in (*args, *kwargs.values()):
+                if isinstance(x, TrackedGrid):
+                    x.rebuild_owner()
+        return result
+
+    def __array_ufunc__(self, ufunc, method, *inputs, out=None, **kwargs):
+        # Do the math on plain arrays, so results aren't tracked and in place writes can be seen
+        inputs = tuple(x.view(np.ndarray) if isinstance(x, TrackedGrid) else x for x in inputs)
+        if out is None:
+            return getattr(ufunc, method)(*inputs, **kwargs)
+        plain_out = tuple(x.view(np.ndarray) if isinstance(x, TrackedGrid) else x for x in out)
+        getattr(ufunc, method)(*inputs, out=plain_out, **kwargs)
+        for x in out:
+            if isinstance(x, TrackedGrid) and x.owner is not None:
+                x.owner._rebuild_masks()
+        return out[0] if len(out) == 1 else out
+
+
+def is_legal_set(numbers: np.ndarray, size: int = 9) -> bool:
     """
     Returns if the set of numbers is legal
     :param numbers: The numbers in the set
+    :param size: How many numbers a full set holds
     :return: True if legal, false if illegal
     """
     numbers = numbers.flatten()
     num_zeros = np.count_nonzero(numbers == 0)
     number_set = set(numbers)
     number_set.discard(0)
-    return num_zeros + len(number_set) == 9
+    return num_zeros + len(number_set) == size
 
 
-def get_square_index(index: int):
+def get_square_index(index: int, box_size: int = 3):
     """
     Gets the index for the large square this belongs to
     :param index: The index into the whole puzzle
+    :param box_size: How many rows (and cols) each square has
     :return: The index of the square
     """
-    return index // 3
+    return index // box_size
+
+
+def get_box_size(size: int) -> int:
+    """
+    Gets the size of the squares of a puzzle
+    :param size: How many rows (and cols) the puzzle has
+    :return: How many rows (and cols) each square has, raises a ValueError if size isn't a square number
+    """
+    box_size = math.isqrt(size)
+    if box_size * box_size != size:
+        raise ValueError(f"A puzzle with {size} rows can't be split into squares")
+    return box_size
+
+
+def puzzle_from_line(line: str) -> 'Puzzle':
+    """
+    Reads a puzzle written as one line, row by row, with 0 or . for an empty cell. A 9 by 9 puzzle is 81 characters of
+    0-9, bigger puzzles (256 characters for 16 by 16) use letters for numbers past 9, so 16 is G
+    :param line: The line to read, surrounding whitespace is ignored
+    :return: The puzzle, raises a ValueError if the line isn't a valid puzzle
+    """
+    cells, box_size = parse_line(line)
+    size = box_size * box_size
+    return Puzzle(np.array(cells, dtype=np.int8).reshape(size, size), box_size=box_size)
 
 
-def make_puzzle_answer_key() -> 'Puzzle':
+def get_rng(rng: Optional[random.Random] = None) -> random.Random:
+    """
+    Gets the random number generator a generator should use
+    :param rng: The random number generator passed to the generator, if any
+    :return: The generator passed in, or a new one seeded from the global random state
+    """
+    if rng is not None:
+        return rng
+    return random.Random(random.getrandbits(64))
+
+
+def permute_grid(grid: np.ndarray, rng: random.Random) -> np.ndarray:
+    """
+    Shuffles a grid in ways that keep a solved grid solved: bands, rows within bands, stacks, cols within stacks, the
+    digits, and maybe a transpose
+    :param grid: The (9, 9) grid to shuffle, or any other square size
+    :param rng: The random number generator to shuffle with
+    :return: A new shuffled grid
+    """
+    size = len(grid)
+    box = get_box_size(size)
+    rows = [band * box + row for band in rng.sample(range(box), box) for row in rng.sample(range(box), box)]
+    cols = [stack * box + col for stack in rng.sample(range(box), box) for col in rng.sample(range(box), box)]
+    digits = np.array([0] + rng.sample(range(1, size + 1), size), dtype=np.int8)
+    permuted = digits[np.asarray(grid, dtype=np.int8)[np.ix_(rows, cols)]]
+    if rng.random() < 0.5:
+        permuted = permuted.T
+    return np.ascontiguousarray(permuted)
+
+
+def get_seed_grid(box_size: int = 3) -> np.ndarray:
+    """
+    Makes a solved grid that permute_grid can turn into many others
+    :param box_size: How many rows (and cols) each square has
+    :return: The solved grid
+    """
+    size = box_size * box_size
+    return np.array([[(row * box_size + row // box_size + col) % size + 1 for col in range(size)]
+                     for row in range(size)], dtype=np.int8)
+
+
+# The seed grid for a normal 9 by 9 puzzle
+SEED_GRID = get_seed_grid()
+
+
+def make_puzzle_answer_key(rng: Optional[random.Random] = None, from_seed_grid: bool = False,
+                           box_size: int = 3, instrumentation: Optional[Instrumentation] = None) -> 'Puzzle':
     """
     Generates a puzzle that has all the numbers already filled in
+    :param rng: Optional random number generator, pass a seeded one to get the same puzzle every time
+    :param from_seed_grid: If True shuffle a fixed solved grid instead of searching. Much faster, but only reaches
+    grids that are a shuffle of the seed grid
+    :param box_size: How many rows (and cols) each square has, 3 for a normal 9 by 9 puzzle. From 4 up the grid is
+    made by fill_diagonal_squares
+    :param instrumentation: Optional instrumentation to record the search in, timed as the fill phase
     :return: A puzzle with all numbers filled in
     """
-    puzzle = Puzzle()
-    adjustments: list[Tuple[int, int]] = []
-    bad_adjustments: dict[Tuple[int, int], list[int]] = {}
-    while not puzzle.is_puzzle_solved():
-        spaces_possibilities: list[list[Tuple[int, int]]] = [[] for _ in range(10)]
-        for row in range(9):
-            for col in range(9):
-                # Append this row col to the list with the number of options left for this spot
-                spaces_possibilities[len(puzzle.get_options_for_index(
-                    row, col, bad_adjustments.get((row, col), [])))].append((row, col))
-        # look at the elements that have no options to see if any are still zero
-        zero_options_list = spaces_possibilities.pop(0)
-        blocked_cell = any(map(lambda x: puzzle.puzzle_grid[x[0], x[1]] == 0, zero_options_list))
-        # Need to undo if everything is empty
-        if blocked_cell:
-            # Get the last move added
-            last_move = adjustments.pop()
-            # Get that guess's value
-            bad_value = puzzle.puzzle_grid[last_move[0], last_move[1]]
-            # Add a map element if not already there
-            if last_move not in bad_adjustments:
-                bad_adjustments[last_move] = []
-            # add this bad guess, so we don't guess it again
-            bad_adjustments[last_move].append(bad_value)
-            # Put a zero back in the guess's spot, so we can update with a new value later
-            puzzle.puzzle_grid[last_move[0], last_move[1]] = 0
-            continue
-        # We can still place numbers so guess again
-        non_empty_lists = list(filter(lambda x: len(x) != 0, spaces_possibilities))
-        first_non_empty = non_empty_lists[0]
-        row_to_update, col_to_update = random.choice(first_non_empty)
-        value_to_update_with = np.random.choice(list(
-            puzzle.get_options_for_index(
-                row_to_update, col_to_update, bad_adjustments.get((row_to_update, col_to_update), []))))
-        puzzle.puzzle_grid[row_to_update, col_to_update] = value_to_update_with
-        adjustments.append((row_to_update, col_to_update))
-
-    return puzzle
-
-
-def make_solvable_puzzle() -> 'Puzzle':
+    rng = get_rng(rng)
+    with get_phase(instrumentation, 'fill'):
+        if from_seed_grid:
+            return Puzzle(permute_grid(get_seed_grid(box_size), rng), box_size=box_size)
+        layout = get_layout(box_size)
+        cells = [0] * layout.num_cells
+        try:
+            if box_size >= 4:
+                fill_diagonal_squares(cells, layout, rng, instrumentation)
+            else:
+                fill_cells(cells, layout, rng, instrumentation)
+        except BudgetExhausted as error:
+            if error.partial is None:
+                error.partial = list(cells)
+            raise
+        return Puzzle(np.reshape(np.array(cells, dtype=np.int8), (layout.size, layout.size)), box_size=box_size)
+
+
+def fill_cells(cells: list[int], layout: BoardLayout, rng: random.Random, instrumentation: Optional[Instrumentation]):
+    """
+    Fills in an empty grid by guessing in the cells with the fewest options, undoing guesses that leave a cell stuck
+    :param cells: The empty grid, row by row
+    :param layout: The layout of the board
+    :param rng: The random number generator picking the cells and digits
+    :param instrumentation: Optional instrumentation to record the search in
+    :return: None, the cells are filled in
+    """
+    mask_count = layout.mask_count
+    # The digits each cell could still hold, kept up to date as cells are filled in and emptied
+    options = [layout.full_mask] * layout.num_cells
+    # Every guess made: the cell, the digits not tried there yet, and how long the trail was before the guess
+    guesses: list[list[int]] = []
+    # Every cell that lost an option to a guess, so the guess can be undone
+    trail: list[int] = []
+    while True:
+        # Find the empty cells with the fewest options
+        fewest = layout.size + 1
+        fewest_cells: list[int] = []
+        for cell in range(layout.num_cells):
+            if cells[cell] == 0:
+                count = mask_count(options[cell])
+                if count < fewest:
+                    fewest = count
+                    fewest_cells = [cell]
+                elif count == fewest:
+                    fewest_cells.append(cell)
+        if instrumentation is not None:
+            # Every guess made fills in a cell, and the options of every other cell were just counted
+            instrumentation.candidate_computations += layout.num_cells - len(guesses)
+        if not fewest_cells:
+            break
+        # Guess in one of them, unless one is stuck in which case the last guess has to change
+        if fewest != 0:
+            cell = rng.choice(fewest_cells)
+            guesses.append([cell, options[cell], len(trail)])
+        # Undo the latest guess, going back further while a guess has no digits left to try
+        while True:
+            cell, untried, mark = guesses[-1]
+            if cells[cell] != 0:
+                bit = 1 << cells[cell]
+                while len(trail) > mark:
+                    options[trail.pop()] |= bit
+                cells[cell] = 0
+                if instrumentation is not None:
+                    instrumentation.backtrack(layout.cell_rows[cell], layout.cell_cols[cell], len(guesses))
+            if untried != 0:
+                break
+            guesses.pop()
+        # Try another digit
+        digit = rng.choice(layout.mask_digits(untried))
+        bit = 1 << digit
+        guesses[-1][1] = untried & ~bit
+        cells[cell] = digit
+        if instrumentation is not None:
+            instrumentation.place(layout.cell_rows[cell], layout.cell_cols[cell], digit, len(guesses))
+        for peer in layout.peers[cell]:
+            if cells[peer] == 0 and options[peer] & bit:
+                options[peer] &= ~bit
+                trail.append(peer)
+
+
+def fill_diagonal_squares(cells: list[int], layout: BoardLayout, rng: random.Random,
+                          instrumentation: Optional[Instrumentation]):
+    """
+    Fills in an empty grid by shuffling digits into the squares on the diagonal, which don't share a row or col, then
+    solving the rest with propagation. Guessing alone gets lost on big grids (a 25 by 25 grid could take minutes),
+    filling in singles first keeps every size under about a second
+    :param cells: The empty grid, row by row
+    :param layout: The layout of the board
+    :param rng: The random number generator shuffling the diagonal squares
+    :param instrumentation: Optional instrumentation to record the search in
+    :return: None, the cells are filled in
+    """
+    box_size = layout.box_size
+    for box in range(box_size):
+        digits = list(range(1, layout.size + 1))
+        rng.shuffle(digits)
+        for index, digit in enumerate(digits):
+            row = box * box_size + index // box_size
+            col = box * box_size + index % box_size
+            cells[row * layout.size + col] = digit
+            if instrumentation is not None:
+                instrumentation.place(row, col, digit, 0)
+    # Squares that don't share a row or col can always be finished, so there is always a solution
+    cells[:] = PropagationSolver(box_size).solve(cells, instrumentation)
+
+
+def make_solvable_puzzle(rng: Optional[random.Random] = None, box_size: int = 3,
+                         instrumentation: Optional[Instrumentation] = None) -> 'Puzzle':
     """
     Generates a solvable puzzle. Typically, fairly easy to solve
+    :param rng: Optional random number generator, pass a seeded one to get the same puzzle every time
+    :param box_size: How many rows (and cols) each square has, 3 for a normal 9 by 9 puzzle
+    :param instrumentation: Optional instrumentation to record the fill and remove phases in
     :return: A puzzle with gaps, but solvable
     """
-    answer_key = make_puzzle_answer_key()
-    puzzle = Puzzle(answer_key.puzzle_grid)
+    rng = get_rng(rng)
+    answer_key = make_puzzle_answer_key(rng, box_size=box_size, instrumentation=instrumentation)
+    puzzle = Puzzle(answer_key.puzzle_grid, box_size=box_size)
     # Make all the indexes and shuffle them
-    indexes = [(i, j) for i in range(9) for j in range(9)]
-    random.shuffle(indexes)
-    # For each index try to remove it, and if there is still a trivial solvable element the puzzle can still be solved
-    for row, col in indexes:
-        # Try to remove the element
-        old_value = puzzle.puzzle_grid[row, col]
-        puzzle.puzzle_grid[row, col] = 0
-        still_no_guess = False
-        # Check there's still an easy element to solve
-        for i in range(9):
-            for j in range(9):
-                if len(puzzle.get_options_for_index(row, col)) == 1:
-                    still_no_guess = True
-        # If there's not an easy solution any more put the number back
-        if not still_no_guess:
-            puzzle.puzzle_grid[row, col] = old_value
+    indexes = [(i, j) for i in range(puzzle.size) for j in range(puzzle.size)]
+    rng.shuffle(indexes)
+    # For each index try to remove it, and if it can still be filled in without guessing the puzzle can still be solved
+    with get_phase(instrumentation, 'remove'):
+        for row, col in indexes:
+            # Try to remove the element
+            old_value = puzzle.puzzle_grid[row, col]
+            puzzle.puzzle_grid[row, col] = 0
+            # If the removed element has more than one option now it would need a guess, so put the number back
+            if puzzle.layout.mask_count(puzzle.get_options_mask(row, col)) != 1:
+                puzzle.puzzle_grid[row, col] = old_value
+        if instrumentation is not None:
+            instrumentation.candidate_computations += len(indexes)
     # Return this puzzle
-    return Puzzle(puzzle.puzzle_grid)
+    return Puzzle(puzzle.puzzle_grid, box_size=box_size)
+
+
+def make_unique_puzzle(solver: Optional[DancingLinks] = None, rng: Optional[random.Random] = None,
+                       box_size: int = 3, instrumentation: Optional[Instrumentation] = None) -> Tuple['Puzzle', int]:
+    """
+    Generates a puzzle with exactly one solution, removing every number it can while the solution stays unique.
+    Typically, harder than make_solvable_puzzle
+    :param solver: Optional solver to count solutions with, it is reused for every removal. By default this
+    thread's shared solver for the puzzle size is used
+    :param rng: Optional random number generator, pass a seeded one to get the same puzzle every time
+    :param box_size: How many rows (and cols) each square has, 3 for a normal 9 by 9 puzzle
+    :param instrumentation: Optional instrumentation to record the fill and remove phases in, along with every search
+    the solver makes while counting solutions. Each count is a validity check
+    :return: The puzzle, and how many times the solver had to count solutions (at most one per cell)
+    """
+    if solver is None:
+        solver = get_shared_dancing_links(box_size)
+    rng = get_rng(rng)
+    answer_key = make_puzzle_answer_key(rng, box_size=box_size, instrumentation=instrumentation)
+    puzzle = Puzzle(answer_key.puzzle_grid, box_size=box_size)
+    size = puzzle.size
+    cells = puzzle.puzzle_grid.ravel().tolist()
+    solver_calls = 0
+    # Make all the indexes and shuffle them
+    indexes = [(i, j) for i in range(size) for j in range(size)]
+    rng.shuffle(indexes)
+    with get_phase(instrumentation, 'remove'):
+        for row, col in indexes:
+            # Try to remove the element
+            old_value = cells[row * size + col]
+            puzzle.puzzle_grid[row, col] = 0
+            cells[row * size + col] = 0
+            # If the removed element only has one option left it is forced, so the solution is still unique
+            if puzzle.layout.mask_count(puzzle.get_options_mask(row, col)) == 1:
+                continue
+            # Otherwise count solutions, but finding a second one is enough to know the number has to go back
+            solver_calls += 1
+            try:
+                is_unique = solver.count_solutions(cells, 2, instrumentation) == 1
+            except BudgetExhausted as error:
+                # Every number removed so far kept the solution unique, so with this one put back it's a usable puzzle
+                cells[row * size + col] = old_value
+                error.partial = cells
+                raise
+            if not is_unique:
+                puzzle.puzzle_grid[row, col] = old_value
+                cells[row * size + col] = old_value
+        if instrumentation is not None:
+            instrumentation.candidate_computations += len(indexes)
+            instrumentation.validity_checks += solver_calls
+    return Puzzle(puzzle.puzzle_grid, box_size=box_size), solver_calls
+
+
+# The ways a search with a budget can end
+SOLVED = 'solved'
+UNSOLVABLE = 'unsolvable'
+BUDGET_EXHAUSTED = 'budget_exhausted'
+
+
+class SearchResult(NamedTuple):
+    """
+    How a solve or generation with a budget ended
+    """
+    # SOLVED, UNSOLVABLE, or BUDGET_EXHAUSTED
+    status: str
+    # The solution or generated puzzle, or if the budget ran out the grid as far as the search got, when there is one
+    puzzle: Optional['Puzzle']
+    # Why the budget ran out: deadline, nodes, or cancelled
+    reason: Optional[str] = None
+
+
+def generate_with_budget(generator: Callable[[Budget], 'Puzzle'], budget: Budget, box_size: int = 3) -> SearchResult:
+    """
+    Generates a puzzle, stopping once the budget runs out
+    :param generator: Makes the puzzle, passing the budget along as its instrumentation, for example
+    lambda budget: make_unique_puzzle(rng=rng, instrumentation=budget)[0]
+    :param budget: The budget
+    :param box_size: How many rows (and cols) each square of the puzzle has
+    :return: SOLVED with the puzzle, or BUDGET_EXHAUSTED with the grid as far as it got. When make_unique_puzzle runs
+    out while removing numbers that grid is still a puzzle with a unique solution, just with more numbers in it
+    """
+    try:
+        return SearchResult(SOLVED, generator(budget))
+    except BudgetExhausted as error:
+        partial = None
+        if error.partial is not None:
+            size = box_size * box_size
+            partial = Puzzle(np.reshape(np.array(error.partial, dtype=np.int8), (size, size)), box_size=box_size)
+        return SearchResult(BUDGET_EXHAUSTED, partial, error.reason)
 
 
 class Puzzle:
 
-    def __init__(self, grid: Optional[np.ndarray] = None, selected: Optional[Tuple[int, int]] = None):
+    def __init__(self, grid: Optional[np.ndarray] = None, selected: Optional[Tuple[int, int]] = None,
+                 box_size: int = 3):
         """
         Makes a puzzle grid
-        :param grid: A grid already holding some values. If passed this will be used as the grid if a correct size and
-        contains values [0-9], otherwise an exception is raised
+        :param grid: A grid already holding some values. If passed a copy of it is used as the grid if a correct size
+        and contains values [0-size], otherwise an exception is raised. Later writes to the passed array don't change
+        the puzzle, write through puzzle_grid instead
+        :param box_size: How many rows (and cols) each square has, 3 for a normal 9 by 9 puzzle, 4 for 16 by 16
         """
+        self.box_size = box_size
+        # How many rows and cols the puzzle has, which is also its biggest digit
+        self.size = box_size * box_size
+        self.layout = get_layout(box_size)
         # Set the grid to what was passed or an empty grid
         if grid is None:
-            self.puzzle_grid = np.zeros((9, 9), dtype=np.int8)
-        else:
-            self.puzzle_grid = grid
+            grid = np.zeros((self.size, self.size), dtype=np.int8)
+        # Follows every write once get_hints is called
+        self._hints: Optional[HintEngine] = None
+        self.puzzle_grid = grid
         self.selected: Optional[Tuple[int, int]] = selected
-        # Get all indexes that are in the original puzzle
-        self.original_indexes = list(filter(lambda x: self.puzzle_grid[x] != 0,
-                                            [(i, j) for i in range(9) for j in range(9)]))
-        # Now make sure the grid is valid, and if not raise an exception
-        if not self.is_puzzle_valid():
+        # Every move made with safe_update, for undo and redo
+        self.journal = MoveJournal()
+        # Mark every cell that is in the original puzzle
+        self._set_given_mask(np.asarray(self.puzzle_grid) != 0)
+        # Now make sure the grid is valid, and if not raise an exception. The masks were just built and already know
+        # about repeated digits, only values that aren't digits need the full check to get the same answer as before
+        if self._conflicts != 0 or (self._illegal_cells != 0 and not self.is_puzzle_valid()):
             raise ValueError("The input grid was not valid")
 
+    @property
+    def puzzle_grid(self) -> np.ndarray:
+        """
+        The grid of numbers, 0 being an empty cell. Writes made through this grid keep the occupancy masks up to date.
+        Setting it takes a copy of the new grid
+        :return: The grid of the puzzle
+        """
+        return self._puzzle_grid
+
+    @puzzle_grid.setter
+    def puzzle_grid(self, grid: np.ndarray):
+        # A copy, so writes through the caller's array can't get past the masks
+        tracked_grid = np.array(grid).view(TrackedGrid)
+        tracked_grid.owner = self
+        self._puzzle_grid = tracked_grid
+        self._rebuild_masks()
+
+    def _set_given_mask(self, given_mask: np.ndarray):
+        """
+        Sets which cells are in the original puzzle
+        :param given_mask: A bool grid, True for the original cells
+        :return: None, the mask and bitboard are set
+        """
+        self._given_mask = np.array(given_mask, dtype=bool)
+        self._given_mask.flags.writeable = False
+        # Bit row * size + col is set for every original cell, for lookups without touching numpy
+        self._given_bits = int.from_bytes(np.packbits(self._given_mask.ravel(), bitorder='little').tobytes(), 'little')
+        self._original_indexes: Optional[Tuple[Tuple[int, int], ...]] = None
+
+    @property
+    def given_mask(self) -> np.ndarray:
+        """
+        Which cells are in the original puzzle, for drawing or checking many cells at once
+        :return: A read only bool grid, True for the original cells
+        """
+        return self._given_mask
+
+    def is_given(self, row: int, col: int) -> bool:
+        """
+        Checks if a cell is in the original puzzle
+        :param row: the row of the cell, negative ones count from the end like numpy indexes
+        :param col: the col of the cell, negative ones count from the end like numpy indexes
+        :return: True if the cell is an original one, which can't be changed. Raises an IndexError if the cell isn't
+        on the board
+        """
+        size = self.size
+        if not (-size <= row < size and -size <= col < size):
+            raise IndexError(f"({row}, {col}) is not on a {size} by {size} board")
+        return bool(self._given_bits >> (row % size * size + col % size) & 1)
+
+    @property
+    def original_indexes(self) -> list[Tuple[int, int]]:
+        """
+        Every (row, col) in the original puzzle. Only kept for compatibility, is_given and given_mask are faster
+        :return: The original cells, row by row, in a new list so changing it doesn't change the puzzle
+        """
+        if self._original_indexes is None:
+            self._original_indexes = tuple((int(row), int(col)) for row, col in np.argwhere(self._given_mask))
+        return list(self._original_indexes)
+
+    @original_indexes.setter
+    def original_indexes(self, original_indexes: list[Tuple[int, int]]):
+        given_mask = np.zeros((self.size, self.size), dtype=bool)
+        for row, col in original_indexes:
+            given_mask[row, col] = True
+        self._set_given_mask(given_mask)
+
+    def __getstate__(self) -> dict:
+        # The grid's link back to the puzzle doesn't survive pickling, so store it plain and rebuild on load
+        state = self.__dict__.copy()
+        state['_puzzle_grid'] = np.asarray(self._puzzle_grid)
+        # The hint engine is cheap to make again and would only drag the puzzle along
+        state['_hints'] = None
+        return state
+
+    def __setstate__(self, state: dict):
+        grid = state.pop('_puzzle_grid')
+        self.__dict__.update(state)
+        self.puzzle_grid = grid
+
+    def _rebuild_masks(self):
+        """
+        Recomputes the row, col, and square occupancy masks from the grid
+        :return: None, the masks are rebuilt
+        """
+        # How many times each digit shows up in each row, col, and square, so a duplicate can be removed safely
+        size = self.size
+        self._row_counts = [[0] * (size + 1) for _ in range(size)]
+        self._col_counts = [[0] * (size + 1) for _ in range(size)]
+        self._square_counts = [[0] * (size + 1) for _ in range(size)]
+        # Bit d is set if digit d shows up at least once
+        self._row_masks = [0] * size
+        self._col_masks = [0] * size
+        self._square_masks = [0] * size
+        # How many extra copies of digits there are across all rows, cols, and squares, 0 means no conflicts
+        self._conflicts = 0
+        # Anything that isn't a digit (or a grid of the wrong shape) makes the puzzle illegal
+        self._illegal_cells = 0
+        if self._puzzle_grid.shape != (size, size):
+            self._illegal_cells = 1
+            return
+        # Plain Python values are much faster to look at one by one than numpy scalars
+        for row, values in enumerate(self._puzzle_grid.view(np.ndarray).tolist()):
+            for col, value in enumerate(values):
+                self._update_masks(row, col, 0, value)
+        if self._hints is not None:
+            self._hints.rebuild()
+
+    def _update_masks(self, row: int, col: int, old_value, new_value):
+        """
+        Moves the masks from one value in a cell to another
+        :param row: The row that was written
+        :param col: The col that was written
+        :param old_value: The value the cell used to hold
+        :param new_value: The value the cell holds now
+        :return: None, the masks are updated
+        """
+        box_size = self.box_size
+        square = get_square_index(row, box_size) * box_size + get_square_index(col, box_size)
+        old_digit = to_digit(old_value, self.size)
+        if old_digit == -1:
+            self._illegal_cells -= 1
+        elif old_digit != 0:
+            bit = 1 << old_digit
+            for counts, masks, unit in ((self._row_counts, self._row_masks, row),
+                                        (self._col_counts, self._col_masks, col),
+                                        (self._square_counts, self._square_masks, square)):
+                counts[unit][old_digit] -= 1
+                if counts[unit][old_digit] == 0:
+                    masks[unit] &= ~bit
+                else:
+                    self._conflicts -= 1
+        new_digit = to_digit(new_value, self.size)
+        if new_digit == -1:
+            self._illegal_cells += 1
+        elif new_digit != 0:
+            bit = 1 << new_digit
+            for counts, masks, unit in ((self._row_counts, self._row_masks, row),
+                                        (self._col_counts, self._col_masks, col),
+                                        (self._square_counts, self._square_masks, square)):
+                if counts[unit][new_digit] != 0:
+                    self._conflicts += 1
+                counts[unit][new_digit] += 1
+                masks[unit] |= bit
+
+    def is_update_valid(self, row: int, col: int, value: int) -> bool:
+        """
+        Checks if writing a value into a cell would leave the puzzle valid. Only the row, col, and square of the cell
+        are looked at, so this is much cheaper than writing the value and calling is_puzzle_valid
+        :param row: row to change
+        :param col: col to change
+        :param value: the value that would be written
+        :return: True if the puzzle would be valid after the write, False if it would not
+        """
+        old_digit = to_digit(self._puzzle_grid[row, col], self.size)
+        new_digit = to_digit(value, self.size)
+        if new_digit == -1 or self._illegal_cells - (old_digit == -1) != 0:
+            return False
+        conflicts = self._conflicts
+        if old_digit != new_digit:
+            box_size = self.box_size
+            square = get_square_index(row, box_size) * box_size + get_square_index(col, box_size)
+            for counts in (self._row_counts[row], self._col_counts[col], self._square_counts[square]):
+                if old_digit > 0 and counts[old_digit] > 1:
+                    conflicts -= 1
+                if new_digit > 0 and counts[new_digit] > 0:
+                    conflicts += 1
+        return conflicts == 0
+
+    def get_taken_mask(self, row: int, col: int) -> int:
+        """
+        Gets the digits already used by the row, col, and square of a cell
+        :param row: the row of the cell
+        :param col: the col of the cell
+        :return: A mask with bit d set if d is used in the row, col, or square
+        """
+        box_size = self.box_size
+        return self._row_masks[row] | self._col_masks[col] | \
+            self._square_masks[get_square_index(row, box_size) * box_size + get_square_index(col, box_size)]
+
+    def get_options_mask(self, row: int, col: int) -> int:
+        """
+        Gets all remaining numbers that COULD go into an index as a mask
+        :param row: the row of the element
+        :param col: the col of the element
+        :return: A mask with bit d set if d could be placed into the spot, 0 if the spot is already filled
+        """
+        if self._puzzle_grid[row, col] != 0:
+            return 0
+        return ~self.get_taken_mask(row, col) & self.layout.full_mask
+
+    def get_hints(self) -> HintEngine:
+        """
+        Gets the engine keeping every cell's candidates up to date, making it the first time. Until then writes don't
+        pay for keeping candidates
+        :return: The hint engine of the puzzle
+        """
+        if self._hints is None:
+            self._hints = HintEngine(self)
+        return self._hints
+
     def __str__(self) -> str:
-        # Make a pretty 3 by 3 puzzle with borders
-        pretty_puzzle = '_' * 19
-        for i in range(9):
+        # Make a pretty puzzle with borders around the squares, numbers past 9 get a wider cell
+        width = len(str(self.size))
+        square_border = '_' * (self.box_size * (width + 1) - 1)
+        pretty_puzzle = '_' * (self.size * (width + 1) + 1)
+        for i in range(self.size):
             pretty_puzzle += '\n|'
-            for j in range(9):
-                pretty_puzzle += str(self.puzzle_grid[i, j])
-                if (j + 1) % 3 == 0:
+            for j in range(self.size):
+                pretty_puzzle += str(self.puzzle_grid[i, j]).rjust(width)
+                if (j + 1) % self.box_size == 0:
                     pretty_puzzle += '|'
                 else:
                     pretty_puzzle += ' '
-            if (i + 1) % 3 == 0:
-                pretty_puzzle += '\n|' + '_____+' * 2 + '_____|'
+            if (i + 1) % self.box_size == 0:
+                pretty_puzzle += '\n|' + (square_border + '+') * (self.box_size - 1) + square_border + '|'
         return pretty_puzzle
 
+    def to_line(self) -> str:
+        """
+        Writes the puzzle as one line, row by row, 0 being an empty cell. A 9 by 9 puzzle is 81 digits, bigger puzzles
+        use letters for numbers past 9 the way puzzle_from_line reads them
+        :return: The line, without a newline
+        """
+        return to_line(self.puzzle_grid.ravel().tolist())
+
     def is_puzzle_empty(self) -> bool:
         """
         Returns if no numbers are in the puzzle (ie all numbers are zero)
@@ -149,31 +747,34 @@ class Puzzle:
         :param square_col: The square col
         :return:
         """
-        return self.puzzle_grid[square_row * 3:square_row * 3 + 3, square_col * 3:square_col * 3 + 3]
+        box_size = self.box_size
+        return self.puzzle_grid[square_row * box_size:(square_row + 1) * box_size,
+                                square_col * box_size:(square_col + 1) * box_size]
 
     def is_puzzle_valid(self) -> bool:
         """
-        Checks to see if each row, col, and square has no conflict (two of the same numbers)
+        Checks to see if each row, col, and square has no conflict (two of the same numbers). This rescans the whole
+        grid, so it is meant for full audits; use is_update_valid to check a single move
         :return: True if everything is ok, or false if something is illegal
         """
         # Check only has legal values
-        if not np.all((self.puzzle_grid >= 0) & (self.puzzle_grid <= 9)):
+        if not np.all((self.puzzle_grid >= 0) & (self.puzzle_grid <= self.size)):
             return False
         # Check has the right shape
-        if not np.all(np.equal(self.puzzle_grid.shape, (9, 9))):
+        if self.puzzle_grid.shape != (self.size, self.size):
             return False
         # Check all squares legal
-        for row in range(3):
-            for col in range(3):
-                if not is_legal_set(self.get_square(row, col)):
+        for row in range(self.box_size):
+            for col in range(self.box_size):
+                if not is_legal_set(self.get_square(row, col), self.size):
                     return False
         # Check all rows legal
-        for row in range(9):
-            if not is_legal_set(self.puzzle_grid[row, :]):
+        for row in range(self.size):
+            if not is_legal_set(self.puzzle_grid[row, :], self.size):
                 return False
         # Check all cols legal
-        for col in range(9):
-            if not is_legal_set(self.puzzle_grid[:, col]):
+        for col in range(self.size):
+            if not is_legal_set(self.puzzle_grid[:, col], self.size):
                 return False
 
         # Passed all checks so it is valid
@@ -187,26 +788,23 @@ class Puzzle:
         :param numbers_to_avoid: Optional iterable of other numbers to exclude
         :return: A set of numbers which could be placed into the spot without conflicting anything in the puzzle so far
         """
-        # If we already a number there are no options
-        if self.puzzle_grid[row, col] != 0:
-            return set()
-        # Otherwise, combine all the already taken numbers
-        already_taken = set(self.puzzle_grid[row, :])
-        already_taken = already_taken.union(self.puzzle_grid[:, col])
-        already_taken = already_taken.union(self.get_square(get_square_index(row), get_square_index(col)).flatten())
-        # If there are other numbers to avoid add those too
+        options = self.get_options_mask(row, col)
+        # If there are other numbers to avoid take those out too
         if numbers_to_avoid is not None:
-            already_taken = already_taken.union(numbers_to_avoid)
-        # Options are whatever numbers aren't already taken
-        options = set([i for i in range(1, 10)]).difference(already_taken)
-        return options
+            for number in numbers_to_avoid:
+                if 1 <= number <= self.size:
+                    options &= ~(1 << int(number))
+        return set(self.layout.mask_digits(options))
 
     def is_puzzle_solved(self) -> bool:
         """
         Sees if the puzzle is filled in completely
         :return: True if all the cells have a number and the puzzle is valid
         """
-        return not np.any(self.puzzle_grid == 0) and self.is_puzzle_valid()
+        # Every row, col, and square holds size cells, so a full mask means each digit is there exactly once
+        full_mask = self.layout.full_mask
+        return self._illegal_cells == 0 and all(
+            mask == full_mask for masks in (self._row_masks, self._col_masks, self._square_masks) for mask in masks)
 
     def safe_update(self, row: int, col: int, value: int) -> bool:
         """
@@ -217,40 +815,287 @@ class Puzzle:
         :param value: the value to update with
         :return: True if the puzzle was updated, False if the update was rejected
         """
-        if (row, col) in self.original_indexes:
+        if self.is_given(row, col):
             return False
-        old_value = self.puzzle_grid[row, col]
-        self.puzzle_grid[row, col] = value
-        if not self.is_puzzle_valid():
-            self.puzzle_grid[row, col] = old_value
+        if not self.is_update_valid(row, col, value):
             return False
+        old_value = int(self._puzzle_grid[row, col])
+        if old_value != value:
+            self._puzzle_grid[row, col] = value
+            self.journal.record(row * self.size + col, old_value, value)
         return True
 
-    def generate_answer_key_brute_force(self) -> Optional['Puzzle']:
+    def undo(self) -> Optional[Tuple[int, int]]:
+        """
+        Takes back the last move made with safe_update. The move was legal when it was made and every later move has
+        already been taken back, so the old value is put back without checking it again
+        :return: The (row, col) that changed, or None if there was nothing to undo
+        """
+        move = self.journal.undo()
+        if move is None:
+            return None
+        row, col = divmod(move.cell, self.size)
+        self._puzzle_grid[row, col] = move.old_value
+        return row, col
+
+    def redo(self) -> Optional[Tuple[int, int]]:
+        """
+        Makes the last move taken back with undo again
+        :return: The (row, col) that changed, or None if there was nothing to redo
+        """
+        move = self.journal.redo()
+        if move is None:
+            return None
+        row, col = divmod(move.cell, self.size)
+        self._puzzle_grid[row, col] = move.new_value
+        return row, col
+
+    def replay(self, journal: MoveJournal):
+        """
+        Makes every applied move of a journal, like one read from a saved log, on this puzzle. The undone moves are kept
+        so they can still be redone
+        :param journal: The journal, made on a puzzle with the same starting grid
+        :return: None, raises ValueError if a move doesn't fit the puzzle, leaving the puzzle and its journal as they
+        were
+        """
+        kept_journal = self.journal
+        # Record into an empty journal, so undoing everything in it takes back exactly the moves made here
+        self.journal = MoveJournal()
+        for move in journal.moves[:journal.position]:
+            row, col = divmod(move.cell, self.size)
+            if row >= self.size or int(self._puzzle_grid[row, col]) != move.old_value or \
+                    not self.safe_update(row, col, move.new_value):
+                while self.undo() is not None:
+                    pass
+                self.journal = kept_journal
+                raise ValueError(f"Move {move} doesn't fit the puzzle")
+        self.journal = MoveJournal(journal.moves, journal.position)
+
+    def generate_answer_key_brute_force(self, instrumentation: Optional[Instrumentation] = None) -> Optional['Puzzle']:
         """
         Makes a possible solution for the puzzle in a new puzzle
+        :param instrumentation: Optional instrumentation to record the search in. Every value tried is a validity check,
+        every legal one is a placement, and every cell emptied after running out of values is a backtrack
         :return: A puzzle that is a solution to the puzzle
         """
         # Make the answer key
-        answer_key = Puzzle(np.array(self.puzzle_grid))
+        answer_key = Puzzle(np.array(self.puzzle_grid), box_size=self.box_size)
         # Find which indexes are currently empty
-        index_combinations = [(i, j) for i in range(9) for j in range(9)]
+        index_combinations = [(i, j) for i in range(self.size) for j in range(self.size)]
         empty_indexes = list(filter(lambda x: answer_key.puzzle_grid[x[0], x[1]] == 0.0, index_combinations))
         # try each possible combination by moving through each empty cell and incrementing it until the puzzle is
         # correct. Will backtrack if it can't increment anymore
         i = 0
-        while 0 <= i < len(empty_indexes):
-            row, col = empty_indexes[i]
-            if 0 <= answer_key.puzzle_grid[row, col] <= 8:
-                answer_key.puzzle_grid[row, col] += 1
-                if answer_key.is_puzzle_valid():
-                    i += 1
-            else:
-                answer_key.puzzle_grid[row, col] = 0
-                i -= 1
+        try:
+            with get_phase(instrumentation, 'solve'):
+                while 0 <= i < len(empty_indexes):
+                    row, col = empty_indexes[i]
+                    if 0 <= answer_key.puzzle_grid[row, col] < self.size:
+                        value = int(answer_key.puzzle_grid[row, col]) + 1
+                        is_valid = answer_key.is_update_valid(row, col, value)
+                        answer_key.puzzle_grid[row, col] = value
+                        if is_valid:
+                            i += 1
+                        if instrumentation is not None:
+                            instrumentation.validity_checks += 1
+                            if is_valid:
+                                instrumentation.place(row, col, value, i)
+                    else:
+                        answer_key.puzzle_grid[row, col] = 0
+                        if instrumentation is not None:
+                            instrumentation.backtrack(row, col, i + 1)
+                        i -= 1
+        except BudgetExhausted as error:
+            error.partial = answer_key.puzzle_grid.ravel().tolist()
+            raise
         # If we needed to go backwards off the puzzle there is no solution
         if i == -1:
             return None
         # We did find a solution, return that
         else:
             return answer_key
+
+    def generate_answer_key_propagation(self, solver: Optional[PropagationSolver] = None,
+                                        instrumentation: Optional[Instrumentation] = None) -> Optional['Puzzle']:
+        """
+        Makes a possible solution for the puzzle in a new puzzle, using constraint propagation and guessing the most
+        constrained cell first. Much faster than brute force on hard or nearly empty puzzles
+        :param solver: Optional solver to use, pass one to reuse it and read its nodes, backtracks, and propagations
+        counters afterwards
+        :param instrumentation: Optional instrumentation to record the search in
+        :return: A puzzle that is a solution to the puzzle, or None if there is no solution
+        """
+        if solver is None:
+            solver = PropagationSolver(self.box_size)
+        solution = solver.solve(self.puzzle_grid.ravel().tolist(), instrumentation)
+        if solution is None:
+            return None
+        # Made from this grid first, so only this puzzle's numbers count as the original ones
+        answer_key = Puzzle(np.array(self.puzzle_grid), box_size=self.box_size)
+        answer_key.puzzle_grid[:, :] = np.reshape(solution, (self.size, self.size))
+        return answer_key
+
+    def generate_answer_key_dlx(self, solver: Optional[DancingLinks] = None,
+                                instrumentation: Optional[Instrumentation] = None) -> Optional['Puzzle']:
+        """
+        Makes a possible solution for the puzzle in a new puzzle, solving it as an exact cover problem with dancing links
+        :param solver: Optional solver to use, by default each thread shares one solver across all puzzles
+        :param instrumentation: Optional instrumentation to record the search in
+        :return: A puzzle that is a solution to the puzzle, or None if there is no solution
+        """
+        if solver is None:
+            solver = get_shared_dancing_links(self.box_size)
+        solution = solver.solve(self.puzzle_grid.ravel().tolist(), instrumentation)
+        if solution is None:
+            return None
+        # Made from this grid first, so only this puzzle's numbers count as the original ones
+        answer_key = Puzzle(np.array(self.puzzle_grid), box_size=self.box_size)
+        answer_key.puzzle_grid[:, :] = np.reshape(solution, (self.size, self.size))
+        return answer_key
+
+    def count_solutions(self, limit: Optional[int] = None, solver: Optional[DancingLinks] = None,
+                        instrumentation: Optional[Instrumentation] = None) -> int:
+        """
+        Counts how many solutions the puzzle has with dancing links
+        :param limit: Optional count to stop at, a limit of 2 is enough to tell if the solution is unique
+        :param solver: Optional solver to use, by default each thread shares one solver across all puzzles
+        :param instrumentation: Optional instrumentation to record the search in
+        :return: How many solutions the puzzle has, at most limit
+        """
+        if solver is None:
+            solver = get_shared_dancing_links(self.box_size)
+        return solver.count_solutions(self.puzzle_grid.ravel().tolist(), limit, instrumentation)
+
+    def iter_solutions(self, limit: Optional[int] = None, solver: Optional[DancingLinks] = None,
+                       instrumentation: Optional[Instrumentation] = None) -> Iterator['Puzzle']:
+        """
+        Finds the solutions of the puzzle one at a time with dancing links. The search stops at each solution and picks
+        up from there when the next one is asked for, so only one solution is held at a time. The grid is read now,
+        later changes to the puzzle don't change the solutions
+        :param limit: Optional most solutions to find
+        :param solver: Optional solver to use, it can't be used for anything else until the iterator is finished or
+        closed. By default a new one is made, since the shared one could be reused while the iterator waits
+        :param instrumentation: Optional instrumentation to record the search in
+        :return: An iterator of puzzles that are solutions to the puzzle
+        """
+        if solver is None:
+            solver = DancingLinks(self.box_size)
+        start = np.array(self.puzzle_grid)
+        return self._make_answer_keys(start, solver.solutions(start.ravel().tolist(), limit, instrumentation))
+
+    def _make_answer_keys(self, start: np.ndarray, solutions: Iterator[list[int]]) -> Iterator['Puzzle']:
+        given_mask = start != 0
+        for solution in solutions:
+            answer_key = Puzzle(np.reshape(np.array(solution, dtype=start.dtype), start.shape), box_size=self.box_size)
+            # Only the starting grid's numbers count as the original ones
+            answer_key._set_given_mask(given_mask)
+            yield answer_key
+
+    def get_differing_cells(self, other: 'Puzzle') -> list[Tuple[int, int]]:
+        """
+        Finds the cells where two puzzles of the same size hold different values, like two solutions of one puzzle
+        :param other: The other puzzle
+        :return: Every (row, col) that differs, row by row
+        """
+        return [(int(row), int(col)) for row, col in np.argwhere(np.asarray(self.puzzle_grid) !=
+                                                                 np.asarray(other.puzzle_grid))]
+
+    def get_disambiguating_clues(self, limit: int = 1000, solver: Optional[DancingLinks] = None,
+                                 instrumentation: Optional[Instrumentation] = None) -> list[Tuple[int, int, int]]:
+        """
+        Finds clues that make the solution of the puzzle unique, for repairing a puzzle with many solutions. The first
+        solution is kept and each other one is remembered only as the set of cells where it differs from the first. A
+        clue on one of those cells rules that solution out, so clues are picked greedily by how many solutions they rule
+        out. Only limit solutions are looked at a time, and the search is done again with the clues until it is unique.
+        Greedy picks can make earlier ones unneeded, so at the end every clue the solution stays unique without is
+        dropped, leaving clues that are each needed
+        :param limit: Most solutions to look at before picking clues, at least 2
+        :param solver: Optional solver to use, by default each thread shares one solver across all puzzles
+        :param instrumentation: Optional instrumentation to record the searches in
+        :return: The clues as (row, col, digit), none if the solution is already unique. The puzzle isn't changed
+        """
+        if limit < 2:
+            raise ValueError("At least 2 solutions are needed to tell them apart")
+        if solver is None:
+            solver = get_shared_dancing_links(self.box_size)
+        cells = self.puzzle_grid.ravel().tolist()
+        clues = []
+        while True:
+            first = None
+            # Bit c is set for every cell c where a solution differs from the first
+            differences = []
+            for solution in solver.solutions(cells, limit, instrumentation):
+                if first is None:
+                    first = solution
+                else:
+                    differences.append(sum(1 << cell for cell, (value, kept) in enumerate(zip(solution, first))
+                                           if value != kept))
+            if first is None:
+                raise ValueError("The puzzle has no solution")
+            if not differences:
+                # Try the last picked clues first, since the earlier ones ruled out the most solutions
+                for clue in reversed(list(clues)):
+                    row, col, digit = clue
+                    cell = row * self.size + col
+                    cells[cell] = 0
+                    if solver.count_solutions(cells, 2, instrumentation) == 1:
+                        clues.remove(clue)
+                    else:
+                        cells[cell] = digit
+                return clues
+            while differences:
+                counts = [0] * len(cells)
+                for difference in differences:
+                    for cell in get_mask_digits(difference):
+                        counts[cell] += 1
+                cell = max(range(len(cells)), key=counts.__getitem__)
+                cells[cell] = first[cell]
+                clues.append((cell // self.size, cell % self.size, first[cell]))
+                differences = [difference for difference in differences if not difference >> cell & 1]
+
+    def solve(self, method: str = 'propagation', budget: Optional[Budget] = None) -> SearchResult:
+        """
+        Solves the puzzle, stopping once the budget runs out instead of searching for as long as it takes
+        :param method: A key of SOLVE_METHODS
+        :param budget: Optional budget limiting the time or placements, or a token to cancel the solve with
+        :return: SOLVED with the solution, UNSOLVABLE, or BUDGET_EXHAUSTED with the grid as far as the search got
+        """
+        try:
+            answer_key = SOLVE_METHODS[method](self, instrumentation=budget)
+        except BudgetExhausted as error:
+            partial = None
+            if error.partial is not None:
+                partial = Puzzle(np.array(self.puzzle_grid), box_size=self.box_size)
+                partial.puzzle_grid[:, :] = np.reshape(error.partial, (self.size, self.size))
+            return SearchResult(BUDGET_EXHAUSTED, partial, error.reason)
+        if answer_key is None:
+            return SearchResult(UNSOLVABLE, None)
+        return SearchResult(SOLVED, answer_key)
+
+    def grade(self, grader: Optional[Grader] = None, trace: bool = False) -> Grade:
+        """
+        Rates how hard the puzzle is by solving it with the techniques a person would use
+        :param grader: Optional grader to use, pass one to reuse it when grading many puzzles
+        :param trace: If True the grade keeps every step taken, otherwise only how often each technique was used
+        :return: The grade, with a rating, a score, and a level
+        """
+        if grader is None:
+            grader = Grader(self.box_size)
+        return grader.grade(self.puzzle_grid.ravel().tolist(), trace)
+
+
+# The ways a puzzle can be solved
+SOLVE_METHODS: dict[str, Callable[..., Optional[Puzzle]]] = {
+    'propagation': Puzzle.generate_answer_key_propagation,
+    'dlx': Puzzle.generate_answer_key_dlx,
+    'brute_force': Puzzle.generate_answer_key_brute_force,
+}
+# The kinds of puzzle that can be generated, each called with the random number generator, the box size, and optional
+# instrumentation (or a budget)
+GENERATORS: dict[str, Callable[[random.Random, int, Optional[Instrumentation]], Puzzle]] = {
+    'answer_key': lambda rng, box_size, instrumentation: make_puzzle_answer_key(
+        rng, box_size=box_size, instrumentation=instrumentation),
+    'solvable': lambda rng, box_size, instrumentation: make_solvable_puzzle(rng, box_size, instrumentation),
+    'unique': lambda rng, box_size, instrumentation: make_unique_puzzle(
+        rng=rng, box_size=box_size, instrumentation=instrumentation)[0],
+}
@@ -0,0 +1,229 @@
+from typing import Iterator, Optional, Sequence
+
+from classes.bitboard import get_layout
+from classes.budget import BudgetExhausted
+from classes.instrumentation import Instrumentation, get_phase
+
+# Returned by propagation when every cell is filled in
+SOLVED = -2
+# Returned by propagation when some cell or digit has nowhere left to go
+CONTRADICTION = -1
+
+
+class PropagationSolver:
+    """
+    Solves puzzles with a depth first search. Before every guess naked singles (cells with one option) and hidden
+    singles (digits with one spot in a row, col, or square) are filled in, and the guess is always made in the cell with
+    the fewest options. Moves are undone with a trail, so no state is copied while searching.
+    The solver can be reused for many puzzles of its size, and keeps counters for the last solve.
+    """
+
+    def __init__(self, box_size: int = 3):
+        """
+        Makes a solver
+        :param box_size: How many rows (and cols) each square has, 3 for a normal 9 by 9 puzzle
+        """
+        self.layout = get_layout(box_size)
+        self.cells = [0] * self.layout.num_cells
+        self.row_masks = [0] * self.layout.size
+        self.col_masks = [0] * self.layout.size
+        self.square_masks = [0] * self.layout.size
+        # Every cell filled in since the givens were loaded, in order, so moves can be undone
+        self.trail: list[int] = []
+        # How many search nodes were visited
+        self.nodes = 0
+        # How many guesses were undone
+        self.backtracks = 0
+        # How many cells were filled in by propagation instead of guessing
+        self.propagations = 0
+        # Optional instrumentation for the solve running now
+        self.instrumentation: Optional[Instrumentation] = None
+
+    def load(self, cells: Sequence[int]) -> bool:
+        """
+        Loads a puzzle into the solver and resets the counters
+        :param cells: The values of the puzzle, row by row, 0 being an empty cell
+        :return: True if the puzzle was loaded, False if the values already conflict with each other
+        """
+        size = self.layout.size
+        self.cells = [0] * self.layout.num_cells
+        self.row_masks = [0] * size
+        self.col_masks = [0] * size
+        self.square_masks = [0] * size
+        self.trail = []
+        self.nodes = 0
+        self.backtracks = 0
+        self.propagations = 0
+        if len(cells) != self.layout.num_cells:
+            return False
+        for cell, value in enumerate(cells):
+            digit = int(value)
+            if digit == 0:
+                continue
+            if self.instrumentation is not None:
+                self.instrumentation.validity_checks += 1
+            if not 1 <= digit <= size or self.get_options(cell) & (1 << digit) == 0:
+                return False
+            self._place(cell, digit)
+        # The givens are never undone
+        self.trail = []
+        return True
+
+    def get_options(self, cell: int) -> int:
+        """
+        Gets the digits that could go into a cell
+        :param cell: The flat index of the cell
+        :return: A mask of the digits not used by the cell's row, col, or square
+        """
+        layout = self.layout
+        return ~(self.row_masks[layout.cell_rows[cell]] | self.col_masks[layout.cell_cols[cell]] |
+                 self.square_masks[layout.cell_squares[cell]]) & layout.full_mask
+
+    def _place(self, cell: int, digit: int):
+        """
+        Fills in a cell and records it on the trail
+        :param cell: The flat index of the cell
+        :param digit: The digit to put in the cell
+        :return: None, the cell and masks are updated
+        """
+        layout = self.layout
+        bit = 1 << digit
+        self.cells[cell] = digit
+        self.row_masks[layout.cell_rows[cell]] |= bit
+        self.col_masks[layout.cell_cols[cell]] |= bit
+        self.square_masks[layout.cell_squares[cell]] |= bit
+        self.trail.append(cell)
+
+    def _undo(self, mark: int):
+        """
+        Empties every cell filled in after the trail was a given length
+        :param mark: The length of the trail to go back to
+        :return: None, the cells and masks are rolled back
+        """
+        layout = self.layout
+        trail = self.trail
+        while len(trail) > mark:
+            cell = trail.pop()
+            bit = ~(1 << self.cells[cell])
+            self.cells[cell] = 0
+            self.row_masks[layout.cell_rows[cell]] &= bit
+            self.col_masks[layout.cell_cols[cell]] &= bit
+            self.square_masks[layout.cell_squares[cell]] &= bit
+
+    def _propagate(self, depth: int) -> int:
+        """
+        Fills in naked and hidden singles until there are none left
+        :param depth: How many guesses led here, for the instrumentation
+        :return: CONTRADICTION if the puzzle can't be solved from here, SOLVED if every cell is filled in, otherwise the
+        empty cell with the fewest options
+        """
+        cells = self.cells
+        layout = self.layout
+        mask_count = layout.mask_count
+        instrumentation = self.instrumentation
+        while True:
+            best_cell = SOLVED
+            best_count = layout.size + 1
+            changed = False
+            # Both kinds of singles work out the options of every empty cell
+            if instrumentation is not None:
+                instrumentation.candidate_computations += 2 * cells.count(0)
+            # Naked singles, and finding the cell with the fewest options
+            for cell in range(layout.num_cells):
+                if cells[cell]:
+                    continue
+                options = self.get_options(cell)
+                if options == 0:
+                    return CONTRADICTION
+                if options & (options - 1) == 0:
+                    self._place(cell, options.bit_length() - 1)
+                    self.propagations += 1
+                    changed = True
+                    if instrumentation is not None:
+                        instrumentation.place(layout.cell_rows[cell], layout.cell_cols[cell], cells[cell], depth)
+                else:
+                    count = mask_count(options)
+                    if count < best_count:
+                        best_cell = cell
+                        best_count = count
+            if changed:
+                continue
+            # Hidden singles, digits that only fit in one cell of a row, col, or square
+            for unit in layout.units:
+                used = 0
+                seen_once = 0
+                seen_twice = 0
+                for cell in unit:
+                    if cells[cell]:
+                        used |= 1 << cells[cell]
+                    else:
+                        options = self.get_options(cell)
+                        seen_twice |= seen_once & options
+                        seen_once |= options
+                if used | seen_once != layout.full_mask:
+                    return CONTRADICTION
+                hidden = seen_once & ~seen_twice
+                while hidden:
+                    bit = hidden & -hidden
+                    hidden ^= bit
+                    # An earlier hidden single may have taken the only spot for this digit
+                    spot = next((cell for cell in unit if not cells[cell] and self.get_options(cell) & bit), None)
+                    if spot is None:
+                        return CONTRADICTION
+                    self._place(spot, bit.bit_length() - 1)
+                    self.propagations += 1
+                    changed = True
+                    if instrumentation is not None:
+                        instrumentation.place(layout.cell_rows[spot], layout.cell_cols[spot], cells[spot], depth)
+            if not changed:
+                return best_cell
+
+    def _search(self, depth: int = 0) -> Iterator[None]:
+        """
+        Searches for solutions from the current state, pausing with the solution in the cells each time one is found
+        :param depth: How many guesses led here
+        :return: An iterator that yields once per solution
+        """
+        self.nodes += 1
+        mark = len(self.trail)
+        cell = self._propagate(depth)
+        if cell == SOLVED:
+            yield
+        elif cell != CONTRADICTION:
+            instrumentation = self.instrumentation
+            row = self.layout.cell_rows[cell]
+            col = self.layout.cell_cols[cell]
+            for digit in self.layout.mask_digits(self.get_options(cell)):
+                guess_mark = len(self.trail)
+                self._place(cell, digit)
+                if instrumentation is not None:
+                    instrumentation.place(row, col, digit, depth + 1)
+                yield from self._search(depth + 1)
+                self._undo(guess_mark)
+                self.backtracks += 1
+                if instrumentation is not None:
+                    instrumentation.backtrack(row, col, depth + 1)
+        self._undo(mark)
+
+    def solve(self, cells: Sequence[int], instrumentation: Optional[Instrumentation] = None) -> Optional[list[int]]:
+        """
+        Finds a solution to a puzzle
+        :param cells: The values of the puzzle, row by row, 0 being an empty cell
+        :param instrumentation: Optional instrumentation to record the search in. Every guess and single filled in is
+        a placement, every guess taken back is a backtrack, and the depth is how many guesses are in play
+        :return: The values of a solution, or None if there is no solution
+        """
+        self.instrumentation = instrumentation
+        try:
+            with get_phase(instrumentation, 'solve'):
+                if not self.load(cells):
+                    return None
+                try:
+                    for _ in self._search():
+                        return list(self.cells)
+                except BudgetExhausted as error:
+                    error.partial = list(self.cells)
+                    raise
+                return None
+        finally:
+            self.instrumentation = None
@@ -0,0 +1,101 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+from classes.bitboard import FULL_MASK, MASK_COUNTS, MASK_DIGITS
+from classes.solver import PropagationSolver
+
+# Status of every grid in a batch
+UNSOLVABLE = -1
+UNRESOLVED = 0
+SOLVED = 1
+
+DIGITS = np.arange(1, 10, dtype=np.uint16)
+# The bit for every cell value, an empty cell has no bit
+VALUE_BITS = np.array([0] + [1 << digit for digit in range(1, 10)], dtype=np.uint16)
+# How many digits are in every mask, and the digit of every mask holding just one
+POPCOUNTS = np.array(MASK_COUNTS, dtype=np.int8)
+SINGLE_DIGITS = np.array([digits[0] if len(digits) == 1 else 0 for digits in MASK_DIGITS], dtype=np.int8)
+
+
+def expand_squares(square_values: np.ndarray) -> np.ndarray:
+    """
+    Spreads values for each square out to every cell of the square
+    :param square_values: An (N, 3, 3, ...) array with a value for each square
+    :return: An (N, 9, 9, ...) array with each cell holding its square's value
+    """
+    return np.repeat(np.repeat(square_values, 3, axis=1), 3, axis=2)
+
+
+def propagate_grids(grids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fills in naked and hidden singles for a whole batch of puzzles at once, until none of them change
+    :param grids: An (N, 9, 9) array of puzzles, 0 being an empty cell
+    :return: A copy of the grids with every single filled in, and the SOLVED, UNSOLVABLE, or UNRESOLVED status of each
+    """
+    grids = np.array(grids, dtype=np.int8).reshape(-1, 9, 9)
+    status = np.full(len(grids), UNRESOLVED, dtype=np.int8)
+    status[((grids < 0) | (grids > 9)).any(axis=(1, 2))] = UNSOLVABLE
+    active = np.flatnonzero(status == UNRESOLVED)
+    while active.size:
+        count = active.size
+        sub_grids = grids[active]
+        empty = sub_grids == 0
+        bits = VALUE_BITS[sub_grids]
+        row_used = np.bitwise_or.reduce(bits, axis=2)
+        col_used = np.bitwise_or.reduce(bits, axis=1)
+        square_used = np.bitwise_or.reduce(bits.reshape(count, 3, 3, 3, 3), axis=(2, 4))
+        taken = row_used[:, :, None] | col_used[:, None, :] | expand_squares(square_used)
+        options = np.where(empty, FULL_MASK & ~taken, 0).astype(np.uint16)
+        # A unit holding fewer distinct digits than filled cells has a duplicate
+        filled = ~empty
+        has_duplicate = (POPCOUNTS[row_used] != filled.sum(axis=2)).any(axis=1) | \
+                        (POPCOUNTS[col_used] != filled.sum(axis=1)).any(axis=1) | \
+                        (POPCOUNTS[square_used] != filled.reshape(count, 3, 3, 3, 3).sum(axis=(2, 4))).any(axis=(1, 2))
+        # An empty cell with no options is stuck
+        has_stuck_cell = (empty & (options == 0)).any(axis=(1, 2))
+        # Each cell's options split out by digit, then how many spots each digit has in each unit
+        option_digits = ((options[..., None] >> DIGITS) & 1).astype(bool)
+        row_spots = option_digits.sum(axis=2)
+        col_spots = option_digits.sum(axis=1)
+        square_spots = option_digits.reshape(count, 3, 3, 3, 3, 9).sum(axis=(2, 4))
+        # A digit that isn't in a unit yet and has no spots left is stuck
+        has_stuck_digit = ((row_spots == 0) & ((row_used[..., None] >> DIGITS) & 1 == 0)).any(axis=(1, 2)) | \
+                          ((col_spots == 0) & ((col_used[..., None] >> DIGITS) & 1 == 0)).any(axis=(1, 2)) | \
+                          ((square_spots == 0) & ((square_used[..., None] >> DIGITS) & 1 == 0)).any(axis=(1, 2, 3))
+        failed = has_duplicate | has_stuck_cell | has_stuck_digit
+        solved = ~empty.any(axis=(1, 2)) & ~failed
+        # Hidden singles are digits with one spot in a unit, naked singles are cells with one option
+        hidden = option_digits & ((row_spots == 1)[:, :, None, :] | (col_spots == 1)[:, None, :, :] |
+                                  expand_squares(square_spots == 1))
+        hidden_digits = np.where(hidden.any(axis=3), hidden.argmax(axis=3) + 1, 0)
+        naked_digits = SINGLE_DIGITS[options]
+        new_digits = np.where(naked_digits != 0, naked_digits, hidden_digits).astype(np.int8)
+        progress = (new_digits != 0).any(axis=(1, 2)) & ~failed
+        grids[active[progress]] += new_digits[progress]
+        status[active[failed]] = UNSOLVABLE
+        status[active[solved]] = SOLVED
+        active = active[progress]
+    return grids, status
+
+
+def solve_grids(grids: np.ndarray, solver: Optional[PropagationSolver] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Solves a whole batch of puzzles. Singles are filled in for every puzzle at once, and only the puzzles that still
+    need guessing are searched one at a time
+    :param grids: An (N, 9, 9) array of puzzles, 0 being an empty cell
+    :param solver: Optional solver to search the puzzles that need guessing with
+    :return: An (N, 9, 9) array holding each solution (or as much as could be filled in for unsolvable puzzles), and
+    the SOLVED or UNSOLVABLE status of each puzzle
+    """
+    if solver is None:
+        solver = PropagationSolver()
+    solutions, status = propagate_grids(grids)
+    for index in np.flatnonzero(status == UNRESOLVED):
+        solution = solver.solve(solutions[index].ravel().tolist())
+        if solution is None:
+            status[index] = UNSOLVABLE
+        else:
+            solutions[index] = np.reshape(solution, (9, 9))
+            status[index] = SOLVED
+    return solutions, status
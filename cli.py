@@ -0,0 +1,240 @@
+import argparse
+import math
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, TextIO, Tuple
+
+from classes.batch import derive_seed
+from classes.budget import Budget
+from classes.grader import Grader
+from classes.puzzle import GENERATORS, SOLVE_METHODS, SOLVED, puzzle_from_line
+
+# The ways a puzzle can be solved
+SOLVERS = SOLVE_METHODS
+
+
+class LatencyHistogram:
+    """
+    Collects latencies into buckets 5% wide, so percentiles can be found without keeping every latency
+    """
+    RATIO = 1.05
+    # Latencies under a microsecond all go into the first bucket
+    SMALLEST = 1e-6
+
+    def __init__(self):
+        self.buckets: dict[int, int] = {}
+        self.count = 0
+
+    def add(self, seconds: float):
+        """
+        Adds one latency
+        :param seconds: How long something took
+        :return: None, the latency is counted
+        """
+        bucket = max(0, math.ceil(math.log(max(seconds, self.SMALLEST) / self.SMALLEST, self.RATIO)))
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+
+    def percentile(self, percent: float) -> float:
+        """
+        Gets a percentile of the latencies, rounded up to the top of its bucket
+        :param percent: The percentile [0-100]
+        :return: The latency in seconds, 0 if nothing was added
+        """
+        if self.count == 0:
+            return 0.0
+        rank = max(1, math.ceil(self.count * percent / 100))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return self.SMALLEST * self.RATIO ** bucket
+        return self.SMALLEST * self.RATIO ** max(self.buckets)
+
+
+def solve_line(line: str, solver_name: str, timeout: Optional[float] = None, max_nodes: Optional[int] = None) -> str:
+    """
+    Solves one puzzle line
+    :param line: The puzzle as 81 characters
+    :param solver_name: A key of SOLVERS
+    :param timeout: Optional most seconds to spend on the puzzle
+    :param max_nodes: Optional most cells to fill in while searching
+    :return: The solution as 81 digits, or "invalid", "unsolvable", or "budget_exhausted"
+    """
+    try:
+        puzzle = puzzle_from_line(line)
+    except ValueError:
+        return 'invalid'
+    budget = None
+    if timeout is not None or max_nodes is not None:
+        budget = Budget(timeout, max_nodes)
+    result = puzzle.solve(solver_name, budget)
+    return result.puzzle.to_line() if result.status == SOLVED else result.status
+
+
+def count_line(line: str, limit: Optional[int]) -> str:
+    """
+    Counts the solutions of one puzzle line
+    :param line: The puzzle as 81 characters
+    :param limit: Optional count to stop at
+    :return: The number of solutions, or "invalid"
+    """
+    try:
+        puzzle = puzzle_from_line(line)
+    except ValueError:
+        return 'invalid'
+    return str(puzzle.count_solutions(limit))
+
+
+# Graders are reused for every line a process grades
+graders: dict[int, Grader] = {}
+
+
+def grade_line(line: str) -> str:
+    """
+    Grades one puzzle line
+    :param line: The puzzle as 81 characters
+    :return: The level, rating, and score, or "invalid"
+    """
+    try:
+        puzzle = puzzle_from_line(line)
+    except ValueError:
+        return 'invalid'
+    grader = graders.get(puzzle.box_size)
+    if grader is None:
+        grader = graders[puzzle.box_size] = Grader(puzzle.box_size)
+    grade = puzzle.grade(grader)
+    return f"{grade.level} {grade.rating:.1f} {grade.score:.1f}"
+
+
+def generate_line(seed: int, kind: str) -> str:
+    """
+    Generates one puzzle
+    :param seed: The seed for the puzzle's random number generator
+    :param kind: A key of GENERATORS
+    :return: The puzzle as 81 digits
+    """
+    return GENERATORS[kind](random.Random(seed), 3, None).to_line()
+
+
+def run_timed(function: Callable[..., str], *args) -> Tuple[str, float]:
+    """
+    Runs a task and times it, this is what each worker runs
+    :param function: The task
+    :param args: The arguments for the task
+    :return: The output of the task and how many seconds it took
+    """
+    start = time.perf_counter()
+    output = function(*args)
+    return output, time.perf_counter() - start
+
+
+def run_in_order(function: Callable[..., str], tasks: Iterable[tuple], workers: int) -> Iterator[Tuple[str, float]]:
+    """
+    Runs tasks, in a pool of processes if there is more than one worker, handing back outputs in the order of the tasks.
+    Only a few tasks per worker are read ahead, so memory stays bounded however many tasks there are
+    :param function: The task to run
+    :param tasks: The arguments of every task
+    :param workers: How many processes to use
+    :return: An iterator of the output and seconds taken for every task
+    """
+    if workers <= 1:
+        for args in tasks:
+            yield run_timed(function, *args)
+        return
+    in_flight: deque[Future] = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for args in tasks:
+            in_flight.append(executor.submit(run_timed, function, *args))
+            if len(in_flight) >= 8 * workers:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def read_puzzle_lines(source: TextIO) -> Iterator[str]:
+    """
+    Reads puzzle lines, skipping blank lines and lines starting with #
+    :param source: Where to read from
+    :return: An iterator of the puzzle lines
+    """
+    for line in source:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Solve, count, grade, or generate sudoku puzzles, one 81 character "
+                                                 "line per puzzle with 0 or . for an empty cell")
+    parser.add_argument('--workers', type=int, default=1, help="How many processes to use")
+    parser.add_argument('--quiet', action='store_true', help="Don't print the throughput summary")
+    commands = parser.add_subparsers(dest='command', required=True)
+    solve = commands.add_parser('solve', help="Print a solution for every puzzle, or invalid or unsolvable")
+    solve.add_argument('input', nargs='?', default='-', help="Puzzle file, - for stdin")
+    solve.add_argument('--solver', choices=sorted(SOLVERS), default='propagation')
+    solve.add_argument('--timeout', type=float, default=None,
+                       help="Most seconds to spend on each puzzle, budget_exhausted is printed if it runs out")
+    solve.add_argument('--max-nodes', type=int, default=None, help="Most cells to fill in while solving each puzzle")
+    count = commands.add_parser('count', help="Print how many solutions every puzzle has, or invalid")
+    count.add_argument('input', nargs='?', default='-', help="Puzzle file, - for stdin")
+    count.add_argument('--limit', type=int, default=None, help="Count to stop at, 2 is enough to check uniqueness")
+    grade = commands.add_parser('grade', help="Print the level, rating, and score of every puzzle, or invalid")
+    grade.add_argument('input', nargs='?', default='-', help="Puzzle file, - for stdin")
+    generate = commands.add_parser('generate', help="Print newly generated puzzles")
+    generate.add_argument('--count', type=int, default=1, help="How many puzzles to make")
+    generate.add_argument('--seed', type=int, default=None, help="Seed, the same seed makes the same puzzles")
+    generate.add_argument('--kind', choices=sorted(GENERATORS), default='solvable')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None, stdin: TextIO = sys.stdin, stdout: TextIO = sys.stdout,
+         stderr: TextIO = sys.stderr) -> int:
+    """
+    Runs the command line tool
+    :param argv: The arguments, defaults to the ones the program was run with
+    :param stdin: Where to read puzzles from when the input is -
+    :param stdout: Where to write results to
+    :param stderr: Where to write the summary to
+    :return: The exit code
+    """
+    args = parse_args(argv)
+    source: Optional[TextIO] = None
+    if args.command == 'generate':
+        seed = args.seed if args.seed is not None else random.getrandbits(32)
+        tasks: Iterable[tuple] = ((derive_seed(seed, index), args.kind) for index in range(args.count))
+        function: Callable[..., str] = generate_line
+    else:
+        source = stdin if args.input == '-' else open(args.input)
+        if args.command == 'solve':
+            tasks = ((line, args.solver, args.timeout, args.max_nodes) for line in read_puzzle_lines(source))
+            function = solve_line
+        elif args.command == 'grade':
+            tasks = ((line,) for line in read_puzzle_lines(source))
+            function = grade_line
+        else:
+            tasks = ((line, args.limit) for line in read_puzzle_lines(source))
+            function = count_line
+    latencies = LatencyHistogram()
+    start = time.perf_counter()
+    try:
+        for output, seconds in run_in_order(function, tasks, args.workers):
+            stdout.write(output + '\n')
+            latencies.add(seconds)
+    finally:
+        if source is not None and source is not stdin:
+            source.close()
+    elapsed = time.perf_counter() - start
+    if not args.quiet:
+        rate = latencies.count / elapsed if elapsed > 0 else 0.0
+        stderr.write(f"{args.command}: {latencies.count} puzzles in {elapsed:.2f}s ({rate:.1f} puzzles/sec), "
+                     f"latency p50 {latencies.percentile(50) * 1000:.2f}ms "
+                     f"p99 {latencies.percentile(99) * 1000:.2f}ms\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,72 @@
+import os
 import time
 from typing import Optional, Tuple
 
+import numpy as np
 import pygame
 
-from classes.puzzle import Puzzle, make_solvable_puzzle
+from classes.bitboard import DIGIT_CHARS
+from classes.hints import HintEngine
+from classes.pool import PuzzlePool
+from classes.puzzle import Puzzle
+
+# Colors of the numbers in the puzzle from the start, and the numbers the user entered
+ORIGINAL_COLOR = (0, 0, 0)
+ENTERED_COLOR = (170, 170, 170)
+# Color of the pencil marks, the candidates of empty cells
+PENCIL_COLOR = (110, 130, 200)
+# Most frames a second to draw, nothing needs more than this and an idle game shouldn't spin
+MAX_FPS = 30
+# Where puzzles made ahead of time are kept between games, so a new game never waits for one to be made
+POOL_DIRECTORY = os.path.join(os.path.expanduser('~'), '.sudoku-fun')
+
+
+class GlyphAtlas:
+    """
+    Loads the font once and renders every digit ahead of time in both number colors, so drawing a frame only blits
+    """
+
+    def __init__(self, font_name: str = "comicsans", font_size: int = 40, max_digit: int = 9):
+        """
+        Loads the font and renders the digits, the pygame fonts must already be initialized
+        :param font_name: The system font to use
+        :param font_size: The size of the font
+        :param max_digit: The biggest digit to render, digits past 9 are drawn as letters
+        """
+        self.font = pygame.font.SysFont(font_name, font_size)
+        # Index 0 is unused so a digit is its own index
+        self.original_digits = [self.font.render(DIGIT_CHARS[digit], True, ORIGINAL_COLOR)
+                                for digit in range(max_digit + 1)]
+        self.entered_digits = [self.font.render(DIGIT_CHARS[digit], True, ENTERED_COLOR)
+                               for digit in range(max_digit + 1)]
+        # Pencil marks share a cell with the other candidates, so they get a smaller font
+        self.pencil_font = pygame.font.SysFont(font_name, font_size * 2 // 5)
+        self.pencil_digits = [self.pencil_font.render(DIGIT_CHARS[digit], True, PENCIL_COLOR)
+                              for digit in range(max_digit + 1)]
+        # Other text, like the clock, only changes once a second so the last rendering of each is kept
+        self.text_cache: dict[str, Tuple[str, pygame.Surface]] = {}
+
+    def get_digit(self, digit: int, is_original: bool) -> pygame.Surface:
+        """
+        Gets the pre-rendered image of a digit
+        :param digit: The digit [1-max_digit]
+        :param is_original: If the digit was in the puzzle from the start
+        :return: The image of the digit
+        """
+        return self.original_digits[digit] if is_original else self.entered_digits[digit]
+
+    def get_text(self, slot: str, text: str) -> pygame.Surface:
+        """
+        Gets an image of some text, only rendering it if the text changed since the last time this slot was drawn
+        :param slot: What the text is for, each slot keeps its last image
+        :param text: The text to draw
+        :return: The image of the text
+        """
+        cached = self.text_cache.get(slot)
+        if cached is None or cached[0] != text:
+            cached = text, self.font.render(text, True, ORIGINAL_COLOR)
+            self.text_cache[slot] = cached
+        return cached[1]
 
 
 def format_time(secs: float) -> str:
@@ -20,7 +83,7 @@ def format_time(secs: float) -> str:
 
 
 def draw_cell(window: pygame.Surface, value: int, row: int, col: int, board_width: int, board_height: int,
-              selected: bool, original_indexes: list[Tuple[int, int]]):
+              selected: bool, is_original: bool, glyphs: GlyphAtlas, rows: int = 9, candidates: int = 0):
     """
     Draws one cell
     :param window: Surface to draw on
@@ -30,45 +93,68 @@ def draw_cell(window: pygame.Surface, value: int, row: int, col: int, board_widt
     :param board_width: The width of the sudoku board
     :param board_height: The width of the sudoku board
     :param selected: if the cell is currently selected
-    :param original_indexes: if the cell is an original index
+    :param is_original: if the cell is in the original puzzle
+    :param glyphs: The pre-rendered digits
+    :param rows: How many rows (and cols) the board has
+    :param candidates: Optional mask of the digits to pencil into an empty cell, digit d at bit 1 << d
     :return: Nothing, the cell is drawn
     """
-    fnt = pygame.font.SysFont("comicsans", 40)
-
-    gap_width = board_width / 9
-    gap_height = board_height / 9
+    gap_width = board_width / rows
+    gap_height = board_height / rows
     x = col * gap_width
     y = row * gap_height
     selected_color = (38, 182, 149)
-    if (row, col) in original_indexes:
-        number_color = (0, 0, 0)
-    else:
-        number_color = (170, 170, 170)
     if value != 0:
-        text = fnt.render(str(value), True, number_color)
+        text = glyphs.get_digit(value, is_original)
         window.blit(text, (x + (gap_width / 2 - text.get_width() / 2), y + (gap_height / 2 - text.get_height() / 2)))
+    elif candidates:
+        # Each digit gets its own spot in a small grid inside the cell, the same layout as the squares of the board
+        box_size = int(rows ** 0.5)
+        mark_width = gap_width / box_size
+        mark_height = gap_height / box_size
+        for digit in range(1, rows + 1):
+            if candidates >> digit & 1:
+                text = glyphs.pencil_digits[digit]
+                mark_row, mark_col = divmod(digit - 1, box_size)
+                window.blit(text, (x + mark_col * mark_width + (mark_width / 2 - text.get_width() / 2),
+                                   y + mark_row * mark_height + (mark_height / 2 - text.get_height() / 2)))
 
     if selected:
         pygame.draw.rect(window, selected_color, (x, y, gap_width, gap_height), 3)
 
 
-def draw_sudoku_board(window: pygame.Surface, puzzle: Puzzle, board_width: int, board_height: int):
-    rows, cols = puzzle.puzzle_grid.shape
-    # Draw Grid Lines
+def draw_grid_lines(window: pygame.Surface, rows: int, board_width: int, board_height: int, box_size: int = 3):
+    """
+    Draws the lines between cells, thicker around the squares
+    :param window: Surface to draw on
+    :param rows: How many rows (and cols) the board has
+    :param board_width: The width of the sudoku board
+    :param board_height: The height of the sudoku board
+    :param box_size: How many rows (and cols) each square has
+    :return: None, the lines are drawn
+    """
     gap = board_width / rows
     for i in range(rows + 1):
-        if i % 3 == 0:
+        if i % box_size == 0:
             thick = 4
         else:
             thick = 1
         pygame.draw.line(window, (0, 0, 0), (0, i * gap), (board_width, i * gap), thick)
         pygame.draw.line(window, (0, 0, 0), (i * gap, 0), (i * gap, board_height), thick)
+
+
+def draw_sudoku_board(window: pygame.Surface, puzzle: Puzzle, board_width: int, board_height: int, glyphs: GlyphAtlas,
+                      hints: Optional[HintEngine] = None):
+    rows, cols = puzzle.puzzle_grid.shape
+    # Draw Grid Lines
+    draw_grid_lines(window, rows, board_width, board_height, puzzle.box_size)
     # Draw all the boxes
-    for row in range(9):
-        for col in range(9):
+    for row in range(rows):
+        for col in range(cols):
             is_selected = puzzle.selected == (row, col)
+            candidates = hints.get_candidates(row, col) if hints is not None else 0
             draw_cell(window, puzzle.puzzle_grid[row, col], row, col, board_width, board_height,
-                      is_selected, puzzle.original_indexes)
+                      is_selected, puzzle.is_given(row, col), glyphs, rows, candidates)
 
 
 def get_clicked_row_col(mouse_position: Tuple[int, int], board_width: int, board_height: int, rows, cols) \
@@ -90,24 +176,129 @@ def get_clicked_row_col(mouse_position: Tuple[int, int], board_width: int, board
     return indexes
 
 
-def redraw_window(window: pygame.Surface, puzzle: Puzzle, game_time: float, is_solved: bool):
+def redraw_window(window: pygame.Surface, puzzle: Puzzle, game_time: float, is_solved: bool, glyphs: GlyphAtlas,
+                  hints: Optional[HintEngine] = None, hint_text: str = ""):
     """
     Draws the grid on the window surface provided
     :param window: The window to draw on
     :param puzzle: The puzzle to draw
     :param game_time: How long the user has been working on the puzzle
     :param is_solved: If the puzzle is solved now
+    :param glyphs: The font and pre-rendered digits
+    :param hints: Optional hint engine, if passed the candidates of empty cells are penciled in
+    :param hint_text: Optional hint to show under the board
     :return: None, draws the border
     """
     window.fill((255, 255, 255))
     # Draw time
-    fnt = pygame.font.SysFont("comicsans", 40)
-    text = fnt.render("Time: " + format_time(game_time), True, (0, 0, 0))
+    text = glyphs.get_text("time", "Time: " + format_time(game_time))
     window.blit(text, (540 - 160, 560))
     if is_solved:
-        window.blit(fnt.render("Done!", True, (0, 0, 0)), (20, 560))
+        window.blit(glyphs.get_text("done", "Done!"), (20, 560))
+    elif hint_text:
+        window.blit(glyphs.get_text("hint", hint_text), (20, 560))
     # Draw grid and board
-    draw_sudoku_board(window, puzzle, 540, 540)
+    draw_sudoku_board(window, puzzle, 540, 540, glyphs, hints)
+
+
+class DirtyRenderer:
+    """
+    Draws the game by only repainting what changed since the last frame: cells whose number or pencil marks changed,
+    cells that were selected or unselected, and the status bar when the clock text, solved state, or hint changed
+    """
+    # The area under the board holding the clock and the done text, below the thick bottom line
+    STATUS_RECT = pygame.Rect(0, 543, 540, 57)
+
+    def __init__(self, window: pygame.Surface, glyphs: GlyphAtlas, board_width: int, board_height: int,
+                 box_size: int = 3):
+        self.window = window
+        self.glyphs = glyphs
+        self.board_width = board_width
+        self.board_height = board_height
+        self.box_size = box_size
+        self.rows = box_size * box_size
+        # What was on screen after the last frame, None until the first full draw
+        self.drawn_grid: Optional[np.ndarray] = None
+        self.drawn_selected: Optional[Tuple[int, int]] = None
+        self.drawn_status: Optional[Tuple[str, bool, str]] = None
+
+    def get_cell_rect(self, row: int, col: int) -> pygame.Rect:
+        """
+        Gets the area of the window a cell covers
+        :param row: the row of the cell
+        :param col: the col of the cell
+        :return: The cell's rectangle
+        """
+        gap_width = self.board_width / self.rows
+        gap_height = self.board_height / self.rows
+        left = int(col * gap_width)
+        top = int(row * gap_height)
+        return pygame.Rect(left, top, int((col + 1) * gap_width) - left, int((row + 1) * gap_height) - top)
+
+    def draw_status(self, status: Tuple[str, bool, str]):
+        """
+        Draws the status bar
+        :param status: The clock text, if the puzzle is solved, and the hint text
+        :return: None, the status bar is drawn
+        """
+        time_text, is_solved, hint_text = status
+        self.window.fill((255, 255, 255), self.STATUS_RECT)
+        self.window.blit(self.glyphs.get_text("time", time_text), (540 - 160, 560))
+        if is_solved:
+            self.window.blit(self.glyphs.get_text("done", "Done!"), (20, 560))
+        elif hint_text:
+            self.window.blit(self.glyphs.get_text("hint", hint_text), (20, 560))
+
+    def redraw_cell(self, puzzle: Puzzle, row: int, col: int, hints: Optional[HintEngine] = None) -> pygame.Rect:
+        """
+        Repaints one cell, including the bits of grid line running over it
+        :param puzzle: The puzzle being drawn
+        :param row: the row of the cell
+        :param col: the col of the cell
+        :param hints: Optional hint engine to pencil in the cell's candidates from
+        :return: The area that was repainted
+        """
+        rect = self.get_cell_rect(row, col)
+        self.window.set_clip(rect)
+        self.window.fill((255, 255, 255))
+        draw_grid_lines(self.window, self.rows, self.board_width, self.board_height, self.box_size)
+        candidates = hints.get_candidates(row, col) if hints is not None else 0
+        draw_cell(self.window, puzzle.puzzle_grid[row, col], row, col, self.board_width, self.board_height,
+                  puzzle.selected == (row, col), puzzle.is_given(row, col), self.glyphs, self.rows, candidates)
+        self.window.set_clip(None)
+        return rect
+
+    def render(self, puzzle: Puzzle, game_time: float, is_solved: bool, full: bool = False,
+               hints: Optional[HintEngine] = None, hint_text: str = "") -> list[pygame.Rect]:
+        """
+        Draws what changed since the last frame
+        :param puzzle: The puzzle to draw
+        :param game_time: How long the user has been working on the puzzle
+        :param is_solved: If the puzzle is solved now
+        :param full: If True repaint the whole window, like when it was covered up or pencil marks were turned on or off
+        :param hints: Optional hint engine, if passed the candidates of empty cells are penciled in
+        :param hint_text: Optional hint to show under the board
+        :return: The areas that were repainted, to pass to pygame.display.update
+        """
+        status = "Time: " + format_time(game_time), is_solved, hint_text
+        # The engine already knows which cells it changed, so the pencil marks don't have to be compared
+        changed_cells = hints.take_changed() if hints is not None else set()
+        if full or self.drawn_grid is None:
+            redraw_window(self.window, puzzle, game_time, is_solved, self.glyphs, hints, hint_text)
+            dirty = [self.window.get_rect()]
+        else:
+            dirty_cells = {(int(row), int(col)) for row, col in np.argwhere(puzzle.puzzle_grid != self.drawn_grid)}
+            dirty_cells.update(changed_cells)
+            if puzzle.selected != self.drawn_selected:
+                dirty_cells.update(cell for cell in (self.drawn_selected, puzzle.selected) if cell is not None)
+            dirty = [self.redraw_cell(puzzle, row, col, hints) for row, col in dirty_cells]
+            if status != self.drawn_status:
+                self.draw_status(status)
+                dirty.append(self.STATUS_RECT)
+        self.drawn_grid = np.array(puzzle.puzzle_grid)
+        self.drawn_selected = puzzle.selected
+        self.drawn_status = status
+        return dirty
 
 
 def handle_arrow_keys(event: pygame.event.Event, puzzle: Puzzle):
@@ -122,75 +313,135 @@ def handle_arrow_keys(event: pygame.event.Event, puzzle: Puzzle):
     if event.key == pygame.K_UP:
         puzzle.selected = max(puzzle.selected[0] - 1, 0), puzzle.selected[1]
     if event.key == pygame.K_DOWN:
-        puzzle.selected = min(puzzle.selected[0] + 1, 8), puzzle.selected[1]
+        puzzle.selected = min(puzzle.selected[0] + 1, puzzle.size - 1), puzzle.selected[1]
     if event.key == pygame.K_LEFT:
         puzzle.selected = puzzle.selected[0], max(puzzle.selected[1] - 1, 0)
     if event.key == pygame.K_RIGHT:
-        puzzle.selected = puzzle.selected[0], min(puzzle.selected[1] + 1, 8)
+        puzzle.selected = puzzle.selected[0], min(puzzle.selected[1] + 1, puzzle.size - 1)
 
 
-def main():
+def main(box_size: int = 3):
+    """
+    Runs the game
+    :param box_size: How many rows (and cols) each square has, 3 for a normal 9 by 9 puzzle, 4 for 16 by 16
+    :return: None, returns when the window is closed
+    """
     # Initialize the pygame fonts
     pygame.font.init()
     board_width = 540
     board_height = 540
-    rows = 9
-    cols = 9
+    rows = box_size * box_size
+    cols = box_size * box_size
     window = pygame.display.set_mode((540, 600))
     pygame.display.set_caption("Sudoku Fun")
-    puzzle = make_solvable_puzzle()
+    # Shrink the digits on bigger boards so they still fit in the smaller cells
+    glyphs = GlyphAtlas(font_size=40 * 3 // max(box_size, 3), max_digit=rows)
+    renderer = DirtyRenderer(window, glyphs, board_width, board_height, box_size)
+    clock = pygame.time.Clock()
+    # Refills in the background while the game is played, and is saved for the next game when the window closes
+    pool = PuzzlePool(capacity=8, low_water=4, path=os.path.join(POOL_DIRECTORY, f'pool-{box_size}.txt'),
+                      box_size=box_size)
+    puzzle = pool.get()
+    hints = puzzle.get_hints()
+    # F1 turns the pencil marks on and off, F2 asks for a hint
+    show_pencil_marks = False
+    hint_text = ""
     run = True
-    is_puzzle_solved = False
+    is_puzzle_solved = puzzle.is_puzzle_solved()
     start = time.time()
     play_time = 0
     while run:
         if not is_puzzle_solved:
             play_time = round(time.time() - start)
 
+        full_redraw = False
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 run = False
             if event.type == pygame.KEYDOWN:
-                handle_number_updates(event, puzzle)
+                # Only an edit can change if the puzzle is solved
+                if handle_number_updates(event, puzzle):
+                    is_puzzle_solved = puzzle.is_puzzle_solved()
+                    hint_text = ""
                 handle_arrow_keys(event, puzzle)
+                if event.key == pygame.K_F1:
+                    show_pencil_marks = not show_pencil_marks
+                    full_redraw = True
+                if event.key == pygame.K_F2:
+                    hint_text = show_hint(puzzle, hints)
 
             if event.type == pygame.MOUSEBUTTONDOWN:
                 puzzle.selected = (get_clicked_row_col(pygame.mouse.get_pos(), board_width, board_height, rows, cols))
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                full_redraw = True
 
-        is_puzzle_solved = puzzle.is_puzzle_solved()
-        redraw_window(window, puzzle, play_time, is_puzzle_solved)
-        pygame.display.update()
+        dirty = renderer.render(puzzle, play_time, is_puzzle_solved, full_redraw,
+                                hints if show_pencil_marks else None, hint_text)
+        if dirty:
+            pygame.display.update(dirty)
+        clock.tick(MAX_FPS)
+    pool.close()
 
 
-def handle_number_updates(event: pygame.event.Event, puzzle: Puzzle):
+def show_hint(puzzle: Puzzle, hints: HintEngine) -> str:
+    """
+    Selects the next cell that can be filled in without guessing
+    :param puzzle: The puzzle being played
+    :param hints: The puzzle's hint engine
+    :return: Text saying what goes in the selected cell, for the status bar
+    """
+    hint = hints.get_hint()
+    if hint is None:
+        return "No hint"
+    puzzle.selected = hint.row, hint.col
+    return f"Hint: {DIGIT_CHARS[hint.digit]}"
+
+
+def handle_number_updates(event: pygame.event.Event, puzzle: Puzzle) -> bool:
     """
     If the user updates a number add that to the puzzle
     :param event: a pygame event
     :param puzzle: the puzzle to update
-    :return: None, the puzzle could be modified
+    :return: True if the puzzle was modified
     """
+    # Ctrl+Z undoes, Ctrl+Y or Ctrl+Shift+Z redoes, and the cell that changed is selected so it's easy to spot
+    if getattr(event, 'mod', 0) & pygame.KMOD_CTRL:
+        changed = None
+        if event.key == pygame.K_z and not event.mod & pygame.KMOD_SHIFT:
+            changed = puzzle.undo()
+        elif event.key == pygame.K_y or event.key == pygame.K_z:
+            changed = puzzle.redo()
+        if changed is None:
+            return False
+        puzzle.selected = changed
+        return True
     if puzzle.selected is None:
-        return
+        return False
     if event.key == pygame.K_1 or event.key == pygame.K_KP1:
-        puzzle.safe_update(puzzle.selected[0], puzzle.selected[1], 1)
+        return puzzle.safe_update(puzzle.selected[0], puzzle.selected[1], 1)
     if event.key == pygame.K_2 or event.key == pygame.K_KP2:
-        puzzle.safe_update(puzzle.selected[0], puzzle.selected[1], 2)
+        return puzzle.safe_update(puzzle.selected[0], puzzle.selected[1], 2)
     if event.key == pygame.K_3 or event.key == pygame.K_KP3:
-        puzzle.safe_update(puzzle.selected[0], puzzle.selected[1], 3)
+        return puzzle.safe_update(puzzle.selected[0], puzzle.selected[1], 3)
     if event.key == pygame.K_4 or event.key == pygame.K_KP4:
-        puzzle.safe_update(puzzle.selected[0], puzzle.selected[1], 4)
+        return puzzle.safe_update(puzzle.selected[0], puzzle.selected[1], 4)
     if event.key == pygame.K_5 or event.key == pygame.K_KP5:
-        puzzle.safe_update(puzzle.selected[0], puzzle.selected[1], 5)
+        return puzzle.safe_update(puzzle.selected[0], puzzle.selected[1], 5)
     if event.key == pygame.K_6 or event.key == pygame.K_KP6:
-        puzzle.safe_update(puzzle.selected[0], puzzle.selected[1], 6)
+        return puzzle.safe_update(puzzle.selected[0], puzzle.selected[1], 6)
     if event.key == pygame.K_7 or event.key == pygame.K_KP7:
-        puzzle.safe_update(puzzle.selected[0], puzzle.selected[1], 7)
+        return puzzle.safe_update(puzzle.selected[0], puzzle.selected[1], 7)
     if event.key == pygame.K_8 or event.key == pygame.K_KP8:
-        puzzle.safe_update(puzzle.selected[0], puzzle.selected[1], 8)
+        return puzzle.safe_update(puzzle.selected[0], puzzle.selected[1], 8)
     if event.key == pygame.K_9 or event.key == pygame.K_KP9:
-        puzzle.safe_update(puzzle.selected[0], puzzle.selected[1], 9)
+        return puzzle.safe_update(puzzle.selected[0], puzzle.selected[1], 9)
     if event.key == pygame.K_DELETE or event.key == pygame.K_BACKSPACE:
-        puzzle.safe_update(puzzle.selected[0], puzzle.selected[1], 0)
+        return puzzle.safe_update(puzzle.selected[0], puzzle.selected[1], 0)
+    # Bigger boards type the numbers past 9 as letters, A for 10 and so on
+    letter = getattr(event, 'unicode', '').upper()
+    if len(letter) == 1 and letter in DIGIT_CHARS[10:puzzle.size + 1]:
+        return puzzle.safe_update(puzzle.selected[0], puzzle.selected[1], DIGIT_CHARS.index(letter))
+    return False
 
 
 if __name__ == "__main__":
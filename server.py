@@ -0,0 +1,351 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional, Tuple, Union
+
+from classes.budget import Budget, BudgetExhausted
+from classes.core import validate_lines
+from classes.puzzle import GENERATORS, SOLVED, generate_with_budget, puzzle_from_line
+
+# Most seconds a request can take unless the server is started with another timeout, so one slow request can't hold a
+# worker (and the rest of its batch) forever
+DEFAULT_TIMEOUT = 10.0
+# Most solutions a count request finds unless it asks for another limit
+DEFAULT_COUNT_LIMIT = 1000
+
+
+def get_argument(request: dict, name: str, kind: Union[type, Tuple[type, ...]], default=None):
+    """
+    Gets an optional argument of a request, checking its type
+    :param request: The request
+    :param name: The name of the argument
+    :param kind: The type or types the argument can be
+    :param default: What to use when the request doesn't have the argument
+    :return: The argument, raises a TypeError if it has the wrong type
+    """
+    value = request.get(name, default)
+    # json true and false would pass for the number 1 and 0 otherwise
+    if value is not None and (not isinstance(value, kind) or isinstance(value, bool)):
+        raise TypeError(f"{name} has the wrong type")
+    return value
+
+
+def get_puzzle_line(request: dict) -> str:
+    """
+    Gets the puzzle line of a request
+    :param request: The request
+    :return: The line, raises a KeyError if it is missing or a TypeError if it isn't a string
+    """
+    line = request['puzzle']
+    if not isinstance(line, str):
+        raise TypeError("puzzle has to be a string")
+    return line
+
+
+def get_budget(request: dict, timeout: Optional[float]) -> Budget:
+    """
+    Gets the budget for a request, the request can ask for less time than the server allows but not more
+    :param request: The request, with an optional timeout and max_nodes
+    :param timeout: Optional most seconds the server lets any request take
+    :return: The budget
+    """
+    seconds = get_argument(request, 'timeout', (int, float))
+    if seconds is None or (timeout is not None and seconds > timeout):
+        seconds = timeout
+    return Budget(seconds, get_argument(request, 'max_nodes', int))
+
+
+def solve(request: dict, budget: Budget) -> dict:
+    solver = get_argument(request, 'solver', str, 'propagation')
+    result = puzzle_from_line(get_puzzle_line(request)).solve(solver, budget)
+    if result.status == SOLVED:
+        return {'status': result.status, 'solution': result.puzzle.to_line()}
+    if result.puzzle is not None:
+        return {'status': result.status, 'partial': result.puzzle.to_line()}
+    return {'status': result.status}
+
+
+def validate(request: dict, budget: Budget) -> dict:
+    # Checked on the plain cells, making a Puzzle would cost more than the check
+    valid, solved = validate_lines([get_puzzle_line(request)])[0]
+    return {'valid': valid, 'solved': solved}
+
+
+def count(request: dict, budget: Budget) -> dict:
+    limit = get_argument(request, 'limit', int, DEFAULT_COUNT_LIMIT)
+    return {'count': puzzle_from_line(get_puzzle_line(request)).count_solutions(limit, instrumentation=budget)}
+
+
+def generate(request: dict, budget: Budget) -> dict:
+    generator = GENERATORS[get_argument(request, 'kind', str, 'solvable')]
+    rng = random.Random(get_argument(request, 'seed', int))
+    box_size = get_argument(request, 'box_size', int, 3)
+    result = generate_with_budget(lambda budget: generator(rng, box_size, budget), budget, box_size)
+    if result.puzzle is None:
+        return {'status': result.status}
+    return {'status': result.status, 'puzzle': result.puzzle.to_line()}
+
+
+# What the server can be asked to do, by the op of the request
+OPERATIONS: dict[str, Callable[[dict, Budget], dict]] = {
+    'solve': solve,
+    'validate': validate,
+    'count': count,
+    'generate': generate,
+}
+
+
+def handle_request(request: dict, timeout: Optional[float] = None) -> dict:
+    """
+    Handles one request
+    :param request: The request, an op and the op's arguments, with an optional id that is sent back in the response
+    :param timeout: Optional most seconds the request can take
+    :return: The response, the id and the result, or the id and an error
+    """
+    response = {'id': request.get('id')}
+    try:
+        operation = OPERATIONS[request['op']]
+        response['result'] = operation(request, get_budget(request, timeout))
+    except KeyError as error:
+        response['error'] = f"Missing or unknown {error}"
+    except (ValueError, TypeError) as error:
+        response['error'] = str(error)
+    except BudgetExhausted as error:
+        response['error'] = f"budget_exhausted: {error.reason}"
+    except Exception as error:
+        # Anything else is still only this request's problem, not the rest of its batch's
+        response['error'] = f"Internal error: {type(error).__name__}: {error}"
+    return response
+
+
+def handle_batch(requests: list[dict], timeout: Optional[float] = None) -> list[dict]:
+    """
+    Handles a batch of requests, this is what each worker runs
+    :param requests: The requests
+    :param timeout: Optional most seconds each request can take
+    :return: The response for every request, in order
+    """
+    return [handle_request(request, timeout) for request in requests]
+
+
+class SolveServer:
+    """
+    Serves requests from clients over TCP or a Unix socket, one json object per line each way. Requests are put together
+    into small batches and handled in a pool of processes, so the event loop only reads, writes, and batches.
+    Backpressure: only max_pending requests wait for a batch and only a few batches per worker are in flight at once, so
+    when the server is busy it stops reading from sockets instead of queueing without limit. Responses on a connection
+    are sent in the order the requests came in
+    """
+
+    def __init__(self, workers: Optional[int] = None, batch_size: int = 64, batch_delay: float = 0.001,
+                 max_pending: int = 4096, timeout: Optional[float] = DEFAULT_TIMEOUT):
+        """
+        Makes a server, start it with start
+        :param workers: How many processes to use, defaults to one per cpu. 0 handles batches on one thread of this
+        process instead, which is handy for testing
+        :param batch_size: Most requests in a batch
+        :param batch_delay: Seconds to wait for a batch to fill up when requests are trickling in
+        :param max_pending: Most requests waiting for a batch before clients are made to wait
+        :param timeout: Most seconds any one request can take, None for no limit
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.executor: Optional[Executor] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.batch_slots: Optional[asyncio.Semaphore] = None
+        self.dispatcher: Optional[asyncio.Task] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0, path: Optional[str] = None) -> asyncio.AbstractServer:
+        """
+        Starts handling requests and listening for clients
+        :param host: The host to listen on for TCP
+        :param port: The port to listen on for TCP, 0 picks a free one
+        :param path: Optional Unix socket path to listen on instead of TCP
+        :return: The listening server, its sockets say where it ended up listening
+        """
+        if self.workers == 0:
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        else:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+        self.batch_slots = asyncio.Semaphore(2 * max(self.workers, 1))
+        self.dispatcher = asyncio.ensure_future(self._dispatch())
+        # Start the workers with an empty batch before listening, workers forked later would hold on to copies of the
+        # client sockets open right then, so closing a connection here wouldn't close it for the client
+        await asyncio.get_running_loop().run_in_executor(self.executor, handle_batch, [])
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self._serve_client, path)
+        else:
+            self.server = await asyncio.start_server(self._serve_client, host, port)
+        return self.server
+
+    async def close(self):
+        """
+        Stops listening and shuts down the workers
+        :return: None
+        """
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.dispatcher is not None:
+            self.dispatcher.cancel()
+            try:
+                await self.dispatcher
+            except asyncio.CancelledError:
+                pass
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+    async def submit(self, request: dict) -> asyncio.Future:
+        """
+        Queues a request for the next batch, waiting while the queue is full
+        :param request: The request
+        :return: A future for the response
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((request, future))
+        return future
+
+    async def _dispatch(self):
+        """
+        Takes requests off the queue in batches and hands each batch to the workers
+        :return: None, runs until cancelled
+        """
+        while True:
+            batch = [await self.queue.get()]
+            # Give a trickle of requests a moment to fill the batch, under load the queue already holds plenty
+            if self.batch_delay > 0 and self.queue.qsize() < self.batch_size - 1:
+                await asyncio.sleep(self.batch_delay)
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            await self.batch_slots.acquire()
+            asyncio.ensure_future(self._run_batch(batch))
+
+    async def _run_batch(self, batch: list[tuple[dict, asyncio.Future]]):
+        """
+        Handles a batch in the workers and hands out the responses
+        :param batch: Every request in the batch with the future for its response
+        :return: None, the futures are resolved
+        """
+        try:
+            responses = await asyncio.get_running_loop().run_in_executor(
+                self.executor, handle_batch, [request for request, _ in batch], self.timeout)
+            for (_, future), response in zip(batch, responses):
+                if not future.done():
+                    future.set_result(response)
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+        finally:
+            self.batch_slots.release()
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Reads requests from a client until it disconnects
+        :param reader: Where the requests come from
+        :param writer: Where the responses go
+        :return: None
+        """
+        # Futures for the responses in request order. Bounded, so a client that doesn't read its responses stops
+        # having its requests read too
+        responses: asyncio.Queue = asyncio.Queue(maxsize=self.max_pending)
+        sender = asyncio.ensure_future(self._send_responses(responses, writer))
+        try:
+            while not sender.done():
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("Requests must be json objects")
+                except ValueError as error:
+                    future = asyncio.get_running_loop().create_future()
+                    future.set_result({'id': None, 'error': f"Bad request: {error}"})
+                else:
+                    future = await self.submit(request)
+                await responses.put(future)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            await responses.put(None)
+            await sender
+
+    @staticmethod
+    async def _send_responses(responses: asyncio.Queue, writer: asyncio.StreamWriter):
+        """
+        Writes responses to a client in request order
+        :param responses: Futures for the responses, None once there are no more
+        :param writer: Where the responses go
+        :return: None
+        """
+        try:
+            while True:
+                future = await responses.get()
+                if future is None:
+                    break
+                try:
+                    response = await future
+                except Exception as error:
+                    response = {'id': None, 'error': f"Internal error: {error}"}
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve solve, validate, count, and generate requests, one json object "
+                                                 "per line")
+    parser.add_argument('--host', default='127.0.0.1', help="Host to listen on")
+    parser.add_argument('--port', type=int, default=8765, help="Port to listen on")
+    parser.add_argument('--unix', default=None, help="Unix socket path to listen on instead of TCP")
+    parser.add_argument('--workers', type=int, default=None, help="How many processes to use, one per cpu by default")
+    parser.add_argument('--batch-size', type=int, default=64, help="Most requests handled in one batch")
+    parser.add_argument('--batch-delay', type=float, default=0.001, help="Seconds to wait for a batch to fill")
+    parser.add_argument('--max-pending', type=int, default=4096, help="Most requests waiting before clients wait")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help="Most seconds any one request can take, 0 for no limit")
+    return parser.parse_args(argv)
+
+
+async def serve(args: argparse.Namespace):
+    server = SolveServer(args.workers, args.batch_size, args.batch_delay, args.max_pending, args.timeout or None)
+    listener = await server.start(args.host, args.port, args.unix)
+    print(f"Listening on {', '.join(str(sock.getsockname()) for sock in listener.sockets)}", file=sys.stderr)
+    try:
+        await listener.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Runs the server until interrupted
+    :param argv: The arguments, defaults to the ones the program was run with
+    :return: The exit code
+    """
+    try:
+        asyncio.run(serve(parse_args(argv)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import io
+import json
+
+import pytest
+
+import benchmark
+from benchmark import CORPUS, FORMAT_VERSION, PATHOLOGICAL_LINES, compare_results, main, time_calls
+from classes.puzzle import puzzle_from_line
+
+NAMES = ['get_options_for_index/pathological', 'is_puzzle_valid/pathological']
+# Time each benchmark only once, the tests check what is written and not how fast it is
+QUICK = ['--repeat', '1', '--min-seconds', '0']
+
+
+def make_results(normalized: dict) -> dict:
+    return {'version': FORMAT_VERSION, 'results': {name: {'normalized': value} for name, value in normalized.items()}}
+
+
+def test_corpus_puzzles_are_unique():
+    for lines in CORPUS.values():
+        for line in lines:
+            assert puzzle_from_line(line).count_solutions(2) == 1
+
+
+def test_pathological_puzzle_ends_high():
+    # The first row of the solution counts down, so a backtracker trying 1 first has to undo every early guess
+    answer_key = puzzle_from_line(PATHOLOGICAL_LINES[0]).generate_answer_key_dlx()
+    assert list(answer_key.puzzle_grid[0]) == [9, 8, 7, 6, 5, 4, 3, 2, 1]
+
+
+def test_compare_results():
+    results = make_results({'a': 1.0, 'b': 3.0, 'new': 1.0})
+    baseline = make_results({'a': 1.0, 'b': 2.0, 'old': 1.0})
+    assert compare_results(results, baseline, 1.25) == [('a', 1.0, False), ('b', 1.5, True)]
+    assert compare_results(results, baseline, 2.0) == [('a', 1.0, False), ('b', 1.5, False)]
+    baseline['version'] = FORMAT_VERSION + 1
+    with pytest.raises(ValueError):
+        compare_results(results, baseline, 1.25)
+
+
+def test_main_writes_results():
+    stdout = io.StringIO()
+    assert main(QUICK + NAMES, stdout, io.StringIO()) == 0
+    results = json.loads(stdout.getvalue())
+    assert results['version'] == FORMAT_VERSION
+    assert list(results['results']) == NAMES
+    assert all(result['seconds'] > 0 for result in results['results'].values())
+
+
+def test_main_fails_on_slowdown(tmp_path):
+    path = tmp_path / "baseline.json"
+    output = str(tmp_path / "results.json")
+    stderr = io.StringIO()
+    # A baseline far faster than anything can run is always a slowdown
+    path.write_text(json.dumps(make_results({name: 1e-9 for name in NAMES})))
+    argv = QUICK + ['--baseline', str(path), '--output', output] + NAMES
+    assert main(argv, io.StringIO(), stderr) == 1
+    assert "SLOWER" in stderr.getvalue()
+    # And a baseline far slower never is
+    path.write_text(json.dumps(make_results({name: 1e9 for name in NAMES})))
+    assert main(argv, io.StringIO(), io.StringIO()) == 0
+
+
+def test_unknown_benchmark():
+    with pytest.raises(SystemExit):
+        main(['no_such_benchmark'], io.StringIO(), io.StringIO())
+
+
+def test_time_calls_runs_for_min_seconds():
+    calls = []
+    seconds = time_calls(lambda: calls.append(None), 0.05)
+    assert len(calls) > 1
+    assert seconds * len(calls) >= 0.05
+    calls.clear()
+    time_calls(lambda: calls.append(None), 0)
+    assert len(calls) == 1
+
+
+def test_safe_update_benchmark_repeats_the_same_work(monkeypatch):
+    puzzles = []
+
+    def make_puzzle(line: str):
+        puzzles.append(puzzle_from_line(line))
+        return puzzles[-1]
+    monkeypatch.setattr(benchmark, 'puzzle_from_line', make_puzzle)
+    run = benchmark.safe_update_benchmark(PATHOLOGICAL_LINES)
+    run()
+    moves = len(puzzles[0].journal)
+    # Each call records the same moves into a fresh journal, instead of timing a journal that keeps growing
+    run()
+    assert len(puzzles[0].journal) == moves
+    assert puzzles[0].to_line() == PATHOLOGICAL_LINES[0]
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from classes.batch import derive_seed, generate_puzzles
+
+
+def test_derive_seed_differs():
+    seeds = {derive_seed(1, index) for index in range(100)}
+    assert len(seeds) == 100
+    assert derive_seed(1, 0) != derive_seed(2, 0)
+    assert derive_seed(1, 0) == derive_seed(1, 0)
+
+
+def test_generate_in_process():
+    puzzles = dict(generate_puzzles(5, 7, workers=0))
+    assert sorted(puzzles) == list(range(5))
+    assert all(puzzle.count_solutions() == 1 for puzzle in puzzles.values())
+
+
+def test_generate_answer_keys():
+    puzzles = dict(generate_puzzles(3, 7, kind='answer_key', workers=0))
+    assert all(puzzle.is_puzzle_solved() for puzzle in puzzles.values())
+
+
+def test_generate_same_for_any_workers():
+    in_process = dict(generate_puzzles(12, 3, workers=0))
+    in_pool = dict(generate_puzzles(12, 3, workers=2, chunk_size=5))
+    assert sorted(in_pool) == list(range(12))
+    for index, puzzle in in_process.items():
+        assert np.all(puzzle.puzzle_grid == in_pool[index].puzzle_grid)
+
+
+def test_generate_ordered():
+    indexes = [index for index, _ in generate_puzzles(10, 3, workers=2, chunk_size=1, ordered=True)]
+    assert indexes == list(range(10))
+
+
+def test_generate_unknown_kind():
+    with pytest.raises(ValueError):
+        list(generate_puzzles(1, 3, kind='bad'))
+
+
+def test_generate_bad_sizes():
+    for count, workers, chunk_size in ((-1, 0, 16), (1, -1, 16), (1, 0, 0), (1, 2, -3)):
+        with pytest.raises(ValueError):
+            list(generate_puzzles(count, 3, workers=workers, chunk_size=chunk_size))
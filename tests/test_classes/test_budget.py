@@ -0,0 +1,98 @@
+import random
+import time
+
+import numpy as np
+import pytest
+
+from classes.budget import Budget, BudgetExhausted, CancellationToken
+from classes.instrumentation import Instrumentation
+from classes.puzzle import (BUDGET_EXHAUSTED, SOLVED, UNSOLVABLE, Puzzle, generate_with_budget, make_puzzle_answer_key,
+                            make_unique_puzzle, puzzle_from_line)
+
+# Relabeled so a row by row backtracker gets every early guess wrong, brute force takes around a second
+PATHOLOGICAL_LINE = "007600001300090008000300975008000036010030000090065000020100400000080000070000500"
+
+
+def is_partial_of(partial: Puzzle, puzzle: Puzzle) -> bool:
+    # Keeps every given and breaks no rules
+    givens = puzzle.puzzle_grid != 0
+    return np.array_equal(partial.puzzle_grid[givens], puzzle.puzzle_grid[givens]) and partial.is_puzzle_valid()
+
+
+@pytest.mark.parametrize('method', ['brute_force', 'propagation', 'dlx'])
+def test_solve_statuses(method):
+    puzzle = puzzle_from_line(PATHOLOGICAL_LINE)
+    if method != 'brute_force':
+        result = puzzle.solve(method)
+        assert result.status == SOLVED
+        assert result.puzzle.is_puzzle_solved()
+    result = puzzle.solve(method, Budget(max_nodes=10))
+    assert result.status == BUDGET_EXHAUSTED
+    assert result.reason == 'nodes'
+    assert is_partial_of(result.puzzle, puzzle)
+    assert np.count_nonzero(result.puzzle.puzzle_grid) > np.count_nonzero(puzzle.puzzle_grid)
+    # The first cell has no options left
+    assert puzzle_from_line('0234567891' + '0' * 71).solve(method, Budget(max_nodes=10)) == (UNSOLVABLE, None, None)
+
+
+def test_solver_reusable_after_budget():
+    puzzle = puzzle_from_line('0' * 81)
+    assert puzzle.solve('dlx', Budget(max_nodes=3)).status == BUDGET_EXHAUSTED
+    assert puzzle.solve('dlx').puzzle.is_puzzle_solved()
+    assert puzzle.count_solutions(2) == 2
+
+
+def test_deadline():
+    start = time.perf_counter()
+    result = puzzle_from_line(PATHOLOGICAL_LINE).solve('brute_force', Budget(seconds=0.01))
+    assert time.perf_counter() - start < 0.2
+    assert result.status == BUDGET_EXHAUSTED
+    assert result.reason == 'deadline'
+
+
+def test_cancel():
+    token = CancellationToken()
+    budget = Budget(token=token, on_place=lambda row, col, digit, depth: depth >= 20 and token.cancel())
+    result = puzzle_from_line(PATHOLOGICAL_LINE).solve('brute_force', budget)
+    assert result.status == BUDGET_EXHAUSTED
+    assert result.reason == 'cancelled'
+    assert budget.max_depth == 20
+    assert token.cancelled
+
+
+def test_reset_restarts_deadline():
+    budget = Budget(seconds=0.01, max_nodes=5)
+    time.sleep(0.02)
+    with pytest.raises(BudgetExhausted):
+        budget.check()
+    budget.reset()
+    budget.check()
+
+
+def test_generate_fill_exhausted():
+    result = generate_with_budget(lambda budget: make_puzzle_answer_key(random.Random(1), instrumentation=budget),
+                                  Budget(max_nodes=10))
+    assert result.status == BUDGET_EXHAUSTED
+    assert 0 < np.count_nonzero(result.puzzle.puzzle_grid) <= 11
+    assert result.puzzle.is_puzzle_valid()
+
+
+def test_generate_remove_exhausted():
+    # Let the fill finish, then run out while removing numbers
+    fill = Instrumentation()
+    make_puzzle_answer_key(random.Random(2), instrumentation=fill)
+    budget = Budget(max_nodes=fill.cells_tried + 300)
+    result = generate_with_budget(lambda budget: make_unique_puzzle(rng=random.Random(2), instrumentation=budget)[0],
+                                  budget)
+    assert result.status == BUDGET_EXHAUSTED
+    # Still a puzzle with one solution, just with more numbers left in than a finished one
+    finished, _ = make_unique_puzzle(rng=random.Random(2))
+    assert result.puzzle.count_solutions(2) == 1
+    assert np.count_nonzero(result.puzzle.puzzle_grid) > np.count_nonzero(finished.puzzle_grid)
+
+
+def test_generate_solved():
+    result = generate_with_budget(lambda budget: make_unique_puzzle(rng=random.Random(2), instrumentation=budget)[0],
+                                  Budget(seconds=60))
+    assert result.status == SOLVED
+    assert result.puzzle.count_solutions(2) == 1
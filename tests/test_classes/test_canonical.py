@@ -0,0 +1,126 @@
+import random
+
+import numpy as np
+import pytest
+
+from classes import canonical as canonical_module
+from classes.canonical import SolutionCache, Transform, canonicalize, get_canonical_key
+from classes.puzzle import Puzzle, SEED_GRID, make_puzzle_answer_key, make_unique_puzzle, permute_grid
+
+
+def shuffle(grid: np.ndarray, rng: random.Random) -> np.ndarray:
+    # permute_grid covers bands, rows, stacks, cols, digits, and transposes, rotating covers reflections too
+    return np.ascontiguousarray(np.rot90(permute_grid(grid, rng), rng.randrange(4)))
+
+
+def test_transform_round_trip():
+    rng = random.Random(0)
+    grid = make_unique_puzzle(rng=rng)[0].puzzle_grid
+    canonical, transform = canonicalize(grid)
+    assert np.all(transform.apply(grid) == canonical)
+    assert np.all(transform.invert(canonical) == grid)
+    assert sorted(transform.digits) == list(range(10))
+    assert transform.digits[0] == 0
+
+
+def test_same_puzzle_same_key():
+    rng = random.Random(1)
+    for grid in (make_unique_puzzle(rng=rng)[0].puzzle_grid, make_puzzle_answer_key(rng).puzzle_grid, SEED_GRID,
+                 np.zeros((9, 9), dtype=np.int8)):
+        key = get_canonical_key(grid)
+        for _ in range(4):
+            assert get_canonical_key(shuffle(grid, rng)) == key
+
+
+def test_canonical_is_smallest():
+    rng = random.Random(2)
+    grid = make_unique_puzzle(rng=rng)[0].puzzle_grid
+    canonical, _ = canonicalize(grid)
+    line = ''.join(str(value) for value in canonical.ravel())
+    for _ in range(20):
+        # Relabel by first appearance, the smallest labeling of a shuffle
+        shuffled = shuffle(grid, rng).ravel()
+        digits = {0: 0}
+        for value in shuffled:
+            digits.setdefault(value, len(digits))
+        assert line <= ''.join(str(digits[value]) for value in shuffled)
+    # The canonical form of a canonical grid is itself
+    again, _ = canonicalize(canonical)
+    assert np.all(again == canonical)
+
+
+def test_different_puzzles_different_keys():
+    rng = random.Random(3)
+    puzzle = make_unique_puzzle(rng=rng)[0]
+    answer_key = puzzle.generate_answer_key_dlx()
+    row, col = np.argwhere(puzzle.puzzle_grid == 0)[0]
+    more_clues = np.array(puzzle.puzzle_grid)
+    more_clues[row, col] = answer_key.puzzle_grid[row, col]
+    assert get_canonical_key(more_clues) != get_canonical_key(puzzle.puzzle_grid)
+    assert get_canonical_key(make_unique_puzzle(rng=rng)[0].puzzle_grid) != get_canonical_key(puzzle.puzzle_grid)
+
+
+def test_invalid_grids():
+    with pytest.raises(ValueError):
+        canonicalize(np.zeros((4, 4), dtype=np.int8))
+    grid = np.zeros((9, 9), dtype=np.int8)
+    grid[0, :2] = 5
+    with pytest.raises(ValueError):
+        canonicalize(grid)
+
+
+def test_cache_solves_equivalent_puzzles_once():
+    rng = random.Random(4)
+    solved = []
+    cache = SolutionCache(solve=lambda puzzle: solved.append(puzzle) or puzzle.generate_answer_key_dlx())
+    puzzle = make_unique_puzzle(rng=rng)[0]
+    for grid in (puzzle.puzzle_grid, shuffle(puzzle.puzzle_grid, rng), shuffle(puzzle.puzzle_grid, rng)):
+        answer_key = cache.solve(Puzzle(grid))
+        assert answer_key.is_puzzle_solved()
+        givens = grid != 0
+        assert np.all(answer_key.puzzle_grid[givens] == grid[givens])
+        assert np.all(answer_key.given_mask == givens)
+    assert len(solved) == 1
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_cache_evicts_least_recently_used():
+    rng = random.Random(5)
+    cache = SolutionCache(max_size=2)
+    first, second, third = (make_unique_puzzle(rng=rng)[0] for _ in range(3))
+    cache.solve(first)
+    cache.solve(second)
+    cache.solve(first)
+    cache.solve(third)
+    assert len(cache) == 2
+    assert get_canonical_key(second.puzzle_grid) not in cache.solutions
+    assert get_canonical_key(first.puzzle_grid) in cache.solutions
+
+
+def test_cache_exact_hit_skips_canonicalizing(monkeypatch):
+    rng = random.Random(6)
+    puzzle = make_unique_puzzle(rng=rng)[0]
+    cache = SolutionCache()
+    answer_key = cache.solve(puzzle)
+    canonicalized = []
+    monkeypatch.setattr(canonical_module, 'canonicalize', lambda grid: canonicalized.append(grid))
+    again = cache.solve(Puzzle(np.array(puzzle.puzzle_grid)))
+    assert canonicalized == []
+    assert np.array_equal(again.puzzle_grid, answer_key.puzzle_grid)
+    assert np.array_equal(again.given_mask, puzzle.puzzle_grid != 0)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_unsolvable():
+    grid = np.zeros((9, 9), dtype=np.int8)
+    grid[0, 1:9] = range(1, 9)
+    grid[1, 0] = 9
+    cache = SolutionCache()
+    assert cache.solve(Puzzle(grid)) is None
+    assert cache.solve(Puzzle(grid.T.copy())) is None
+    assert cache.hits == 1
+
+
+def test_identity_transform():
+    transform = Transform(False, tuple(range(9)), tuple(range(9)), tuple(range(10)))
+    assert np.all(transform.apply(SEED_GRID) == SEED_GRID)
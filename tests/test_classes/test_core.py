@@ -0,0 +1,100 @@
+import os
+import random
+import subprocess
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from classes import core
+from classes.puzzle import make_unique_puzzle, puzzle_from_line
+
+LINE = "002030001809000000730410000000500070007108900080002000000025097000000300500070860"
+
+
+def test_import_leaves_numpy_out():
+    code = "import sys, classes.core; sys.exit(any(name in sys.modules for name in ('numpy', 'pygame')))"
+    directory = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert subprocess.run([sys.executable, '-c', code], cwd=directory).returncode == 0
+
+
+def test_parse_line_round_trip():
+    cells, box_size = core.parse_line(LINE.replace('0', '.') + '\n')
+    assert box_size == 3
+    assert core.to_line(cells) == LINE
+    cells, box_size = core.parse_line('g' + '0' * 255)
+    assert box_size == 4 and cells[0] == 16
+    for bad_line in ('123', 'X' * 81, 'G' + '0' * 80):
+        with pytest.raises(ValueError):
+            core.parse_line(bad_line)
+
+
+def test_is_valid_matches_puzzle():
+    cells, _ = core.parse_line(LINE)
+    assert core.is_valid(cells)
+    assert not core.is_solved(cells)
+    rng = random.Random(2)
+    for _ in range(200):
+        changed = list(cells)
+        changed[rng.randrange(81)] = rng.randint(1, 9)
+        try:
+            expected = puzzle_from_line(core.to_line(changed)).is_puzzle_valid()
+        except ValueError:
+            expected = False
+        assert core.is_valid(changed) == expected
+    assert not core.is_valid(cells[:80])
+    assert not core.is_valid([10] + cells[1:])
+
+
+def test_solve_and_count():
+    puzzle = make_unique_puzzle(rng=random.Random(1))[0]
+    cells = puzzle.puzzle_grid.ravel().tolist()
+    answer_key = puzzle.generate_answer_key_dlx().puzzle_grid.ravel().tolist()
+    assert core.solve(cells) == answer_key
+    assert core.solve(cells, method='dlx') == answer_key
+    assert core.is_solved(answer_key)
+    assert core.count_solutions(cells) == 1
+    assert core.count_solutions([0] * 81, limit=3) == 3
+    with pytest.raises(ValueError):
+        core.solve(cells, method='guessing')
+
+
+def test_validate_lines():
+    cells, _ = core.parse_line(LINE)
+    answer_key = core.solve(cells)
+    assert core.validate_lines([LINE, core.to_line(answer_key), '11' + '0' * 79, 'nope']) == [
+        (True, False), (True, True), (False, False), (False, False)]
+
+
+def test_array_functions():
+    cells, _ = core.parse_line(LINE)
+    grid = core.to_grid(cells)
+    assert grid.shape == (9, 9) and grid.dtype == np.int8
+    assert core.to_grids([LINE, LINE]).shape == (2, 9, 9)
+    assert core.to_grids([]).shape == (0, 9, 9)
+    with pytest.raises(ValueError):
+        core.to_grids([LINE, '0' * 256])
+    assert core.to_puzzle(cells).to_line() == LINE
+
+
+def test_shared_solver_per_thread():
+    solvers = []
+    errors = []
+
+    def run(seed: int):
+        try:
+            solvers.append(core.get_shared_dancing_links())
+            for _ in range(3):
+                puzzle = make_unique_puzzle(rng=random.Random(seed))[0]
+                assert core.count_solutions(puzzle.puzzle_grid.ravel().tolist(), limit=2) == 1
+        except Exception as error:
+            errors.append(error)
+    threads = [threading.Thread(target=run, args=(seed,)) for seed in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len({id(solver) for solver in solvers}) == 4
+    assert core.get_shared_dancing_links() is core.get_shared_dancing_links()
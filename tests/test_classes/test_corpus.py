@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import pytest
+
+from classes.corpus import CorpusReader, CorpusWriter, PACKED_GRID_BYTES, pack_grids, unpack_grids, write_corpus
+from classes.puzzle import make_puzzle_answer_key, make_solvable_puzzle
+
+
+def test_pack_round_trip():
+    grids = np.stack([make_solvable_puzzle().puzzle_grid for _ in range(4)])
+    packed = pack_grids(grids)
+    assert packed.shape == (4, PACKED_GRID_BYTES)
+    assert np.all(unpack_grids(packed) == grids)
+
+
+def test_pack_rejects_bad_values():
+    grids = np.zeros((1, 9, 9), dtype=np.int8)
+    grids[0, 0, 0] = 10
+    with pytest.raises(ValueError):
+        pack_grids(grids)
+
+
+def test_corpus_without_clues(tmp_path):
+    path = str(tmp_path / "puzzles.sudk")
+    grids = np.stack([make_solvable_puzzle().puzzle_grid for _ in range(3)])
+    write_corpus(path, grids)
+    assert os.path.getsize(path) == 16 + 3 * PACKED_GRID_BYTES
+    reader = CorpusReader(path)
+    assert len(reader) == 3
+    assert np.all(reader.get_puzzle_grids(0, 3) == grids)
+    assert np.all(reader[1].puzzle_grid == grids[1])
+    assert np.all(reader[-1].puzzle_grid == grids[2])
+    assert [puzzle.original_indexes for puzzle in reader] == [reader[i].original_indexes for i in range(3)]
+    with pytest.raises(IndexError):
+        _ = reader[3]
+    with pytest.raises(ValueError):
+        _ = reader.difficulties
+
+
+def test_corpus_with_clues(tmp_path):
+    path = str(tmp_path / "puzzles.sudk")
+    solutions = np.stack([make_puzzle_answer_key().puzzle_grid for _ in range(5)])
+    clue_masks = np.random.rand(5, 9, 9) < 0.3
+    with CorpusWriter(path, with_clues=True) as writer:
+        writer.write(solutions[:2], clue_masks[:2], np.array([1, 2]))
+        writer.write(solutions[2:], clue_masks[2:], np.array([3, 4, 5]))
+    reader = CorpusReader(path)
+    assert len(reader) == 5
+    assert list(reader.difficulties) == [1, 2, 3, 4, 5]
+    assert np.all(reader.get_grids(0, 5) == solutions)
+    assert np.all(reader.get_clue_masks(0, 5) == clue_masks)
+    assert np.all(reader.get_puzzle_grids(0, 5) == np.where(clue_masks, solutions, 0))
+    chunks = list(reader.iter_puzzle_grids(chunk_size=2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+
+
+def test_corpus_empty(tmp_path):
+    path = str(tmp_path / "puzzles.sudk")
+    write_corpus(path, np.zeros((0, 9, 9), dtype=np.int8))
+    reader = CorpusReader(path)
+    assert len(reader) == 0
+    assert list(reader) == []
+
+
+def test_not_a_corpus(tmp_path):
+    path = str(tmp_path / "puzzles.sudk")
+    with open(path, 'wb') as file:
+        file.write(b'not a corpus at all')
+    with pytest.raises(ValueError):
+        CorpusReader(path)
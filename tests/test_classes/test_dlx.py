@@ -0,0 +1,74 @@
+from classes.dlx import DancingLinks
+from tests.test_classes.test_solver import HARD_PUZZLE, is_solution
+
+
+def test_solve_empty():
+    solver = DancingLinks()
+    empty = [0] * 81
+    assert is_solution(empty, solver.solve(empty))
+
+
+def test_solve_hard():
+    solver = DancingLinks()
+    assert is_solution(HARD_PUZZLE, solver.solve(HARD_PUZZLE))
+
+
+def test_count_unique():
+    solver = DancingLinks()
+    assert solver.count_solutions(HARD_PUZZLE) == 1
+
+
+def test_count_with_limit():
+    solver = DancingLinks()
+    assert solver.count_solutions([0] * 81, 2) == 2
+    assert solver.count_solutions([0] * 81, 50) == 50
+
+
+def test_count_many():
+    solver = DancingLinks()
+    solution = solver.solve(HARD_PUZZLE)
+    # Emptying two rows of the same band leaves a small number of ways to fill them back in
+    puzzle = [0] * 18 + solution[18:]
+    solutions = list(solver.solutions(puzzle))
+    assert len(solutions) == solver.count_solutions(puzzle) >= 1
+    assert solution in solutions
+    assert all(is_solution(puzzle, found) for found in solutions)
+    assert len({tuple(found) for found in solutions}) == len(solutions)
+
+
+def test_conflicting_givens():
+    solver = DancingLinks()
+    puzzle = [0] * 81
+    puzzle[0] = 5
+    puzzle[8] = 5
+    assert solver.solve(puzzle) is None
+    assert solver.count_solutions(puzzle) == 0
+    # The solver is still usable after rejecting a puzzle
+    assert is_solution(HARD_PUZZLE, solver.solve(HARD_PUZZLE))
+
+
+def test_no_solution():
+    solver = DancingLinks()
+    puzzle = [0] * 81
+    puzzle[1:9] = range(1, 9)
+    puzzle[9] = 9
+    assert solver.solve(puzzle) is None
+    assert solver.count_solutions(puzzle) == 0
+
+
+def test_abandoned_search_restored():
+    solver = DancingLinks()
+    search = solver.solutions([0] * 81)
+    next(search)
+    search.close()
+    assert solver.covered == []
+    assert solver.count_solutions(HARD_PUZZLE) == 1
+
+
+def test_other_sizes():
+    solver = DancingLinks(2)
+    # Every 4 by 4 grid, there are 288 of them
+    assert solver.count_solutions([0] * 16) == 288
+    assert solver.count_solutions([1, 2, 3, 4] + [0] * 12) == 12
+    solution = DancingLinks(4).solve([0] * 256)
+    assert sorted(solution[:16]) == list(range(1, 17))
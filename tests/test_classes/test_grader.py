@@ -0,0 +1,84 @@
+import random
+
+from classes.dlx import DancingLinks
+from classes.grader import Grader, TECHNIQUE_WEIGHTS
+from classes.puzzle import make_solvable_puzzle, make_unique_puzzle, puzzle_from_line
+from tests.test_classes.test_solver import HARD_PUZZLE
+
+# Needs locked candidates but nothing harder
+LOCKED_CANDIDATES_LINE = "004600009300020007000300248007000036090030000020068000050900100000070000040000800"
+# Needs an X-Wing
+X_WING_LINE = "002000103001000080000024000200509600070083002006000007000900000004000710000015008"
+# Needs a Swordfish
+SWORDFISH_LINE = "000064000000050000064100000007090003800003709190000060900025308020700010000000500"
+
+
+def test_grade_solvable_puzzles_are_easy():
+    grader = Grader()
+    for seed in range(20):
+        puzzle = make_solvable_puzzle(random.Random(seed))
+        grade = puzzle.grade(grader)
+        assert grade.solved
+        # Every removed cell was a naked single, so nothing harder is needed
+        assert grade.rating <= TECHNIQUE_WEIGHTS['naked_single']
+        assert grade.level in ('easy', 'medium')
+
+
+def test_grade_solves_correctly():
+    grader = Grader()
+    solver = DancingLinks()
+    for seed in range(20):
+        puzzle, _ = make_unique_puzzle(rng=random.Random(seed))
+        cells = puzzle.puzzle_grid.ravel().tolist()
+        grade = grader.grade(cells)
+        if grade.solved:
+            assert grader.cells == solver.solve(cells)
+
+
+def test_grade_trace():
+    puzzle = puzzle_from_line(LOCKED_CANDIDATES_LINE)
+    grade = puzzle.grade(trace=True)
+    assert grade.solved
+    assert grade.counts['locked_candidates'] > 0
+    assert grade.rating == TECHNIQUE_WEIGHTS['locked_candidates']
+    assert grade.level == 'hard'
+    assert len(grade.steps) == sum(grade.counts.values())
+    assert sum(step.placed is not None for step in grade.steps) == puzzle.to_line().count('0')
+    assert grade.score == sum(TECHNIQUE_WEIGHTS[step.technique] for step in grade.steps)
+    # Without a trace the steps are only counted
+    assert puzzle.grade().steps == ()
+    assert puzzle.grade().counts == grade.counts
+
+
+def test_grade_x_wing():
+    grade = puzzle_from_line(X_WING_LINE).grade(trace=True)
+    assert grade.solved
+    assert grade.counts.get('x_wing', 0) > 0
+    x_wing = next(step for step in grade.steps if step.technique == 'x_wing')
+    assert x_wing.placed is None
+    # Only the digit making the X-Wing is ruled out
+    assert len({digit for _, digit in x_wing.eliminated}) == 1
+    assert puzzle_from_line(SWORDFISH_LINE).grade().counts.get('swordfish', 0) > 0
+
+
+def test_grade_needs_guessing():
+    grader = Grader()
+    grade = grader.grade(HARD_PUZZLE)
+    assert not grade.solved
+    assert grade.level == 'unsolved'
+    # An empty grid has nothing to go on
+    assert grader.grade([0] * 81).counts == {}
+
+
+def test_grade_invalid():
+    grader = Grader()
+    assert not grader.grade([1, 1] + [0] * 79).solved
+    assert not grader.grade([0] * 80).solved
+    # Grading again after a bad puzzle still works
+    assert grader.grade(make_solvable_puzzle(random.Random(0)).puzzle_grid.ravel().tolist()).solved
+
+
+def test_grade_other_sizes():
+    puzzle = make_solvable_puzzle(random.Random(1), box_size=4)
+    grade = puzzle.grade()
+    assert grade.solved
@@ -0,0 +1,86 @@
+import pickle
+import random
+
+import numpy as np
+
+from classes.hints import Hint
+from classes.puzzle import Puzzle, make_solvable_puzzle, make_unique_puzzle, puzzle_from_line
+
+# Only the last cell of the first row is empty
+NAKED_SINGLE_LINE = '123456780' + '0' * 72
+# The 1s rule 1 out of every cell of the first row but the first
+HIDDEN_SINGLE_LINE = ('000000000'
+                      '000100000'
+                      '000000100'
+                      '010000000'
+                      '000000000'
+                      '000000000'
+                      '001000000'
+                      '000000000'
+                      '000000000')
+
+
+def assert_candidates_match(puzzle: Puzzle):
+    hints = puzzle.get_hints()
+    for row in range(puzzle.size):
+        for col in range(puzzle.size):
+            assert hints.get_candidates(row, col) == puzzle.get_options_mask(row, col)
+    singles = {cell for cell, candidates in enumerate(hints.candidates) if bin(candidates).count('1') == 1}
+    assert set(hints.singles) == singles
+
+
+def test_candidates_follow_writes():
+    rng = random.Random(1)
+    puzzle = make_solvable_puzzle(rng)
+    hints = puzzle.get_hints()
+    assert_candidates_match(puzzle)
+    hints.take_changed()
+    empty = [(int(row), int(col)) for row, col in np.argwhere(puzzle.puzzle_grid == 0)]
+    for _ in range(100):
+        row, col = rng.choice(empty)
+        puzzle.safe_update(row, col, rng.randint(0, 9))
+        changed = hints.take_changed()
+        # Only the cell and its peers can change
+        assert all(other_row == row or other_col == col or
+                   (other_row // 3, other_col // 3) == (row // 3, col // 3) for other_row, other_col in changed)
+        assert_candidates_match(puzzle)
+    while puzzle.undo() is not None:
+        pass
+    assert_candidates_match(puzzle)
+    # Writing many cells at once works everything out again
+    puzzle.puzzle_grid[:, :] = 0
+    assert_candidates_match(puzzle)
+    assert len(hints.take_changed()) == 81
+
+
+def test_naked_single():
+    puzzle = puzzle_from_line(NAKED_SINGLE_LINE)
+    assert puzzle.get_hints().get_hint() == Hint(0, 8, 9, 'naked_single')
+    puzzle.safe_update(0, 8, 9)
+    assert puzzle.get_hints().get_hint() != Hint(0, 8, 9, 'naked_single')
+
+
+def test_hidden_single():
+    puzzle = puzzle_from_line(HIDDEN_SINGLE_LINE)
+    assert not puzzle.get_hints().singles
+    assert puzzle.get_hints().get_hint() == Hint(0, 0, 1, 'hidden_single')
+
+
+def test_hints_follow_the_solution():
+    puzzle = make_unique_puzzle(rng=random.Random(2))[0]
+    answer_key = puzzle.generate_answer_key_dlx()
+    hints = puzzle.get_hints()
+    hint = hints.get_hint()
+    assert hint is not None
+    while hint is not None:
+        assert answer_key.puzzle_grid[hint.row, hint.col] == hint.digit
+        assert puzzle.safe_update(hint.row, hint.col, hint.digit)
+        hint = hints.get_hint()
+    assert_candidates_match(puzzle)
+
+
+def test_pickle_drops_hints():
+    puzzle = puzzle_from_line(NAKED_SINGLE_LINE)
+    puzzle.get_hints()
+    copied = pickle.loads(pickle.dumps(puzzle))
+    assert copied.get_hints().get_hint() == Hint(0, 8, 9, 'naked_single')
@@ -0,0 +1,100 @@
+import random
+
+import numpy as np
+
+from classes.dlx import DancingLinks
+from classes.instrumentation import Instrumentation
+from classes.puzzle import Puzzle, make_puzzle_answer_key, make_unique_puzzle, puzzle_from_line
+from classes.solver import PropagationSolver
+from tests.test_classes.test_solver import HARD_PUZZLE, is_solution
+
+EASY_LINE = "036094021010000397950320600020815003070400260345270000063007182701502900402100006"
+
+
+def make_hooked() -> tuple[Instrumentation, list, list]:
+    placed = []
+    backtracked = []
+    instrumentation = Instrumentation(lambda *args: placed.append(args), lambda *args: backtracked.append(args))
+    return instrumentation, placed, backtracked
+
+
+def test_brute_force():
+    instrumentation, placed, backtracked = make_hooked()
+    puzzle = puzzle_from_line(EASY_LINE)
+    empty = int(np.count_nonzero(puzzle.puzzle_grid == 0))
+    answer_key = puzzle.generate_answer_key_brute_force(instrumentation)
+    assert answer_key.is_puzzle_solved()
+    assert instrumentation.cells_tried == len(placed) >= empty
+    assert instrumentation.backtracks == len(backtracked)
+    assert instrumentation.validity_checks >= instrumentation.cells_tried
+    assert instrumentation.max_depth == empty
+    assert instrumentation.phase_times['solve'] > 0
+    # The last placement of every cell is the answer
+    last = {(row, col): digit for row, col, digit, _ in placed}
+    assert all(answer_key.puzzle_grid[row, col] == digit for (row, col), digit in last.items())
+
+
+def test_brute_force_same_answer():
+    puzzle = puzzle_from_line(EASY_LINE)
+    answer_key = puzzle.generate_answer_key_brute_force(Instrumentation())
+    assert np.array_equal(answer_key.puzzle_grid, puzzle.generate_answer_key_brute_force().puzzle_grid)
+
+
+def test_propagation_solver():
+    instrumentation, placed, backtracked = make_hooked()
+    solver = PropagationSolver()
+    assert is_solution(HARD_PUZZLE, solver.solve(HARD_PUZZLE, instrumentation))
+    assert instrumentation.backtracks == solver.backtracks == len(backtracked)
+    assert instrumentation.cells_tried == len(placed) >= HARD_PUZZLE.count(0)
+    assert instrumentation.validity_checks == 81 - HARD_PUZZLE.count(0)
+    assert instrumentation.candidate_computations > 0
+    assert instrumentation.max_depth >= 1
+    # The solver doesn't hold on to the instrumentation
+    assert solver.instrumentation is None
+    solver.solve(HARD_PUZZLE)
+    assert instrumentation.cells_tried == len(placed)
+
+
+def test_dancing_links():
+    instrumentation, placed, backtracked = make_hooked()
+    solver = DancingLinks()
+    assert solver.count_solutions([0] * 81, 3, instrumentation) == 3
+    assert instrumentation.cells_tried == len(placed) >= 81
+    assert instrumentation.max_depth == 81
+    assert instrumentation.phase_times['count'] > 0
+    assert solver.instrumentation is None
+    puzzle = Puzzle(np.reshape(HARD_PUZZLE, (9, 9)))
+    instrumentation.reset()
+    assert puzzle.generate_answer_key_dlx(instrumentation=instrumentation).is_puzzle_solved()
+    assert instrumentation.phase_times.keys() == {'solve'}
+    assert instrumentation.max_depth == HARD_PUZZLE.count(0)
+
+
+def test_make_puzzle_answer_key():
+    instrumentation, placed, backtracked = make_hooked()
+    answer_key = make_puzzle_answer_key(random.Random(5), instrumentation=instrumentation)
+    assert answer_key.is_puzzle_solved()
+    # Every cell ends up filled, so every placement but 81 was taken back
+    assert instrumentation.cells_tried - instrumentation.backtracks == 81
+    assert instrumentation.max_depth == 81
+    assert np.array_equal(answer_key.puzzle_grid, make_puzzle_answer_key(random.Random(5)).puzzle_grid)
+
+
+def test_make_unique_puzzle():
+    instrumentation = Instrumentation()
+    puzzle, solver_calls = make_unique_puzzle(rng=random.Random(3), instrumentation=instrumentation)
+    assert instrumentation.validity_checks == solver_calls
+    assert instrumentation.phase_times.keys() == {'fill', 'remove', 'count'}
+    assert instrumentation.phase_times['remove'] >= instrumentation.phase_times['count']
+    assert np.array_equal(puzzle.puzzle_grid, make_unique_puzzle(rng=random.Random(3))[0].puzzle_grid)
+
+
+def test_to_dict_and_reset():
+    instrumentation = Instrumentation()
+    puzzle_from_line(EASY_LINE).generate_answer_key_propagation(instrumentation=instrumentation)
+    counters = instrumentation.to_dict()
+    assert counters['cells_tried'] == instrumentation.cells_tried > 0
+    assert set(counters['phase_times']) == {'solve'}
+    instrumentation.reset()
+    assert instrumentation.to_dict() == {'cells_tried': 0, 'backtracks': 0, 'validity_checks': 0,
+                                         'candidate_computations': 0, 'max_depth': 0, 'phase_times': {}}
@@ -0,0 +1,122 @@
+import random
+
+import numpy as np
+import pytest
+
+from classes.journal import Move, MoveJournal
+from classes.puzzle import make_solvable_puzzle
+
+
+def get_empty_cells(puzzle):
+    return [(int(row), int(col)) for row, col in np.argwhere(puzzle.puzzle_grid == 0)]
+
+
+def test_record_undo_redo():
+    journal = MoveJournal()
+    assert not journal.can_undo and not journal.can_redo
+    journal.record(0, 0, 5)
+    journal.record(1, 0, 6)
+    assert journal.undo() == Move(1, 0, 6)
+    assert journal.can_redo
+    assert journal.redo() == Move(1, 0, 6)
+    assert journal.redo() is None
+    journal.undo()
+    # A new move drops the undone one
+    journal.record(2, 0, 7)
+    assert journal.moves == [Move(0, 0, 5), Move(2, 0, 7)]
+    assert not journal.can_redo
+    assert journal.undo() == Move(2, 0, 7)
+    assert journal.undo() == Move(0, 0, 5)
+    assert journal.undo() is None
+
+
+def test_bytes_round_trip():
+    journal = MoveJournal([Move(0, 0, 5), Move(80, 3, 0), Move(255, 0, 16)], 2)
+    log = journal.to_bytes()
+    assert len(log) == 16 + 4 * 3
+    assert MoveJournal.from_bytes(log) == journal
+    with pytest.raises(ValueError):
+        MoveJournal.from_bytes(log[:-1])
+    with pytest.raises(ValueError):
+        MoveJournal.from_bytes(b'nope' + log[4:])
+    with pytest.raises(ValueError):
+        MoveJournal([Move(0, 0, 5)], 2)
+
+
+def test_puzzle_undo_redo():
+    puzzle = make_solvable_puzzle(random.Random(1))
+    start = np.array(puzzle.puzzle_grid)
+    answer_key = puzzle.generate_answer_key_dlx()
+    cells = get_empty_cells(puzzle)[:5]
+    for row, col in cells:
+        assert puzzle.safe_update(row, col, answer_key.puzzle_grid[row, col])
+    # Writing the same value again isn't a move
+    row, col = cells[-1]
+    assert puzzle.safe_update(row, col, answer_key.puzzle_grid[row, col])
+    assert len(puzzle.journal) == 5
+    filled = np.array(puzzle.puzzle_grid)
+    for row, col in reversed(cells):
+        assert puzzle.undo() == (row, col)
+    assert puzzle.undo() is None
+    assert np.array_equal(puzzle.puzzle_grid, start)
+    # The masks follow the undo, so the undone digits are options again
+    row, col = cells[0]
+    assert answer_key.puzzle_grid[row, col] in puzzle.get_options_for_index(row, col)
+    for row, col in cells:
+        assert puzzle.redo() == (row, col)
+    assert puzzle.redo() is None
+    assert np.array_equal(puzzle.puzzle_grid, filled)
+    assert puzzle.is_puzzle_valid()
+
+
+def test_rejected_updates_are_not_recorded():
+    puzzle = make_solvable_puzzle(random.Random(2))
+    given_row, given_col = [(int(row), int(col)) for row, col in np.argwhere(puzzle.given_mask)][0]
+    assert not puzzle.safe_update(given_row, given_col, 0)
+    row, col = get_empty_cells(puzzle)[0]
+    taken = next(digit for digit in range(1, 10) if digit not in puzzle.get_options_for_index(row, col))
+    assert not puzzle.safe_update(row, col, taken)
+    assert len(puzzle.journal) == 0
+
+
+def test_replay():
+    puzzle = make_solvable_puzzle(random.Random(3))
+    start = np.array(puzzle.puzzle_grid)
+    answer_key = puzzle.generate_answer_key_dlx()
+    cells = get_empty_cells(puzzle)[:4]
+    for row, col in cells:
+        puzzle.safe_update(row, col, answer_key.puzzle_grid[row, col])
+    puzzle.safe_update(*cells[0], 0)
+    puzzle.undo()
+    log = puzzle.journal.to_bytes()
+
+    replayed = make_solvable_puzzle(random.Random(3))
+    assert np.array_equal(replayed.puzzle_grid, start)
+    replayed.replay(MoveJournal.from_bytes(log))
+    assert np.array_equal(replayed.puzzle_grid, puzzle.puzzle_grid)
+    assert replayed.journal == puzzle.journal
+    assert replayed.redo() == cells[0]
+    assert replayed.puzzle_grid[cells[0]] == 0
+
+    # The moves were made on a different puzzle
+    other = make_solvable_puzzle(random.Random(4))
+    with pytest.raises(ValueError):
+        other.replay(MoveJournal([Move(int(np.argmax(other.given_mask.ravel())), 0, 1)]))
+
+
+def test_failed_replay_changes_nothing():
+    puzzle = make_solvable_puzzle(random.Random(5))
+    answer_key = puzzle.generate_answer_key_dlx()
+    (row, col), *cells = get_empty_cells(puzzle)[:4]
+    puzzle.safe_update(row, col, answer_key.puzzle_grid[row, col])
+    start = np.array(puzzle.puzzle_grid)
+    journal = MoveJournal(puzzle.journal.moves, puzzle.journal.position)
+    # The first moves fit, the last one says a cell held a value it never had
+    moves = [Move(row * 9 + col, 0, int(answer_key.puzzle_grid[row, col])) for row, col in cells]
+    row, col = cells[0]
+    moves.append(Move(row * 9 + col, 0, 1))
+    with pytest.raises(ValueError):
+        puzzle.replay(MoveJournal(moves))
+    assert np.array_equal(puzzle.puzzle_grid, start)
+    assert puzzle.journal == journal
+    assert all(puzzle.get_options_mask(row, col) for row, col in cells)
@@ -0,0 +1,151 @@
+import threading
+import time
+
+import pytest
+
+from classes import pool as pool_module
+from classes.pool import ANY, PuzzlePool, make_pool_puzzle
+from classes.puzzle import make_unique_puzzle
+
+
+def wait_for(condition, seconds: float = 20) -> bool:
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_get_from_filled_pool():
+    pool = PuzzlePool(capacity=5, low_water=2, seed=1, start=False)
+    pool.fill()
+    assert len(pool) == 5
+    puzzle = pool.get()
+    assert puzzle.generate_answer_key_dlx() is not None
+    assert not puzzle.is_puzzle_empty()
+    assert pool.count() == 4
+
+
+def test_get_from_empty_pool():
+    pool = PuzzlePool(seed=2, start=False)
+    assert pool.get().generate_answer_key_dlx() is not None
+    assert len(pool) == 0
+
+
+def test_background_refill():
+    pool = PuzzlePool(capacity=6, low_water=3, seed=3)
+    try:
+        assert wait_for(lambda: len(pool) == 6)
+        lines = {pool.get().to_line() for _ in range(4)}
+        assert len(lines) == 4
+        assert wait_for(lambda: len(pool) == 6)
+    finally:
+        pool.close()
+    assert not pool.thread.is_alive()
+
+
+def test_survives_restart(tmp_path):
+    path = str(tmp_path / 'pool' / 'puzzles.txt')
+    pool = PuzzlePool(capacity=4, path=path, seed=4, start=False)
+    pool.fill()
+    first = pool.get().to_line()
+    pool.close()
+    assert open(path).read().count('\n') == 3
+    restarted = PuzzlePool(capacity=4, path=path, start=False)
+    assert len(restarted) == 3
+    assert restarted.get().to_line() != first
+    # Bad lines are skipped
+    with open(path, 'a') as file:
+        file.write(f"{ANY} {'1' * 81}\nnot a line\n")
+    assert len(PuzzlePool(capacity=4, path=path, start=False)) == 3
+
+
+def test_difficulties():
+    pool = PuzzlePool(capacity=2, kind='unique', difficulties=('easy', 'unsolved'), seed=5, start=False)
+    pool.fill()
+    assert pool.count('easy') == pool.count('unsolved') == 2
+    assert pool.get('unsolved').grade().level == 'unsolved'
+    assert pool.get('easy').grade().level == 'easy'
+    with pytest.raises(ValueError):
+        pool.get('medium')
+
+
+def test_workers():
+    pool = PuzzlePool(capacity=3, workers=1, seed=6, start=False)
+    pool.fill()
+    assert len(pool) == 3
+
+
+def test_unknown_kind():
+    with pytest.raises(ValueError):
+        PuzzlePool(kind='impossible')
+
+
+def test_concurrent_get_while_refilling():
+    pool = PuzzlePool(capacity=4, low_water=3, kind='unique', seed=7)
+    errors = []
+
+    def take():
+        try:
+            for _ in range(2):
+                assert pool.get().count_solutions(2) == 1
+                make_unique_puzzle()
+        except Exception as error:
+            errors.append(error)
+    try:
+        threads = [threading.Thread(target=take) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        assert wait_for(lambda: len(pool) == 4)
+        assert pool.thread.is_alive()
+        assert pool.last_error is None
+    finally:
+        pool.close()
+
+
+def test_refill_survives_an_error(monkeypatch):
+    calls = []
+
+    def make_puzzle(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise RuntimeError("generator failed")
+        return make_pool_puzzle(*args)
+    monkeypatch.setattr(pool_module, 'RETRY_SECONDS', 0.01)
+    monkeypatch.setattr(pool_module, 'make_pool_puzzle', make_puzzle)
+    pool = PuzzlePool(capacity=2, low_water=1, seed=8)
+    try:
+        assert wait_for(lambda: len(pool) == 2)
+        assert isinstance(pool.last_error, RuntimeError)
+    finally:
+        pool.close()
+
+
+def test_difficulty_the_kind_never_makes(monkeypatch):
+    # Every solvable puzzle only needs singles, so it is always easy
+    monkeypatch.setattr(pool_module, 'MAX_ATTEMPTS', 5)
+    pool = PuzzlePool(capacity=2, low_water=1, difficulties=('easy', 'hard'), seed=9, start=False)
+    with pytest.raises(ValueError):
+        pool.get('hard')
+    with pytest.raises(ValueError):
+        pool.fill()
+    assert pool.count('easy') == 2
+    assert pool.count('hard') == 0
+    # The refill thread gives up on the refill and keeps going instead of spinning
+    monkeypatch.setattr(pool_module, 'RETRY_SECONDS', 0.01)
+    pool = PuzzlePool(capacity=2, low_water=1, difficulties=('easy', 'hard'), seed=10)
+    try:
+        assert wait_for(lambda: pool.last_error is not None)
+        assert pool.thread.is_alive()
+        assert pool.get('easy').grade().level == 'easy'
+    finally:
+        pool.close()
+
+
+def test_unknown_difficulty():
+    with pytest.raises(ValueError):
+        PuzzlePool(difficulties=('easy', 'impossible'), start=False)
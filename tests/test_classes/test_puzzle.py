@@ -1,7 +1,10 @@
+import random
+
 import numpy as np
 import pytest
 
-from classes.puzzle import Puzzle, make_solvable_puzzle, make_puzzle_answer_key
+from classes.puzzle import Puzzle, make_solvable_puzzle, make_puzzle_answer_key, make_unique_puzzle, permute_grid, \
+    SEED_GRID, puzzle_from_line, get_seed_grid, GENERATORS
 
 
 def test_empty_puzzle_constructor():
@@ -189,3 +192,413 @@ def test_unable_to_modify_original_value():
     puzzle = Puzzle(grid)
     assert not puzzle.safe_update(0, 0, 1)
     assert puzzle.puzzle_grid[0, 0] == 2
+
+
+def test_options_follow_cell_writes():
+    puzzle = Puzzle()
+    puzzle.puzzle_grid[0, 0] = 5
+    assert 5 not in puzzle.get_options_for_index(0, 8)
+    assert 5 not in puzzle.get_options_for_index(8, 0)
+    assert 5 not in puzzle.get_options_for_index(2, 2)
+    assert 5 in puzzle.get_options_for_index(4, 4)
+    puzzle.puzzle_grid[0, 0] = 0
+    assert 5 in puzzle.get_options_for_index(0, 8)
+
+
+def test_options_follow_slice_writes():
+    puzzle = Puzzle()
+    puzzle.puzzle_grid[0, :] = np.arange(1, 10)
+    assert len(puzzle.get_options_for_index(1, 0)) == 6
+    puzzle.get_square(0, 0)[:] = 0
+    assert len(puzzle.get_options_for_index(1, 0)) == 9
+    puzzle.puzzle_grid += 0
+    assert len(puzzle.get_options_for_index(1, 0)) == 9
+
+
+def test_options_keep_duplicate_after_one_removed():
+    puzzle = Puzzle()
+    puzzle.puzzle_grid[0, 0] = 3
+    puzzle.puzzle_grid[0, 8] = 3
+    puzzle.puzzle_grid[0, 0] = 0
+    assert 3 not in puzzle.get_options_for_index(0, 4)
+
+
+def test_options_avoid_numbers():
+    puzzle = Puzzle()
+    assert puzzle.get_options_for_index(0, 0, [1, 2, 3]) == {4, 5, 6, 7, 8, 9}
+
+
+def test_options_mask_matches_options():
+    puzzle = make_puzzle_answer_key()
+    puzzle.puzzle_grid[0:3, :] = 0
+    for i in range(9):
+        for j in range(9):
+            mask = puzzle.get_options_mask(i, j)
+            assert {d for d in range(1, 10) if mask & (1 << d)} == puzzle.get_options_for_index(i, j)
+
+
+def test_solved_tracks_writes():
+    puzzle = make_puzzle_answer_key()
+    old_value = puzzle.puzzle_grid[4, 4]
+    puzzle.puzzle_grid[4, 4] = 0
+    assert not puzzle.is_puzzle_solved()
+    puzzle.puzzle_grid[4, 4] = old_value
+    assert puzzle.is_puzzle_solved()
+
+
+def test_update_valid_matches_full_check():
+    puzzle = make_puzzle_answer_key()
+    puzzle.puzzle_grid[0:5, :] = 0
+    for i in range(9):
+        for j in range(9):
+            for value in range(10):
+                expected_puzzle = Puzzle(np.array(puzzle.puzzle_grid))
+                expected_puzzle.puzzle_grid[i, j] = value
+                assert puzzle.is_update_valid(i, j, value) == expected_puzzle.is_puzzle_valid()
+
+
+def test_update_valid_with_existing_conflict():
+    puzzle = Puzzle()
+    puzzle.puzzle_grid[0, 0] = 4
+    puzzle.puzzle_grid[0, 5] = 4
+    assert not puzzle.is_update_valid(3, 3, 1)
+    # Removing either copy clears the conflict
+    assert puzzle.is_update_valid(0, 0, 0)
+    assert puzzle.is_update_valid(0, 5, 7)
+
+
+def test_update_valid_rejects_illegal_values():
+    puzzle = Puzzle()
+    assert not puzzle.is_update_valid(0, 0, 10)
+    assert not puzzle.is_update_valid(0, 0, -1)
+
+
+def test_solve_propagation_on_impossible_difficulty():
+    grid = np.array([
+        [0, 0, 2, 0, 3, 0, 0, 0, 1],
+        [8, 0, 9, 0, 0, 0, 0, 0, 0],
+        [7, 3, 0, 4, 1, 0, 0, 0, 0],
+        [0, 0, 0, 5, 0, 0, 0, 7, 0],
+        [0, 0, 7, 1, 0, 8, 9, 0, 0],
+        [0, 8, 0, 0, 0, 2, 0, 0, 0],
+        [0, 0, 0, 0, 2, 5, 0, 9, 7],
+        [0, 0, 0, 0, 0, 0, 3, 0, 0],
+        [5, 0, 0, 0, 7, 0, 8, 6, 0],
+    ])
+    puzzle = Puzzle(grid)
+    answer = puzzle.generate_answer_key_propagation()
+    assert answer
+    assert answer.is_puzzle_solved()
+    assert answer.original_indexes == puzzle.original_indexes
+    assert np.all(answer.puzzle_grid == puzzle.generate_answer_key_brute_force().puzzle_grid)
+
+
+def test_solve_propagation_empty():
+    answer = Puzzle().generate_answer_key_propagation()
+    assert answer
+    assert answer.is_puzzle_solved()
+
+
+def test_solve_propagation_no_solution():
+    grid = np.zeros((9, 9), dtype=np.int8)
+    grid[0, 1:9] = np.arange(1, 9)
+    grid[1, 0] = 9
+    assert Puzzle(grid).generate_answer_key_propagation() is None
+
+
+def test_solve_dlx_on_partially_filled():
+    puzzle = make_solvable_puzzle()
+    answer = puzzle.generate_answer_key_dlx()
+    assert answer
+    assert answer.is_puzzle_solved()
+    assert answer.original_indexes == puzzle.original_indexes
+
+
+def test_count_solutions():
+    assert Puzzle().count_solutions(3) == 3
+    answer_key = make_puzzle_answer_key()
+    assert answer_key.count_solutions() == 1
+    grid = np.zeros((9, 9), dtype=np.int8)
+    grid[0, 1:9] = np.arange(1, 9)
+    grid[1, 0] = 9
+    assert Puzzle(grid).count_solutions() == 0
+
+
+def test_generate_puzzle_unique():
+    puzzle = make_solvable_puzzle()
+    assert puzzle.count_solutions() == 1
+
+
+def test_generate_unique_puzzle():
+    puzzle, solver_calls = make_unique_puzzle()
+    assert puzzle.is_puzzle_valid()
+    assert puzzle.count_solutions() == 1
+    assert 0 < solver_calls <= 81
+    # Every remaining number is needed, taking any away makes more solutions
+    for row, col in puzzle.original_indexes:
+        grid = np.array(puzzle.puzzle_grid)
+        grid[row, col] = 0
+        assert Puzzle(grid).count_solutions(2) == 2
+
+
+def test_answer_key_generation_seeded():
+    first = make_puzzle_answer_key(random.Random(5))
+    second = make_puzzle_answer_key(random.Random(5))
+    assert np.all(first.puzzle_grid == second.puzzle_grid)
+    assert first.is_puzzle_solved()
+
+
+def test_answer_key_generation_from_seed_grid():
+    puzzle = make_puzzle_answer_key(random.Random(5), from_seed_grid=True)
+    assert puzzle.is_puzzle_solved()
+    assert not np.all(puzzle.puzzle_grid == SEED_GRID)
+
+
+def test_permute_grid_keeps_solved():
+    answer_key = make_puzzle_answer_key()
+    rng = random.Random(1)
+    for _ in range(20):
+        assert Puzzle(permute_grid(answer_key.puzzle_grid, rng)).is_puzzle_solved()
+
+
+def test_line_round_trip():
+    puzzle = make_solvable_puzzle()
+    line = puzzle.to_line()
+    assert len(line) == 81
+    assert np.all(puzzle_from_line(line).puzzle_grid == puzzle.puzzle_grid)
+    assert np.all(puzzle_from_line(line.replace('0', '.') + '\n').puzzle_grid == puzzle.puzzle_grid)
+
+
+def test_line_invalid():
+    with pytest.raises(ValueError):
+        puzzle_from_line('123')
+    with pytest.raises(ValueError):
+        puzzle_from_line('x' * 81)
+    with pytest.raises(ValueError):
+        puzzle_from_line('11' + '0' * 79)
+
+
+def test_given_mask_matches_original_indexes():
+    puzzle = make_solvable_puzzle()
+    assert np.all(puzzle.given_mask == (puzzle.puzzle_grid != 0))
+    for i in range(9):
+        for j in range(9):
+            assert puzzle.is_given(i, j) == ((i, j) in puzzle.original_indexes)
+
+
+def test_given_mask_not_changed_by_updates():
+    puzzle = Puzzle()
+    assert puzzle.safe_update(4, 4, 1)
+    assert not puzzle.is_given(4, 4)
+    assert not puzzle.given_mask.any()
+    with pytest.raises(ValueError):
+        puzzle.given_mask[0, 0] = True
+
+
+def test_original_indexes_settable():
+    puzzle = Puzzle()
+    puzzle.original_indexes = [(0, 0), (8, 8)]
+    assert puzzle.is_given(8, 8)
+    assert not puzzle.safe_update(0, 0, 1)
+    assert puzzle.original_indexes == [(0, 0), (8, 8)]
+    # The list handed out is a copy, changing it doesn't change which cells are original
+    puzzle.original_indexes.append((4, 4))
+    assert puzzle.original_indexes == [(0, 0), (8, 8)]
+    assert not puzzle.is_given(4, 4)
+
+
+def test_is_given_negative_indexes():
+    puzzle = Puzzle()
+    puzzle.original_indexes = [(8, 8), (0, 7)]
+    assert puzzle.is_given(-1, -1)
+    assert puzzle.is_given(0, -2)
+    assert not puzzle.is_given(-1, 0)
+    for row in range(-9, 9):
+        for col in range(-9, 9):
+            assert puzzle.is_given(row, col) == puzzle.given_mask[row, col]
+    # Only negative indexes wrap, like numpy
+    for row, col in ((9, 0), (0, 9), (-10, 0), (0, -10)):
+        with pytest.raises(IndexError):
+            puzzle.given_mask[row, col]
+        with pytest.raises(IndexError):
+            puzzle.is_given(row, col)
+
+
+def test_other_sizes():
+    for box_size in (2, 4):
+        size = box_size * box_size
+        answer_key = make_puzzle_answer_key(random.Random(1), box_size=box_size)
+        assert answer_key.puzzle_grid.shape == (size, size)
+        assert answer_key.is_puzzle_solved()
+        puzzle = make_solvable_puzzle(random.Random(2), box_size=box_size)
+        assert puzzle.box_size == box_size
+        assert not puzzle.is_puzzle_solved()
+        assert puzzle.generate_answer_key_propagation().is_puzzle_solved()
+        assert puzzle.generate_answer_key_dlx().is_puzzle_solved()
+        assert permute_grid(get_seed_grid(box_size), random.Random(3)).shape == (size, size)
+        assert Puzzle(permute_grid(get_seed_grid(box_size), random.Random(3)), box_size=box_size).is_puzzle_solved()
+    unique, _ = make_unique_puzzle(rng=random.Random(4), box_size=2)
+    assert unique.count_solutions() == 1
+    assert unique.generate_answer_key_brute_force().is_puzzle_solved()
+
+
+def test_twenty_five_by_twenty_five_generation():
+    # Seeds 2 and 3 took minutes when the grid was filled in by guessing alone
+    for seed in (0, 2, 3):
+        answer_key = make_puzzle_answer_key(random.Random(seed), box_size=5)
+        assert answer_key.puzzle_grid.shape == (25, 25)
+        assert answer_key.is_puzzle_solved()
+    puzzle = make_solvable_puzzle(random.Random(2), box_size=5)
+    assert not puzzle.is_puzzle_solved()
+    assert puzzle.generate_answer_key_propagation().is_puzzle_solved()
+    # The same seed makes the same grid
+    assert make_puzzle_answer_key(random.Random(5), box_size=5).to_line() == \
+        make_puzzle_answer_key(random.Random(5), box_size=5).to_line()
+
+
+def test_generators():
+    for kind, generator in GENERATORS.items():
+        for box_size in (2, 3):
+            puzzle = generator(random.Random(1), box_size, None)
+            assert puzzle.box_size == box_size
+            assert puzzle.count_solutions(2) == 1
+            assert puzzle.to_line() == generator(random.Random(1), box_size, None).to_line()
+        assert GENERATORS[kind](random.Random(1), 3, None).is_puzzle_solved() == (kind == 'answer_key')
+
+
+def test_sixteen_by_sixteen_updates():
+    puzzle = Puzzle(box_size=4)
+    assert puzzle.safe_update(0, 0, 16)
+    assert not puzzle.safe_update(0, 15, 16)
+    assert not puzzle.safe_update(3, 3, 16)
+    assert puzzle.safe_update(4, 4, 16)
+    assert not puzzle.safe_update(1, 1, 17)
+    assert puzzle.get_options_for_index(0, 1) == set(range(1, 16))
+    # A 16 by 16 grid needs a puzzle made for it
+    with pytest.raises(ValueError):
+        Puzzle(np.zeros((9, 9), dtype=np.int8), box_size=4)
+
+
+def test_sixteen_by_sixteen_line_round_trip():
+    puzzle = make_solvable_puzzle(random.Random(5), box_size=4)
+    line = puzzle.to_line()
+    assert len(line) == 256
+    assert np.all(puzzle_from_line(line.lower()).puzzle_grid == puzzle.puzzle_grid)
+    with pytest.raises(ValueError):
+        puzzle_from_line('H' + '0' * 255)
+    with pytest.raises(ValueError):
+        puzzle_from_line('A' + '0' * 80)
+
+
+def test_iter_solutions():
+    answer_key = make_puzzle_answer_key(random.Random(3))
+    # Taking out every 1 and 2 lets them swap places, so there is more than one solution
+    grid = np.array(answer_key.puzzle_grid)
+    grid[(grid == 1) | (grid == 2)] = 0
+    puzzle = Puzzle(grid)
+    count = puzzle.count_solutions()
+    assert count >= 2
+    solutions = puzzle.iter_solutions()
+    first = next(solutions)
+    # The grid is read when the iterator is made, so changing the puzzle doesn't change the solutions
+    puzzle.puzzle_grid[:, :] = 0
+    rest = list(solutions)
+    assert len(rest) + 1 == count == len({first.to_line()} | {other.to_line() for other in rest})
+    assert all(solution.is_puzzle_solved() for solution in rest)
+    assert np.array_equal(first.given_mask, answer_key.puzzle_grid > 2)
+    assert len(list(puzzle.iter_solutions(limit=2))) == 2
+    assert list(answer_key.iter_solutions())[0].to_line() == answer_key.to_line()
+    unsolvable = np.zeros((9, 9), dtype=np.int8)
+    unsolvable[0, 1:9] = np.arange(1, 9)
+    unsolvable[1, 0] = 9
+    assert list(Puzzle(unsolvable).iter_solutions()) == []
+
+
+def test_get_differing_cells():
+    answer_key = make_puzzle_answer_key(random.Random(4))
+    other = Puzzle(np.array(answer_key.puzzle_grid))
+    assert answer_key.get_differing_cells(other) == []
+    other.puzzle_grid[2, 3] = 0
+    other.puzzle_grid[7, 1] = 0
+    assert answer_key.get_differing_cells(other) == [(2, 3), (7, 1)]
+
+
+def test_get_disambiguating_clues():
+    puzzle = make_unique_puzzle(rng=random.Random(6))[0]
+    assert puzzle.get_disambiguating_clues() == []
+    grid = np.array(puzzle.puzzle_grid)
+    for row, col in puzzle.original_indexes[:12]:
+        grid[row, col] = 0
+    ambiguous = Puzzle(grid)
+    assert ambiguous.count_solutions(2) == 2
+    # A small limit takes several rounds but still ends unique
+    for limit in (2, 1000):
+        clues = ambiguous.get_disambiguating_clues(limit)
+        assert clues
+        repaired = Puzzle(np.array(grid))
+        for row, col, digit in clues:
+            assert repaired.safe_update(row, col, digit)
+        assert repaired.count_solutions(2) == 1
+        # Every clue is needed, leaving any one out makes the solution ambiguous again
+        for row, col, _ in clues:
+            without = Puzzle(np.array(repaired.puzzle_grid))
+            without.puzzle_grid[row, col] = 0
+            assert without.count_solutions(2) == 2
+    with pytest.raises(ValueError):
+        ambiguous.get_disambiguating_clues(1)
+    with pytest.raises(ValueError):
+        puzzle_from_line('0234567891' + '0' * 71).get_disambiguating_clues()
+
+
+def test_constructor_agrees_with_is_puzzle_valid():
+    # The constructor checks the masks first, values that aren't digits still get the full check
+    for value, is_valid in ((1.5, True), (9, True), (10, False), (-1, False), (np.nan, False)):
+        grid = np.zeros((9, 9))
+        grid[0, 0] = value
+        if is_valid:
+            assert Puzzle(grid).is_puzzle_valid()
+        else:
+            with pytest.raises(ValueError):
+                Puzzle(grid)
+    grid = np.zeros((9, 9))
+    grid[0, :2] = 1.5
+    with pytest.raises(ValueError):
+        Puzzle(grid)
+
+
+def test_grid_is_copied_from_the_caller():
+    answer_key = make_puzzle_answer_key(random.Random(7))
+    puzzle = Puzzle(answer_key.puzzle_grid)
+    puzzle.puzzle_grid[0, 0] = 0
+    assert answer_key.is_puzzle_solved()
+    assert answer_key.puzzle_grid[0, 0] != 0
+    grid = np.array(answer_key.puzzle_grid)
+    puzzle = Puzzle(grid)
+    grid[0, 0] = 0
+    assert puzzle.is_puzzle_solved()
+
+
+def test_masks_follow_other_write_paths():
+    answer_key = make_puzzle_answer_key(random.Random(8))
+    solution = np.array(answer_key.puzzle_grid)
+    value = int(solution[0, 0])
+
+    puzzle = Puzzle()
+    puzzle.puzzle_grid.fill(3)
+    assert not puzzle.is_puzzle_valid()
+    assert not puzzle.is_update_valid(0, 0, 3)
+
+    puzzle = Puzzle()
+    np.copyto(puzzle.puzzle_grid, solution)
+    assert puzzle.is_puzzle_solved()
+    puzzle.puzzle_grid.flat[0] = 0
+    assert not puzzle.is_puzzle_solved()
+    assert puzzle.get_options_for_index(0, 0) == {value}
+
+    puzzle = Puzzle()
+    puzzle.puzzle_grid.flat = solution.ravel()
+    assert puzzle.is_puzzle_solved()
+    np.put(puzzle.puzzle_grid, [0], [0])
+    assert puzzle.get_options_for_index(0, 0) == {value}
+    np.putmask(puzzle.puzzle_grid, puzzle.puzzle_grid == 0, value)
+    assert puzzle.is_puzzle_solved()
@@ -0,0 +1,76 @@
+from classes.solver import PropagationSolver
+
+# An "insane" level puzzle, row by row
+HARD_PUZZLE = [int(c) for c in
+               "002030001809000000730410000000500070007108900080002000000025097000000300500070860"]
+
+
+def is_solution(puzzle: list[int], solution: list[int]) -> bool:
+    # Every given kept, and every row, col, and square has all 9 digits
+    if any(given != 0 and given != value for given, value in zip(puzzle, solution)):
+        return False
+    rows = [solution[i * 9:i * 9 + 9] for i in range(9)]
+    cols = [solution[i::9] for i in range(9)]
+    squares = [[solution[(r // 3 * 3 + i // 3) * 9 + r % 3 * 3 + i % 3] for i in range(9)] for r in range(9)]
+    return all(sorted(unit) == list(range(1, 10)) for unit in rows + cols + squares)
+
+
+def test_solve_empty():
+    solver = PropagationSolver()
+    empty = [0] * 81
+    assert is_solution(empty, solver.solve(empty))
+
+
+def test_solve_hard():
+    solver = PropagationSolver()
+    assert is_solution(HARD_PUZZLE, solver.solve(HARD_PUZZLE))
+    assert solver.nodes >= 1
+    assert solver.propagations > 0
+
+
+def test_solve_only_propagation():
+    solver = PropagationSolver()
+    solution = solver.solve(HARD_PUZZLE)
+    # Leaving one cell out of each row can always be filled in without guessing
+    puzzle = [0 if i % 10 == 0 else value for i, value in enumerate(solution)]
+    assert solver.solve(puzzle) == solution
+    assert solver.nodes == 1
+    assert solver.backtracks == 0
+    assert solver.propagations == 9
+
+
+def test_solve_conflicting_givens():
+    solver = PropagationSolver()
+    puzzle = [0] * 81
+    puzzle[0] = 5
+    puzzle[8] = 5
+    assert solver.solve(puzzle) is None
+
+
+def test_solve_no_solution():
+    solver = PropagationSolver()
+    # The first cell can't be anything, but no givens conflict
+    puzzle = [0] * 81
+    puzzle[1:9] = range(1, 9)
+    puzzle[9] = 9
+    assert solver.solve(puzzle) is None
+    assert solver.nodes == 1
+
+
+def test_solver_reused():
+    solver = PropagationSolver()
+    first = solver.solve(HARD_PUZZLE)
+    solver.solve([0] * 81)
+    assert solver.solve(HARD_PUZZLE) == first
+
+
+def test_solve_other_sizes():
+    for box_size in (1, 2, 4):
+        size = box_size * box_size
+        solver = PropagationSolver(box_size)
+        solution = solver.solve([0] * size * size)
+        rows = [solution[i * size:i * size + size] for i in range(size)]
+        assert all(sorted(row) == list(range(1, size + 1)) for row in rows)
+        assert all(sorted(col) == list(range(1, size + 1)) for col in zip(*rows))
+    # A 9 by 9 puzzle doesn't fit a 16 by 16 solver
+    assert PropagationSolver(4).solve(HARD_PUZZLE) is None
@@ -0,0 +1,56 @@
+import numpy as np
+
+from classes.puzzle import Puzzle, make_solvable_puzzle, make_unique_puzzle
+from classes.solver import PropagationSolver
+from classes.vectorized import SOLVED, UNRESOLVED, UNSOLVABLE, propagate_grids, solve_grids
+from tests.test_classes.test_solver import HARD_PUZZLE
+
+
+def test_propagate_easy_puzzles():
+    # Puzzles from make_solvable_puzzle never need a guess
+    grids = np.stack([make_solvable_puzzle().puzzle_grid for _ in range(5)])
+    solutions, status = propagate_grids(grids)
+    assert np.all(status == SOLVED)
+    for grid, solution in zip(grids, solutions):
+        assert Puzzle(np.array(solution)).is_puzzle_solved()
+        assert np.all((grid == 0) | (grid == solution))
+
+
+def test_propagate_does_not_change_input():
+    grids = np.stack([make_solvable_puzzle().puzzle_grid])
+    before = grids.copy()
+    propagate_grids(grids)
+    assert np.all(grids == before)
+
+
+def test_propagate_empty_unresolved():
+    solutions, status = propagate_grids(np.zeros((2, 9, 9), dtype=np.int8))
+    assert np.all(status == UNRESOLVED)
+    assert np.all(solutions == 0)
+
+
+def test_propagate_unsolvable():
+    duplicate = np.zeros((9, 9), dtype=np.int8)
+    duplicate[0, 0] = duplicate[0, 5] = 3
+    stuck = np.zeros((9, 9), dtype=np.int8)
+    stuck[0, 1:9] = np.arange(1, 9)
+    stuck[1, 0] = 9
+    out_of_range = np.zeros((9, 9), dtype=np.int8)
+    out_of_range[4, 4] = 12
+    _, status = propagate_grids(np.stack([duplicate, stuck, out_of_range]))
+    assert np.all(status == UNSOLVABLE)
+
+
+def test_solve_mixed_batch():
+    hard = np.reshape(HARD_PUZZLE, (9, 9))
+    unique, _ = make_unique_puzzle()
+    stuck = np.zeros((9, 9), dtype=np.int8)
+    stuck[0, 1:9] = np.arange(1, 9)
+    stuck[1, 0] = 9
+    grids = np.stack([hard, unique.puzzle_grid, np.zeros((9, 9)), stuck, make_solvable_puzzle().puzzle_grid])
+    solutions, status = solve_grids(grids)
+    assert list(status) == [SOLVED, SOLVED, SOLVED, UNSOLVABLE, SOLVED]
+    for index in (0, 1, 2, 4):
+        assert Puzzle(np.array(solutions[index])).is_puzzle_solved()
+        assert np.all((grids[index] == 0) | (grids[index] == solutions[index]))
+    assert solutions[0].ravel().tolist() == PropagationSolver().solve(HARD_PUZZLE)
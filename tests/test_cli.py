@@ -0,0 +1,77 @@
+import io
+
+from classes.puzzle import puzzle_from_line
+from cli import LatencyHistogram, main
+
+HARD_LINE = "002030001809000000730410000000500070007108900080002000000025097000000300500070860"
+
+
+def run(argv: list[str], stdin: str = '') -> tuple[list[str], str]:
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    assert main(argv, io.StringIO(stdin), stdout, stderr) == 0
+    return stdout.getvalue().splitlines(), stderr.getvalue()
+
+
+def test_solve_lines():
+    lines, summary = run(['solve'], f"{HARD_LINE}\n\n# a comment\n{'.' * 81}\nnot a puzzle\n")
+    assert len(lines) == 3
+    assert puzzle_from_line(lines[0]).is_puzzle_solved()
+    assert puzzle_from_line(lines[1]).is_puzzle_solved()
+    assert lines[2] == 'invalid'
+    assert "3 puzzles" in summary
+    assert "p99" in summary
+
+
+def test_solve_unsolvable():
+    lines, _ = run(['--quiet', 'solve', '--solver', 'dlx'], '0123456789' + '0' * 71)
+    assert lines == ['unsolvable']
+
+
+def test_solve_file(tmp_path):
+    path = tmp_path / "puzzles.txt"
+    path.write_text(HARD_LINE + '\n')
+    lines, _ = run(['solve', str(path)])
+    assert puzzle_from_line(lines[0]).is_puzzle_solved()
+
+
+def test_count_lines():
+    lines, _ = run(['count', '--limit', '5'], f"{HARD_LINE}\n{'0' * 81}\n")
+    assert lines == ['1', '5']
+
+
+def test_generate_same_for_seed():
+    first, _ = run(['generate', '--count', '3', '--seed', '4'])
+    second, _ = run(['--workers', '2', 'generate', '--count', '3', '--seed', '4'])
+    assert first == second
+    assert all(puzzle_from_line(line).count_solutions() == 1 for line in first)
+
+
+def test_solve_in_pool_keeps_order():
+    puzzles, _ = run(['generate', '--count', '6', '--seed', '1'])
+    serial, _ = run(['solve'], '\n'.join(puzzles))
+    pooled, _ = run(['--workers', '3', 'solve'], '\n'.join(puzzles))
+    assert serial == pooled
+
+
+def test_latency_percentiles():
+    latencies = LatencyHistogram()
+    for millis in range(1, 101):
+        latencies.add(millis / 1000)
+    assert 0.048 <= latencies.percentile(50) <= 0.053
+    assert 0.097 <= latencies.percentile(99) <= 0.105
+    assert LatencyHistogram().percentile(50) == 0.0
+
+
+def test_grade_lines():
+    lines, _ = run(['--quiet', 'grade'], f"{HARD_LINE}\n{'0' * 81}\nnot a puzzle\n")
+    assert lines[0].startswith('unsolved ')
+    assert lines[1].startswith('unsolved ')
+    assert lines[2] == 'invalid'
+
+
+def test_solve_budget():
+    lines, _ = run(['--quiet', 'solve', '--solver', 'brute_force', '--max-nodes', '10'], HARD_LINE + '\n')
+    assert lines == ['budget_exhausted']
+    lines, _ = run(['--quiet', 'solve', '--timeout', '60'], HARD_LINE + '\n')
+    assert puzzle_from_line(lines[0]).is_puzzle_solved()
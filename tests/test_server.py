@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import server
+from classes.puzzle import puzzle_from_line
+from server import SolveServer, handle_batch, handle_request
+
+HARD_LINE = "002030001809000000730410000000500070007108900080002000000025097000000300500070860"
+
+
+async def exchange(server: SolveServer, requests: list, path=None) -> list[dict]:
+    listener = await server.start(port=0, path=path)
+    try:
+        if path is None:
+            reader, writer = await asyncio.open_connection(*listener.sockets[0].getsockname()[:2])
+        else:
+            reader, writer = await asyncio.open_unix_connection(path)
+        for request in requests:
+            writer.write((request if isinstance(request, str) else json.dumps(request)).encode() + b'\n')
+        await writer.drain()
+        writer.write_eof()
+        responses = [json.loads(line) async for line in reader]
+        writer.close()
+        return responses
+    finally:
+        await server.close()
+
+
+def test_handle_request():
+    solved = handle_request({'id': 1, 'op': 'solve', 'puzzle': HARD_LINE})
+    assert solved['id'] == 1
+    assert solved['result']['status'] == 'solved'
+    assert puzzle_from_line(solved['result']['solution']).is_puzzle_solved()
+    assert handle_request({'op': 'validate', 'puzzle': HARD_LINE})['result'] == {'valid': True, 'solved': False}
+    assert handle_request({'op': 'validate', 'puzzle': '11' + '0' * 79})['result'] == {'valid': False, 'solved': False}
+    assert handle_request({'op': 'count', 'puzzle': '0' * 81, 'limit': 3})['result'] == {'count': 3}
+    generated = handle_request({'op': 'generate', 'kind': 'unique', 'seed': 4})['result']
+    assert puzzle_from_line(generated['puzzle']).count_solutions(2) == 1
+    assert generated == handle_request({'op': 'generate', 'kind': 'unique', 'seed': 4})['result']
+
+
+def test_handle_request_errors():
+    assert 'op' in handle_request({'id': 2})['error']
+    assert 'error' in handle_request({'op': 'fly'})
+    assert 'error' in handle_request({'op': 'solve', 'puzzle': 'not a puzzle'})
+    exhausted = handle_request({'op': 'solve', 'puzzle': HARD_LINE, 'solver': 'brute_force', 'max_nodes': 10})
+    assert exhausted['result']['status'] == 'budget_exhausted'
+    assert 'partial' in exhausted['result']
+    # The server's timeout caps what a request asks for
+    counted = handle_request({'op': 'count', 'puzzle': '0' * 81, 'timeout': 60}, timeout=0.01)
+    assert counted['error'] == 'budget_exhausted: deadline'
+
+
+def test_malformed_request_in_batch(monkeypatch):
+    requests = [
+        {'id': 1, 'op': 'validate', 'puzzle': HARD_LINE},
+        {'id': 2, 'op': 'validate', 'puzzle': 123},
+        {'id': 3, 'op': 'count', 'puzzle': HARD_LINE, 'limit': 'all'},
+        {'id': 4, 'op': 'generate', 'seed': [1], 'box_size': True},
+        {'id': 5, 'op': 'solve', 'puzzle': HARD_LINE, 'timeout': '1'},
+        {'id': 6, 'op': 'count', 'puzzle': HARD_LINE},
+    ]
+    responses = handle_batch(requests)
+    assert [response['id'] for response in responses] == [1, 2, 3, 4, 5, 6]
+    assert responses[0]['result'] == {'valid': True, 'solved': False}
+    assert all('error' in response for response in responses[1:5])
+    assert responses[5]['result'] == {'count': 1}
+    # Unexpected errors only fail their own request too
+    monkeypatch.setitem(server.OPERATIONS, 'broken', lambda request, budget: [][0])
+    responses = handle_batch([{'id': 7, 'op': 'broken'}, {'id': 8, 'op': 'validate', 'puzzle': HARD_LINE}])
+    assert 'Internal error' in responses[0]['error']
+    assert responses[1]['result']['valid']
+
+
+def test_serve_in_order():
+    requests = [{'id': index, 'op': 'solve', 'puzzle': HARD_LINE} for index in range(50)]
+    requests += ['not json', '[1, 2]', {'id': 'v', 'op': 'validate', 'puzzle': HARD_LINE}]
+    responses = asyncio.run(exchange(SolveServer(workers=0, batch_size=8), requests))
+    assert [response['id'] for response in responses] == list(range(50)) + [None, None, 'v']
+    assert all(response['result']['status'] == 'solved' for response in responses[:50])
+    assert 'Bad request' in responses[50]['error']
+    assert 'Bad request' in responses[51]['error']
+    assert responses[52]['result']['valid']
+
+
+def test_serve_backpressure():
+    # Far more requests than can wait at once, the server keeps reading only as fast as it answers
+    requests = [{'id': index, 'op': 'validate', 'puzzle': HARD_LINE} for index in range(500)]
+    responses = asyncio.run(exchange(SolveServer(workers=0, batch_size=4, max_pending=8), requests))
+    assert [response['id'] for response in responses] == list(range(500))
+
+
+def test_serve_processes_unix_socket(tmp_path):
+    requests = [{'id': index, 'op': 'count', 'puzzle': HARD_LINE} for index in range(20)]
+    responses = asyncio.run(exchange(SolveServer(workers=2), requests, str(tmp_path / 'sudoku.sock')))
+    assert [response['result']['count'] for response in responses] == [1] * 20
+
+
+def test_count_limits():
+    assert handle_request({'op': 'count', 'puzzle': '0' * 81})['result'] == {'count': server.DEFAULT_COUNT_LIMIT}
+    assert SolveServer(workers=0).timeout == server.DEFAULT_TIMEOUT
+    assert server.parse_args([]).timeout == server.DEFAULT_TIMEOUT